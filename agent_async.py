@@ -0,0 +1,103 @@
+import asyncio
+import os
+import weakref
+from collections.abc import MutableMapping
+from typing import Any
+
+from asgiref.sync import sync_to_async
+
+import agent_core
+from llm_cache import ResponseCache, get_response_cache
+from llm_client import get_async_client, resolve_model_name
+
+# ==========================================
+# 异步版 Agent：并发上限 + 相同请求合并
+# ==========================================
+# - 所有在途的 DeepSeek 请求共享一个信号量，上限由 SMARTDIET_MAX_INFLIGHT 控制（默认 8）；
+# - 完全相同的请求（模型 + messages）在途时只发一次上游调用，其余调用方等待同一个结果；
+# - 食谱上下文的 ORM 访问经 sync_to_async 在 Django 的同步线程里执行。
+# 注意：导入本模块会经 agent_core 同步初始化数据库，请在事件循环启动前导入。
+_loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+_build_chat_messages_async = sync_to_async(agent_core._build_chat_messages, thread_sensitive=True)
+_cache_key_async = sync_to_async(agent_core._response_cache_key, thread_sensitive=True)
+
+
+def _max_inflight() -> int:
+    try:
+        return max(1, int(os.getenv("SMARTDIET_MAX_INFLIGHT") or 8))
+    except ValueError:
+        return 8
+
+
+def _state() -> dict[str, Any]:
+    """当前事件循环的信号量与在途请求表（asyncio 原语不能跨事件循环共享）。"""
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        state = {
+            "semaphore": asyncio.Semaphore(_max_inflight()),
+            "inflight": {},
+            "stats": {"upstream_calls": 0, "coalesced": 0},
+        }
+        _loop_state[loop] = state
+    return state
+
+
+def async_stats() -> dict[str, int]:
+    """当前事件循环内的上游调用次数与被合并的请求数。"""
+    return dict(_state()["stats"])
+
+
+async def _complete(chat_messages: list[dict[str, str]], model_name: str) -> str:
+    state = _state()
+    async with state["semaphore"]:
+        state["stats"]["upstream_calls"] += 1
+        client = get_async_client(agent_core._require_api_key())
+        response = await client.chat.completions.create(
+            model=model_name,
+            messages=chat_messages,
+        )
+        return (response.choices[0].message.content or "").strip()
+
+
+async def ask_smartdiet_agent_async(
+    messages_history: list[dict[str, Any]],
+    user_profile: str = "",
+    nutrition_targets: dict[str, float] | None = None,
+    history_state: MutableMapping[str, Any] | None = None,
+) -> str:
+    """agent_core.ask_smartdiet_agent 的异步版本，参数与返回值一致。"""
+    chat_messages = await _build_chat_messages_async(
+        messages_history, user_profile, nutrition_targets, history_state
+    )
+    if chat_messages is None:
+        return agent_core.NO_RECIPES_MESSAGE
+
+    model_name = resolve_model_name()
+    cache_key = await _cache_key_async(chat_messages, model_name)
+    if cache_key is not None:
+        # 缓存的持久层是同步 SQLite 读写，放到线程里执行，不阻塞事件循环
+        cached = await asyncio.to_thread(get_response_cache().get, cache_key)
+        if cached is not None:
+            return cached
+
+    state = _state()
+    request_key = cache_key or ResponseCache.make_key(model_name, chat_messages)
+    task = state["inflight"].get(request_key)
+    if task is None:
+        task = asyncio.ensure_future(_complete(chat_messages, model_name))
+        state["inflight"][request_key] = task
+        task.add_done_callback(lambda _: state["inflight"].pop(request_key, None))
+    else:
+        state["stats"]["coalesced"] += 1
+
+    try:
+        # shield：某个调用方被取消时不影响其他等待同一结果的调用方
+        answer = await asyncio.shield(task)
+    except Exception as e:
+        return agent_core._describe_request_error(e)
+
+    if cache_key is not None and answer:
+        await asyncio.to_thread(get_response_cache().set, cache_key, answer)
+    return answer
@@ -1,11 +1,12 @@
 import os
+import re
+import time
+from collections.abc import Iterator, MutableMapping
 from typing import Any
 
 import django
 import openai
 from django.apps import apps as django_apps
-from django.core.management import call_command
-from django.db.utils import OperationalError
 from openai import OpenAI
 
 # ==========================================
@@ -15,7 +16,16 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
 if not django_apps.ready:
     django.setup()
 
-from recipes.models import Recipe  # noqa: E402
+from chat_history import window_history  # noqa: E402
+from llm_cache import get_response_cache  # noqa: E402
+from llm_client import get_client, resolve_model_name  # noqa: E402
+from nutrition_project.bootstrap import ensure_database_ready  # noqa: E402
+from recipes.retrieval import RecipeDoc, get_recipe_index  # noqa: E402
+from recipes.search import parse_ingredient_intent, recipe_ids_matching, resolve_ingredient_terms  # noqa: E402
+from token_budget import estimate_tokens  # noqa: E402
+
+# 云端首次启动常见 db.sqlite3 不存在（被 .gitignore 拦截）：导入时一次性建表 + 写入初始食谱
+ensure_database_ready()
 
 
 # ==========================================
@@ -33,12 +43,7 @@ def _require_api_key() -> str:
 
 def _get_client_and_model() -> tuple[OpenAI, str]:
     api_key = _require_api_key()
-    client = OpenAI(
-        api_key=api_key,
-        base_url=os.getenv("DEEPSEEK_BASE_URL") or "https://api.deepseek.com",
-    )
-    model_name = os.getenv("DEEPSEEK_MODEL") or "deepseek-chat"
-    return client, model_name
+    return get_client(api_key), resolve_model_name()
 
 
 def _normalize_messages(messages_history: list[dict[str, Any]]) -> list[dict[str, str]]:
@@ -56,93 +61,124 @@ def _normalize_messages(messages_history: list[dict[str, Any]]) -> list[dict[str
     return normalized
 
 
-def ask_smartdiet_agent(messages_history: list[dict[str, Any]], user_profile: str = "") -> str:
-    """SmartDiet-Agent 的核心处理逻辑（支持多轮对话 + 用户画像注入）。"""
-    # 1) 自动建表：云端首次启动常见 db.sqlite3 不存在（被 .gitignore 拦截）导致表未创建
+# ==========================================
+# 3) 食谱检索：只把与本轮需求最相关的 Top-K 食谱放进提示词
+# ==========================================
+RECIPE_CONTEXT_HEADER = "【当前系统可用的食谱库】：\n"
+MEALS_PER_DAY = 3
+
+_TARGET_CALORIES_RE = re.compile(r"每日目标热量≈(\d+)")
+
+
+def _env_int(name: str, default: int) -> int:
     try:
-        recipes = Recipe.objects.all()
-        recipe_count = recipes.count()
-    except OperationalError:
-        call_command("migrate", interactive=False, run_syncdb=True, verbosity=0)
-        recipes = Recipe.objects.all()
-        recipe_count = recipes.count()
-
-    # 2) 自动塞入初始数据（Seeding）：确保云端首次打开就可用
-    if recipe_count == 0:
-        seed_items = [
-            {
-                "name": "泰式青柠煎鸡胸",
-                "calories": 350,
-                "protein": 40.0,
-                "carbs": 15.0,
-                "fats": 10.0,
-                "ingredients": "鸡胸肉 200g、青柠 1 个、蒜 2 瓣、黑胡椒、少量橄榄油、盐、辣椒粉（可选）",
-                "instructions": "1) 鸡胸肉拍松，加入青柠汁、蒜末、盐和黑胡椒腌 10-15 分钟；2) 平底锅少油中火煎至两面金黄、熟透；3) 出锅再挤少量青柠汁提味。",
-            },
-            {
-                "name": "意式番茄牛肉全麦面",
-                "calories": 550,
-                "protein": 35.0,
-                "carbs": 60.0,
-                "fats": 15.0,
-                "ingredients": "全麦意面 80g（干重）、瘦牛肉末 150g、番茄/番茄罐头、洋葱、蒜、橄榄油、盐、黑胡椒、意式香草",
-                "instructions": "1) 意面煮至 8 分熟；2) 少油炒香洋葱蒜末，下牛肉末炒散；3) 加番茄与香草小火收汁；4) 与意面拌匀即可。",
-            },
-            {
-                "name": "藜麦大虾牛油果沙拉",
-                "calories": 420,
-                "protein": 25.0,
-                "carbs": 30.0,
-                "fats": 20.0,
-                "ingredients": "藜麦 60g（熟）、虾仁 150g、牛油果 1/2 个、生菜/黄瓜/小番茄、柠檬汁、盐、黑胡椒",
-                "instructions": "1) 虾仁焯水或快炒至变色；2) 藜麦提前煮熟放凉；3) 与蔬菜、牛油果混合；4) 用柠檬汁+盐+黑胡椒简单调味。",
-            },
-            {
-                "name": "迷迭香烤三文鱼配时蔬",
-                "calories": 600,
-                "protein": 45.0,
-                "carbs": 45.0,
-                "fats": 25.0,
-                "ingredients": "三文鱼 200g、迷迭香、柠檬、盐、黑胡椒、橄榄油、时蔬（西兰花/胡萝卜/彩椒）、小土豆（可选）",
-                "instructions": "1) 三文鱼抹盐胡椒与迷迭香，铺柠檬片；2) 烤箱 200°C 烤 12-15 分钟；3) 时蔬同盘烤或蒸熟，少量橄榄油调味。",
-            },
-            {
-                "name": "经典燕麦牛奶蓝莓碗",
-                "calories": 300,
-                "protein": 15.0,
-                "carbs": 45.0,
-                "fats": 6.0,
-                "ingredients": "燕麦 40g、牛奶/无糖豆奶 200ml、蓝莓一小把、奇亚籽/坚果（可选）、肉桂粉（可选）",
-                "instructions": "1) 燕麦与牛奶小火煮至浓稠；2) 盛出后加入蓝莓；3) 可按需撒奇亚籽/少量坚果提升口感与饱腹感。",
-            },
-        ]
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _parse_target_calories(user_profile: str) -> float | None:
+    match = _TARGET_CALORIES_RE.search(user_profile or "")
+    return float(match.group(1)) if match else None
+
+
+def _retrieval_query(normalized_history: list[dict[str, str]], turns: int = 2) -> str:
+    user_turns = [m["content"] for m in normalized_history if m["role"] == "user"]
+    return "\n".join(user_turns[-turns:])
+
+
+def _format_recipe_line(doc: RecipeDoc) -> str:
+    return (
+        f"- {doc.name}: 热量 {doc.calories}kcal, 蛋白 {doc.protein}g, "
+        f"碳水 {doc.carbs}g, 脂肪 {doc.fats}g\n"
+        f"食材清单: {doc.ingredients}\n"
+    )
+
+
+def build_recipe_context(
+    query: str,
+    *,
+    nutrition_targets: dict[str, float] | None = None,
+    user_profile: str = "",
+    top_k: int | None = None,
+    token_budget: int | None = None,
+) -> tuple[str, int]:
+    """返回 (食谱库上下文文本, 食谱库总数)。
+
+    用户点名“含/不含某食材”时先用全文检索圈定候选（“含”圈不出食谱时退回不限食材）；再按单餐目标热量/蛋白供能比过滤，
+    用本地字符 n-gram TF-IDF 排序取前 top_k 条，并保证上下文的估算 token 数不超过 token_budget（至少保留 1 条）。
+    """
+    index = get_recipe_index()
+    total = len(index)
+    if total == 0:
+        return "", 0
+
+    if top_k is None:
+        top_k = _env_int("SMARTDIET_RETRIEVAL_TOP_K", 8)
+    if token_budget is None:
+        token_budget = _env_int("SMARTDIET_RECIPE_CONTEXT_TOKENS", 1500)
+
+    targets = nutrition_targets or {}
+    daily_calories = targets.get("calories") or _parse_target_calories(user_profile)
+    meal_calories = daily_calories / MEALS_PER_DAY if daily_calories else None
+    protein_ratio = None
+    if daily_calories and targets.get("protein"):
+        protein_ratio = targets["protein"] * 4 / daily_calories
+
+    # 抽出的词先对照食材词表校正，避免“用时短一点”“没有胃口”这类非食材词变成硬过滤
+    include, exclude = parse_ingredient_intent(query)
+    include, exclude = resolve_ingredient_terms(include), resolve_ingredient_terms(exclude)
+    search_options = {
+        "top_k": top_k,
+        "target_calories": meal_calories,
+        "target_protein_ratio": protein_ratio,
+        "excluded_ids": recipe_ids_matching(exclude, match_all=False) if exclude else (),
+    }
+    docs = index.search(query, allowed_ids=recipe_ids_matching(include) if include else None, **search_options)
+    note = ""
+    if include and not docs:
+        # “含某食材”只是偏好：库里没有就照常推荐其他食谱，并如实告诉模型
+        docs = index.search(query, **search_options)
+        note = f"（食谱库中没有含「{'、'.join(include)}」的食谱，以下为其他可选食谱）\n"
+    if not docs:
+        # “不含某食材”是硬性要求（忌口、过敏）：确实没有就明说，避免模型为了“推荐点什么”去编造
+        condition = f"不含「{'、'.join(exclude)}」的" if exclude else ""
+        return RECIPE_CONTEXT_HEADER + f"（食谱库中没有{condition}食谱）\n", total
+
+    lines: list[str] = []
+    used = estimate_tokens(RECIPE_CONTEXT_HEADER + note)
+    for doc in docs:
+        line = _format_recipe_line(doc)
+        cost = estimate_tokens(line)
+        if lines and used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+    return RECIPE_CONTEXT_HEADER + note + "".join(lines), total
 
-        for item in seed_items:
-            Recipe.objects.get_or_create(
-                name=item["name"],
-                defaults={
-                    "calories": item["calories"],
-                    "protein": item["protein"],
-                    "carbs": item["carbs"],
-                    "fats": item["fats"],
-                    "ingredients": item["ingredients"],
-                    "instructions": item["instructions"],
-                },
-            )
-
-        recipes = Recipe.objects.all()
-
-    # 3) 继续向下执行
-    if not recipes.exists():
-        return "数据库里还没有食谱哦，请先生成/录入一些食谱数据再试。"
-
-    recipe_context = "【当前系统可用的食谱库】：\n"
-    for r in recipes:
-        recipe_context += (
-            f"- {r.name}: 热量 {r.calories}kcal, 蛋白 {r.protein}g, "
-            f"碳水 {r.carbs}g, 脂肪 {r.fats}g\n"
-            f"食材清单: {r.ingredients}\n"
-        )
+
+NO_RECIPES_MESSAGE = "数据库里还没有食谱哦，请先生成/录入一些食谱数据再试。"
+
+
+def _build_chat_messages(
+    messages_history: list[dict[str, Any]],
+    user_profile: str,
+    nutrition_targets: dict[str, float] | None,
+    history_state: MutableMapping[str, Any] | None = None,
+) -> list[dict[str, str]] | None:
+    """组装发给模型的 messages（system + 历史窗口）；食谱库为空时返回 None。"""
+    # 建表与初始食谱已在模块导入时完成，这里只是一次布尔判断
+    ensure_database_ready()
+
+    normalized_history, history_summary = window_history(_normalize_messages(messages_history), history_state)
+    recipe_context, recipe_count = build_recipe_context(
+        _retrieval_query(normalized_history),
+        nutrition_targets=nutrition_targets,
+        user_profile=user_profile,
+    )
+
+    if recipe_count == 0:
+        return None
 
     system_message = {
         "role": "system",
@@ -152,11 +188,12 @@ def ask_smartdiet_agent(messages_history: list[dict[str, Any]], user_profile: st
             "你必须严格参考用户的【每日目标热量】来推荐食谱，并用教练口吻解释这道菜的热量为何符合他当天的热量缺口/盈余需求。\n"
             "如果用户追问做法/食材替换/热量等，请只针对你推荐的那道食谱或食谱库内相关食谱回答。\n\n"
             f"【当前用户的身体档案与目标热量】：\n{user_profile or '未提供'}\n\n"
-            f"【系统可用的食谱库】：\n{recipe_context}"
+            f"【系统可用的食谱库】（按本轮需求从 {recipe_count} 道食谱中检索出的候选）：\n{recipe_context}"
         ),
     }
+    if history_summary:
+        system_message["content"] += f"\n【更早的对话摘要】：\n{history_summary}\n"
 
-    normalized_history = _normalize_messages(messages_history)
     if not normalized_history:
         normalized_history = [
             {
@@ -165,28 +202,131 @@ def ask_smartdiet_agent(messages_history: list[dict[str, Any]], user_profile: st
             }
         ]
 
+    return [system_message] + normalized_history
+
+
+def _describe_request_error(e: Exception) -> str:
+    if isinstance(e, RuntimeError):
+        return str(e)
+    if isinstance(e, openai.APIStatusError) and getattr(e, "status_code", None) == 402:
+        return (
+            "DeepSeek 返回 402 Insufficient Balance：当前 Key 余额不足/未开通计费，无法调用模型。\n"
+            "你可以先用离线模式把食谱造进数据库跑通演示：\n"
+            "- $env:SMARTDIET_OFFLINE='1'\n"
+            "- python auto_populate_db.py\n"
+            "然后再重试对话。"
+        )
+    return f"DeepSeek 请求失败：{e}"
+
+
+def _response_cache_key(chat_messages: list[dict[str, str]], model_name: str) -> str | None:
+    """开启 SMARTDIET_LLM_CACHE 时返回本次请求的缓存键；作用域绑定食谱库内容，食谱库变化即失效。"""
+    cache = get_response_cache()
+    if cache is None:
+        return None
+    return cache.make_key(model_name, chat_messages, scope=get_recipe_index().fingerprint())
+
+
+def ask_smartdiet_agent(
+    messages_history: list[dict[str, Any]],
+    user_profile: str = "",
+    nutrition_targets: dict[str, float] | None = None,
+    history_state: MutableMapping[str, Any] | None = None,
+) -> str:
+    """SmartDiet-Agent 的核心处理逻辑（支持多轮对话 + 用户画像注入）。
+
+    nutrition_targets 为侧边栏算出的每日目标（calories/protein/carbs/fats），用于食谱检索；
+    不传时会尝试从 user_profile 里解析每日目标热量。
+    history_state 用于跨轮缓存早前对话的滚动摘要（如 st.session_state 中的一个字典）。
+    """
+    chat_messages = _build_chat_messages(messages_history, user_profile, nutrition_targets, history_state)
+    if chat_messages is None:
+        return NO_RECIPES_MESSAGE
+
+    cache_key = _response_cache_key(chat_messages, resolve_model_name())
+    if cache_key is not None:
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            return cached
+
     print("Agent 正在思考中...")
     try:
         client, model_name = _get_client_and_model()
         response = client.chat.completions.create(
             model=model_name,
-            messages=[system_message] + normalized_history,
+            messages=chat_messages,
         )
-        return (response.choices[0].message.content or "").strip()
-    except RuntimeError as e:
-        return str(e)
-    except openai.APIStatusError as e:
-        if getattr(e, "status_code", None) == 402:
-            return (
-                "DeepSeek 返回 402 Insufficient Balance：当前 Key 余额不足/未开通计费，无法调用模型。\n"
-                "你可以先用离线模式把食谱造进数据库跑通演示：\n"
-                "- $env:SMARTDIET_OFFLINE='1'\n"
-                "- python auto_populate_db.py\n"
-                "然后再重试对话。"
-            )
-        return f"DeepSeek 请求失败：{e}"
+        answer = (response.choices[0].message.content or "").strip()
+    except Exception as e:
+        return _describe_request_error(e)
+
+    if cache_key is not None and answer:
+        get_response_cache().set(cache_key, answer)
+    return answer
+
+
+def stream_smartdiet_agent(
+    messages_history: list[dict[str, Any]],
+    user_profile: str = "",
+    nutrition_targets: dict[str, float] | None = None,
+    metrics: dict[str, float] | None = None,
+    history_state: MutableMapping[str, Any] | None = None,
+) -> Iterator[str]:
+    """ask_smartdiet_agent 的流式版本：模型每吐出一段文本就 yield 一段。
+
+    出错时（包括流式传输中途的 402/APIStatusError）以文本形式 yield 与非流式一致的提示。
+    传入 metrics 字典时会写入 ttft（首个 token 延迟，秒）、total（总耗时，秒）与 chunks，
+    命中响应缓存时另有 cache_hit=1。
+    """
+    chat_messages = _build_chat_messages(messages_history, user_profile, nutrition_targets, history_state)
+    if chat_messages is None:
+        yield NO_RECIPES_MESSAGE
+        return
+
+    if metrics is None:
+        metrics = {}
+    started = time.perf_counter()
+    cache_key = _response_cache_key(chat_messages, resolve_model_name())
+    if cache_key is not None:
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            metrics.update(ttft=time.perf_counter() - started, chunks=1, cache_hit=1)
+            yield cached
+            metrics["total"] = time.perf_counter() - started
+            return
+
+    print("Agent 正在思考中（流式）...")
+    chunks = 0
+    parts: list[str] = []
+    try:
+        client, model_name = _get_client_and_model()
+        stream = client.chat.completions.create(
+            model=model_name,
+            messages=chat_messages,
+            stream=True,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if not text:
+                continue
+            if chunks == 0:
+                metrics["ttft"] = time.perf_counter() - started
+                print(f"Agent 首个 token 延迟：{metrics['ttft']:.3f}s")
+            chunks += 1
+            parts.append(text)
+            yield text
     except Exception as e:
-        return f"DeepSeek 请求失败：{e}"
+        # 已经输出过部分内容时另起一段，避免错误提示和半截回答粘在一起
+        yield ("\n\n" if chunks else "") + _describe_request_error(e)
+    else:
+        answer = "".join(parts).strip()
+        if cache_key is not None and answer:
+            get_response_cache().set(cache_key, answer)
+    finally:
+        metrics["chunks"] = chunks
+        metrics["total"] = time.perf_counter() - started
 
 
 if __name__ == "__main__":
@@ -1,9 +1,7 @@
 import os
 
 import django
-import joblib
 import plotly.graph_objects as go
-import pandas as pd
 import streamlit as st
 from django.apps import apps as django_apps
 
@@ -14,10 +12,16 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
 if not django_apps.ready:
     django.setup()
 
+from nutrition_project.bootstrap import ensure_database_ready  # noqa: E402
+
+ensure_database_ready()
+
 # ==========================================
 # 2) 导入 Agent 大脑
 # ==========================================
-from agent_core import ask_smartdiet_agent  # noqa: E402
+from agent_core import stream_smartdiet_agent  # noqa: E402
+from diet_planner.nutrition import compute_targets  # noqa: E402
+from diet_planner.predictor import predict_strategy  # noqa: E402
 
 
 # ==========================================
@@ -93,45 +97,8 @@ with st.sidebar:
     # 3.55) AI 策略预测（传统机器学习模型）
     # ==========================================
     try:
-        model_path = os.path.join(
-            os.path.dirname(__file__),
-            "diet_planner",
-            "ml_models",
-            "diet_model_v1.pkl",
-        )
-        model = joblib.load(model_path)
-
-        features = pd.DataFrame(
-            [
-                {
-                    "age": int(age),
-                    "weight": float(weight_kg),
-                    "height": float(height_cm),
-                    "activity_level": float(activity_factor),
-                }
-            ]
-        )
-
-        prediction = model.predict(features)
-        prediction_value = prediction[0] if hasattr(prediction, "__len__") else prediction
-
-        pred_text = str(prediction_value)
-        pred_norm = pred_text.strip().lower()
-        pred_map = {
-            "0": "减脂",
-            "1": "维持",
-            "2": "增肌",
-            "cut": "减脂",
-            "loss": "减脂",
-            "lose": "减脂",
-            "maintain": "维持",
-            "bulk": "增肌",
-            "gain": "增肌",
-            "减脂": "减脂",
-            "维持": "维持",
-            "增肌": "增肌",
-        }
-        prediction_label = pred_map.get(pred_norm, pred_text)
+        # Streamlit 每次交互都会重跑脚本：模型按进程缓存，相同身体数据的预测结果也会被缓存
+        prediction_label = predict_strategy(int(age), float(weight_kg), float(height_cm), float(activity_factor))
 
         st.success(f"🤖 机器学习模型预测您最适合的策略是：{prediction_label}")
     except FileNotFoundError:
@@ -139,24 +106,11 @@ with st.sidebar:
     except Exception:
         st.warning("⚠️ 机器学习预测暂不可用")
 
-    # Mifflin-St Jeor
-    if gender == "男":
-        bmr = 10 * float(weight_kg) + 6.25 * float(height_cm) - 5 * int(age) + 5
-    else:
-        bmr = 10 * float(weight_kg) + 6.25 * float(height_cm) - 5 * int(age) - 161
-
-    tdee = bmr * activity_factor
-
-    if goal == "减脂":
-        target_calories = tdee - 500
-    elif goal == "增肌":
-        target_calories = tdee + 300
-    else:
-        target_calories = tdee
-
-    bmr_i = int(round(bmr))
-    tdee_i = int(round(tdee))
-    target_i = int(round(target_calories))
+    # Mifflin-St Jeor → TDEE → 目标热量 → 三大宏量（与批量计算共用 diet_planner.nutrition）
+    targets = compute_targets(gender, int(age), float(height_cm), float(weight_kg), activity_factor, goal)
+    bmr_i = int(targets["bmr"][0])
+    tdee_i = int(targets["tdee"][0])
+    target_i = int(targets["target_calories"][0])
 
     st.divider()
     st.metric("BMR（基础代谢）", f"{bmr_i} kcal")
@@ -166,16 +120,9 @@ with st.sidebar:
     # ==========================================
     # 3.6) 三大宏量营养素建议（克数 + 可视化）
     # ==========================================
-    if goal == "减脂":
-        carbs_ratio, protein_ratio, fat_ratio = 0.40, 0.40, 0.20
-    elif goal == "增肌":
-        carbs_ratio, protein_ratio, fat_ratio = 0.50, 0.30, 0.20
-    else:  # 维持
-        carbs_ratio, protein_ratio, fat_ratio = 0.50, 0.20, 0.30
-
-    carbs_g = int(round((float(target_i) * carbs_ratio) / 4))
-    protein_g = int(round((float(target_i) * protein_ratio) / 4))
-    fat_g = int(round((float(target_i) * fat_ratio) / 9))
+    carbs_g = int(targets["carbs_g"][0])
+    protein_g = int(targets["protein_g"][0])
+    fat_g = int(targets["fat_g"][0])
 
     st.markdown("### 📊 今日营养配比建议")
 
@@ -199,6 +146,13 @@ with st.sidebar:
     )
     st.plotly_chart(fig, use_container_width=True)
 
+    nutrition_targets = {
+        "calories": target_i,
+        "protein": protein_g,
+        "carbs": carbs_g,
+        "fats": fat_g,
+    }
+
     user_profile = (
         f"用户{gender}，{int(age)}岁，身高{int(round(height_cm))}cm，体重{float(weight_kg):.1f}kg，"
         f"日常活动量：{activity_label}，健康目标：{goal}。"
@@ -234,10 +188,19 @@ if user_input:
         st.markdown(user_input)
 
     with st.chat_message("assistant"):
-        with st.spinner("思考中..."):
-            # 不把第一条欢迎语传入模型，避免污染上下文
-            messages_history = st.session_state.messages[1:]
-            answer = ask_smartdiet_agent(messages_history, user_profile=user_profile)
-        st.markdown(answer)
+        # 不把第一条欢迎语传入模型，避免污染上下文
+        messages_history = st.session_state.messages[1:]
+        stream_metrics: dict[str, float] = {}
+        answer = st.write_stream(
+            stream_smartdiet_agent(
+                messages_history,
+                user_profile=user_profile,
+                nutrition_targets=nutrition_targets,
+                metrics=stream_metrics,
+                history_state=st.session_state.setdefault("history_summary", {}),
+            )
+        )
+        if "ttft" in stream_metrics:
+            st.caption(f"⏱️ 首字延迟 {stream_metrics['ttft']:.2f}s · 总耗时 {stream_metrics['total']:.2f}s")
 
     st.session_state.messages.append({"role": "assistant", "content": answer})
\ No newline at end of file
@@ -1,15 +1,23 @@
-import json
+import argparse
 import os
+import queue
+import random
 import re
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 
 import django
 import openai
-from openai import OpenAI
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
 django.setup()
 
-from recipes.models import Recipe  # noqa: E402
+from json_stream import JsonObjectStream  # noqa: E402
+from llm_cache import ResponseCache, get_response_cache  # noqa: E402
+from llm_client import TokenBucket, get_client, resolve_model_name  # noqa: E402
+from recipes.ingest import DEFAULT_BATCH_SIZE, ingest_recipes  # noqa: E402
 
 
 def _require_api_key() -> str:
@@ -72,17 +80,42 @@ def _offline_recipes() -> list[dict]:
     ]
 
 
-def _extract_json_array(text: str) -> str:
-    raw = (text or "").strip()
-    if raw.startswith("```"):
-        raw = raw.split("\n", 1)[-1]
-        if raw.endswith("```"):
-            raw = raw[:-3].strip()
-    start = raw.find("[")
-    end = raw.rfind("]")
-    if start == -1 or end == -1 or end < start:
-        return raw
-    return raw[start : end + 1]
+def _build_messages(count: int = 10, focus: str = "减脂、增肌、日常平衡") -> list[dict[str, str]]:
+    prompt = f"""
+你是一个精通《中国居民膳食指南（2022）》的专业营养师。
+请帮我生成 {count} 个适合不同人群的健康食谱（包括{focus}）。
+
+请严格按照以下 JSON 数组格式输出，不要包含任何其他说明文字（不要使用 Markdown 代码块，直接输出纯 JSON）：
+[
+  {{
+    "name": "食谱名称",
+    "calories": 350,
+    "protein": 25.5,
+    "carbs": 30.0,
+    "fats": 10.0,
+    "ingredients": "食材1 100g, 食材2 50g",
+    "instructions": "第一步...第二步..."
+  }}
+]
+""".strip()
+    return [
+        {
+            "role": "system",
+            "content": "你是一个严格输出 JSON 的机器，只输出有效的 JSON 数组，不包含任何多余文字和 Markdown 标记。",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _print_insufficient_balance(error: Exception) -> None:
+    print(
+        "DeepSeek 返回 402 Insufficient Balance：当前 Key 余额不足/未开通计费，无法调用模型。\n"
+        "解决方案：\n"
+        "1) 登录 DeepSeek 控制台为该 Key 充值/开通计费后重试；或\n"
+        "2) 临时用离线模式跑通演示：$env:SMARTDIET_OFFLINE='1'\n"
+        "原始错误："
+    )
+    print(error)
 
 
 def _to_float(value: object, default: float = 0.0) -> float:
@@ -108,116 +141,373 @@ def _to_int(value: object, default: int = 0) -> int:
         return default
 
 
+def _coerce_recipe(data: object) -> dict | None:
+    """把模型输出的一项转换成 Recipe 字段字典；缺少名称的项返回 None。"""
+    if not isinstance(data, dict) or not str(data.get("name") or "").strip():
+        return None
+    return {
+        "name": str(data["name"]).strip(),
+        "calories": _to_int(data.get("calories", 0)),
+        "protein": _to_float(data.get("protein", 0.0)),
+        "carbs": _to_float(data.get("carbs", 0.0)),
+        "fats": _to_float(data.get("fats", 0.0)),
+        "ingredients": str(data.get("ingredients", "")),
+        "instructions": str(data.get("instructions", "")),
+    }
+
+
+def _ingest_batch_size() -> int:
+    try:
+        return max(1, int(os.getenv("SMARTDIET_INGEST_BATCH_SIZE", str(DEFAULT_BATCH_SIZE))))
+    except ValueError:
+        return DEFAULT_BATCH_SIZE
+
+
+def _iter_completion_text(stream) -> Iterator[str]:
+    """逐片取出流式响应的文本增量。"""
+    try:
+        for chunk in stream:
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+    finally:
+        stream.close()
+
+
+def _cache_when_complete(chunks: Iterable[str], cache: ResponseCache, cache_key: str) -> Iterator[str]:
+    """原样转发文本片段；只有完整读完时才把拼好的全文写入响应缓存。"""
+    parts: list[str] = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    raw_text = "".join(parts)
+    if raw_text:
+        cache.set(cache_key, raw_text)
+
+
+def _stream_recipes(chunks: Iterable[str], counts: dict[str, int]) -> Iterator[dict]:
+    """增量解析模型输出：每个食谱对象的右花括号一到就清洗并产出，坏掉的对象只丢它自己。
+
+    counts 累计 recipes（有效食谱）与 invalid（JSON 损坏或缺少名称的对象）。
+    """
+    counts.setdefault("recipes", 0)
+    counts.setdefault("invalid", 0)
+    parser = JsonObjectStream()
+    show_output = os.getenv("SMARTDIET_SHOW_MODEL_OUTPUT") in {"1", "true", "TRUE", "yes", "YES"}
+    preview: list[str] = []
+    preview_len = 0
+    try:
+        for chunk in chunks:
+            if show_output and preview_len < 2000:
+                preview.append(chunk[: 2000 - preview_len])
+                preview_len += len(preview[-1])
+            for obj in parser.feed(chunk):
+                recipe = _coerce_recipe(obj)
+                if recipe is None:
+                    counts["invalid"] += 1
+                    continue
+                counts["recipes"] += 1
+                yield recipe
+    finally:
+        counts["invalid"] += parser.errors
+        if show_output:
+            print("--- DeepSeek 原始输出（截断）---")
+            print("".join(preview))
+            print("--- 结束 ---")
+        if parser.pending:
+            print("提示：模型输出在某个食谱对象中途结束，这个不完整的食谱已丢弃。")
+
+
 def generate_and_save_recipes() -> None:
     offline = os.getenv("SMARTDIET_OFFLINE") in {"1", "true", "TRUE", "yes", "YES"}
+    counts: dict[str, int] = {}
     if offline:
         print("离线模式：不调用 DeepSeek，直接写入示例食谱数据...")
-        recipes_data = _offline_recipes()
+        recipes = (recipe for recipe in map(_coerce_recipe, _offline_recipes()) if recipe is not None)
     else:
         api_key = _require_api_key()
-        client = OpenAI(
-            api_key=api_key,
-            base_url=os.getenv("DEEPSEEK_BASE_URL") or "https://api.deepseek.com",
-        )
-        model_name = os.getenv("DEEPSEEK_MODEL") or "deepseek-chat"
+        client = get_client(api_key)
+        model_name = resolve_model_name()
 
         print("正在呼叫 SmartDiet-Agent (DeepSeek) 生成专业食谱数据...")
 
-        prompt = """
-你是一个精通《中国居民膳食指南（2022）》的专业营养师。
-请帮我生成 10 个适合不同人群的健康食谱（包括减脂、增肌、日常平衡）。
+        messages = _build_messages()
 
-请严格按照以下 JSON 数组格式输出，不要包含任何其他说明文字（不要使用 Markdown 代码块，直接输出纯 JSON）：
-[
-  {
-    "name": "食谱名称",
-    "calories": 350,
-    "protein": 25.5,
-    "carbs": 30.0,
-    "fats": 10.0,
-    "ingredients": "食材1 100g, 食材2 50g",
-    "instructions": "第一步...第二步..."
-  }
-]
-""".strip()
+        # temperature=0 的请求是确定性的，开启 SMARTDIET_LLM_CACHE 时直接复用上次的输出
+        cache = get_response_cache()
+        cache_key = cache.make_key(model_name, messages, temperature=0) if cache is not None else None
+        raw_text = cache.get(cache_key) if cache is not None else None
+        if raw_text is not None:
+            print("命中 LLM 响应缓存，跳过 DeepSeek 调用。")
+            chunks: Iterable[str] = [raw_text]
+        else:
+            try:
+                stream = client.chat.completions.create(
+                    model=model_name,
+                    messages=messages,
+                    temperature=0,
+                    stream=True,
+                )
+            except openai.APIStatusError as e:
+                if getattr(e, "status_code", None) == 402:
+                    _print_insufficient_balance(e)
+                    raise
+                print(f"请求 DeepSeek 失败：{e}")
+                raise
+            except Exception as e:
+                print(f"请求 DeepSeek 失败：{e}")
+                raise
+
+            chunks = _iter_completion_text(stream)
+            if cache is not None:
+                chunks = _cache_when_complete(chunks, cache, cache_key)
+
+        # 流式解析：每个食谱对象一闭合就进入入库批次，输出中途断掉时已解析的部分照常入库
+        recipes = _stream_recipes(chunks, counts)
+
+    try:
+        result = ingest_recipes(recipes, batch_size=_ingest_batch_size(), commit_every_batch=True)
+    except Exception as e:
+        print(f"生成过程中断：{e}（中断前已解析出的 {counts.get('recipes', 0)} 个食谱已入库）")
+        raise
+
+    if counts.get("invalid"):
+        print(f"有 {counts['invalid']} 个食谱对象 JSON 损坏或缺少名称，已跳过。")
+    print(
+        f"完成：本次新增 {result.created} 个食谱，跳过重名 {result.skipped} 个，"
+        f"耗时 {result.elapsed:.2f}s（{result.rows_per_second:.0f} 行/秒）。"
+    )
+    if result.created == 0:
+        print(
+            "提示：没有新食谱入库。常见原因是模型输出的 JSON 不符合预期（字段缺失/数组为空），"
+            "或生成的 name 与库里已有重名被去重跳过。\n"
+            "你可以设置环境变量 SMARTDIET_SHOW_MODEL_OUTPUT=1 来打印模型原始输出用于排查。"
+        )
+
+
+# ==========================================
+# 并发批量生成：N 个请求并发 + 令牌桶限速 + 429/5xx 指数退避
+# ==========================================
+# 每个请求独立流式解析，坏掉的对象只丢它自己；解析出的食谱边产出边流入 ingest_recipes。
+GENERATION_FOCUSES = (
+    "减脂、低脂高蛋白",
+    "增肌、高蛋白",
+    "日常平衡、家常菜",
+    "早餐、快手",
+    "素食、植物蛋白",
+    "低 GI、控糖",
+    "高纤维、粗粮",
+    "地方菜系的健康改良版",
+)
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class InsufficientBalanceError(RuntimeError):
+    pass
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        status = getattr(error, "status_code", 0) or 0
+        return status in RETRYABLE_STATUS or status >= 500
+    return False
 
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _open_stream_with_backoff(
+    client,
+    model_name: str,
+    messages: list[dict[str, str]],
+    *,
+    bucket: TokenBucket | None,
+    max_retries: int,
+    base_delay: float,
+    stats: dict[str, int],
+    stats_lock: threading.Lock,
+) -> openai.Stream:
+    """发起一次流式生成请求；429/5xx/网络错误按 base_delay·2^n（带抖动，优先 Retry-After）重试。
+
+    重试只覆盖建立请求这一步：流读到一半断开时，已解析出的食谱保留，这个请求记为失败。
+    """
+    attempt = 0
+    while True:
+        if bucket is not None:
+            bucket.acquire()
         try:
-            response = client.chat.completions.create(
+            return client.chat.completions.create(
                 model=model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个严格输出 JSON 的机器，只输出有效的 JSON 数组，不包含任何多余文字和 Markdown 标记。",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0,
+                messages=messages,
+                temperature=0.9,
+                stream=True,
             )
         except openai.APIStatusError as e:
             if getattr(e, "status_code", None) == 402:
-                print(
-                    "DeepSeek 返回 402 Insufficient Balance：当前 Key 余额不足/未开通计费，无法调用模型。\n"
-                    "解决方案：\n"
-                    "1) 登录 DeepSeek 控制台为该 Key 充值/开通计费后重试；或\n"
-                    "2) 临时用离线模式跑通演示：$env:SMARTDIET_OFFLINE='1'\n"
-                    "原始错误："
-                )
-                print(e)
+                raise InsufficientBalanceError(str(e)) from e
+            if not _is_retryable(e) or attempt >= max_retries:
                 raise
-            print(f"请求 DeepSeek 失败：{e}")
-            raise
+            delay = _retry_after(e)
         except Exception as e:
-            print(f"请求 DeepSeek 失败：{e}")
-            raise
+            if not _is_retryable(e) or attempt >= max_retries:
+                raise
+            delay = None
+        if delay is None:
+            delay = base_delay * (2**attempt) * (0.5 + random.random())
+        attempt += 1
+        with stats_lock:
+            stats["retries"] += 1
+        time.sleep(delay)
 
-        raw_text = response.choices[0].message.content or ""
-        raw_text = _extract_json_array(raw_text)
 
-        if os.getenv("SMARTDIET_SHOW_MODEL_OUTPUT") in {"1", "true", "TRUE", "yes", "YES"}:
-            print("--- DeepSeek 原始输出（截断）---")
-            print(raw_text[:2000])
-            print("--- 结束 ---")
+def generate_recipes_concurrently(
+    requests: int,
+    *,
+    per_request: int = 10,
+    concurrency: int = 4,
+    rate: float = 2.0,
+    burst: float | None = None,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    stats: dict[str, int] | None = None,
+) -> Iterator[dict]:
+    """并发发出 requests 个流式生成请求，食谱对象一闭合就经队列交给调用方逐个产出。
 
+    concurrency 限制同时在途的请求数，rate/burst 是每秒请求数的令牌桶（rate<=0 不限速）。
+    stats 传入时会累计 ok/failed/retries/recipes/invalid。遇到 402 余额不足时不再发新请求，
+    已在途的请求照常收尾。
+    """
+    stats = stats if stats is not None else {}
+    for key in ("ok", "failed", "retries", "recipes", "invalid"):
+        stats.setdefault(key, 0)
+    stats_lock = threading.Lock()
+    client = get_client(_require_api_key()).with_options(max_retries=0)
+    model_name = resolve_model_name()
+    bucket = TokenBucket(rate, burst) if rate > 0 else None
+    # 工作线程只负责网络与解析，食谱经队列交回调用线程，ORM 写入始终留在调用线程
+    results: "queue.Queue[dict | tuple[int, BaseException | None]]" = queue.Queue()
+
+    def run(index: int) -> None:
+        counts: dict[str, int] = {}
+        error: BaseException | None = None
         try:
-            recipes_data = json.loads(raw_text)
-        except json.JSONDecodeError:
-            print("解析 JSON 失败，返回内容如下：")
-            print(raw_text)
-            return
-
-        if not isinstance(recipes_data, list):
-            print("模型输出不是 JSON 数组，返回内容如下：")
-            print(raw_text)
-            return
-
-    count = 0
-    for data in recipes_data:
-        if not isinstance(data, dict) or "name" not in data:
-            continue
-
-        recipe, created = Recipe.objects.get_or_create(
-            name=str(data["name"]).strip(),
-            defaults={
-                "calories": _to_int(data.get("calories", 0)),
-                "protein": _to_float(data.get("protein", 0.0)),
-                "carbs": _to_float(data.get("carbs", 0.0)),
-                "fats": _to_float(data.get("fats", 0.0)),
-                "ingredients": str(data.get("ingredients", "")),
-                "instructions": str(data.get("instructions", "")),
-            },
-        )
-        if created:
-            count += 1
-            print(f"成功入库: {recipe.name} ({recipe.calories} kcal)")
+            messages = _build_messages(per_request, GENERATION_FOCUSES[index % len(GENERATION_FOCUSES)])
+            stream = _open_stream_with_backoff(
+                client,
+                model_name,
+                messages,
+                bucket=bucket,
+                max_retries=max_retries,
+                base_delay=base_delay,
+                stats=stats,
+                stats_lock=stats_lock,
+            )
+            for recipe in _stream_recipes(_iter_completion_text(stream), counts):
+                results.put(recipe)
+        except BaseException as e:
+            error = e
+        finally:
+            with stats_lock:
+                stats["recipes"] += counts.get("recipes", 0)
+                stats["invalid"] += counts.get("invalid", 0)
+            results.put((index, error))
 
-    print(f"完成：本次共生成并保存了 {count} 个新食谱到数据库中。")
-    if count == 0:
-        print(
-            "提示：没有新食谱入库。常见原因是模型输出的 JSON 不符合预期（字段缺失/数组为空），"
-            "或生成的 name 与库里已有重名导致 get_or_create 未新增。\n"
-            "你可以设置环境变量 SMARTDIET_SHOW_MODEL_OUTPUT=1 来打印模型原始输出用于排查。"
-        )
+    submitted = 0
+    inflight = 0
+    stopped = False
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="recipe-gen") as pool:
+        while inflight or (submitted < requests and not stopped):
+            # 只保持 concurrency 个在途请求，避免一次性把几千个请求都塞进线程池队列
+            while not stopped and submitted < requests and inflight < max(1, concurrency):
+                pool.submit(run, submitted)
+                submitted += 1
+                inflight += 1
+            item = results.get()
+            if isinstance(item, dict):
+                yield item
+                continue
+            inflight -= 1
+            index, error = item
+            if error is None:
+                stats["ok"] += 1
+            elif isinstance(error, InsufficientBalanceError):
+                stats["failed"] += 1
+                if not stopped:
+                    _print_insufficient_balance(error)
+                stopped = True
+            else:
+                stats["failed"] += 1
+                print(f"第 {index + 1} 个请求失败，已跳过（已解析出的食谱照常入库）：{error}")
+
+
+def generate_and_save_recipes_concurrently(
+    requests: int,
+    *,
+    per_request: int = 10,
+    concurrency: int = 4,
+    rate: float = 2.0,
+    burst: float | None = None,
+    max_retries: int = 5,
+    batch_size: int | None = None,
+) -> None:
+    print(f"并发生成：{requests} 个请求 × 每个 {per_request} 个食谱，并发 {concurrency}，限速 {rate}/s ...")
+    stats: dict[str, int] = {}
+    started = time.perf_counter()
+    result = ingest_recipes(
+        generate_recipes_concurrently(
+            requests,
+            per_request=per_request,
+            concurrency=concurrency,
+            rate=rate,
+            burst=burst,
+            max_retries=max_retries,
+            stats=stats,
+        ),
+        batch_size=batch_size or _ingest_batch_size(),
+        commit_every_batch=True,
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        f"完成：请求成功 {stats['ok']} / 失败 {stats['failed']}，重试 {stats['retries']} 次；"
+        f"解析出 {stats['recipes']} 个食谱（损坏/无效 {stats['invalid']} 个），新增 {result.created} 个，跳过重名 {result.skipped} 个；"
+        f"总耗时 {elapsed:.1f}s。"
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="调用 DeepSeek 生成食谱并写入数据库")
+    parser.add_argument("--requests", type=int, default=1, help="生成请求数；大于 1 时进入并发批量模式")
+    parser.add_argument("--per-request", type=int, default=10, help="每个请求生成的食谱数")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时在途的请求数上限")
+    parser.add_argument("--rate", type=float, default=2.0, help="每秒最多发出的请求数（<=0 不限速）")
+    parser.add_argument("--burst", type=float, default=None, help="令牌桶容量，默认等于 rate")
+    parser.add_argument("--max-retries", type=int, default=5, help="429/5xx 的最大重试次数")
+    parser.add_argument("--batch-size", type=int, default=None, help="bulk_create 每批行数")
+    args = parser.parse_args(argv)
+
+    offline = os.getenv("SMARTDIET_OFFLINE") in {"1", "true", "TRUE", "yes", "YES"}
+    if args.requests <= 1 or offline:
+        generate_and_save_recipes()
+        return
+    generate_and_save_recipes_concurrently(
+        args.requests,
+        per_request=args.per_request,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        burst=args.burst,
+        max_retries=args.max_retries,
+        batch_size=args.batch_size,
+    )
 
 
 if __name__ == "__main__":
-    generate_and_save_recipes()
+    main()
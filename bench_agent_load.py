@@ -0,0 +1,84 @@
+"""
+异步 Agent 压测：本地起一个假的 OpenAI 兼容接口（固定延迟），分别以 1/10/100 个并发会话
+调用 agent_async.ask_smartdiet_agent_async，输出吞吐、延迟分位与实际上游调用次数。
+
+用法：python bench_agent_load.py --sessions 200 --concurrency 1,10,100 --latency-ms 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from fake_llm_server import FakeLLMServer
+
+
+async def _run_level(sessions: int, concurrency: int, unique_ratio: float) -> dict[str, float]:
+    import agent_async
+
+    distinct = max(1, int(sessions * unique_ratio))
+    gate = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    before = agent_async.async_stats()
+
+    async def one(i: int) -> None:
+        history = [{"role": "user", "content": f"我想吃高蛋白晚餐（会话 {i % distinct}）"}]
+        async with gate:
+            started = time.perf_counter()
+            await agent_async.ask_smartdiet_agent_async(history, nutrition_targets={"calories": 1800})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    after = agent_async.async_stats()
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "rps": sessions / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "upstream_calls": after["upstream_calls"] - before["upstream_calls"],
+        "coalesced": after["coalesced"] - before["coalesced"],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SmartDiet 异步 Agent 压测")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,10,100")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--max-inflight", type=int, default=32)
+    parser.add_argument("--unique-ratio", type=float, default=1.0, help="不同请求占比；<1 时可观察请求合并效果")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.latency_ms / 1000).start()
+    os.environ["DEEPSEEK_BASE_URL"] = server.url
+    os.environ["DEEPSEEK_API_KEY"] = "bench"
+    os.environ["SMARTDIET_MAX_INFLIGHT"] = str(args.max_inflight)
+    os.environ["SMARTDIET_HTTP_MAX_CONNECTIONS"] = str(args.max_inflight)
+    os.environ.pop("SMARTDIET_LLM_CACHE", None)
+
+    # agent_core 导入时会同步执行建表/初始化，必须在事件循环启动之前导入
+    import agent_async  # noqa: F401
+
+    async def run_all() -> None:
+        from llm_client import aclose_async_clients
+
+        print(f"{'并发':>6} {'req/s':>10} {'p50(ms)':>10} {'p99(ms)':>10} {'上游调用':>8} {'合并':>6}")
+        for level in [int(x) for x in args.concurrency.split(",") if x.strip()]:
+            row = await _run_level(args.sessions, level, args.unique_ratio)
+            print(
+                f"{row['concurrency']:>6} {row['rps']:>10.1f} {row['p50_ms']:>10.1f} "
+                f"{row['p99_ms']:>10.1f} {row['upstream_calls']:>8} {row['coalesced']:>6}"
+            )
+        await aclose_async_clients()
+
+    asyncio.run(run_all())
+    server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+"""
+只读 JSON API 基准：在临时 SQLite 库里写入 N 道随机食谱和一个带一周计划的用户，
+用 Django 测试客户端（不经网络，走完整的中间件与视图）逐个场景连续请求，统计请求/秒与延迟分位数。
+
+每个食谱场景都跑两遍：不带校验头的完整响应，以及带上首个响应 ETag 的条件请求（应返回 304）。
+库建在临时目录里，不会碰项目的 db.sqlite3。
+
+用法：python bench_api.py --recipes 10000 --requests 500
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date
+
+import django
+from django.conf import settings
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="smartdiet-bench-"), "bench.sqlite3")
+settings.DATABASES["default"]["NAME"] = DB_PATH
+# DEBUG 下每条 SQL 都会记进 connection.queries，压测时关掉
+settings.DEBUG = False
+settings.ALLOWED_HOSTS = ["localhost"]
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from recipes.ingest import ingest_recipes  # noqa: E402
+from users.models import CustomUser  # noqa: E402
+
+START = date(2026, 1, 5)
+INGREDIENTS = ("鸡胸肉", "鸡蛋", "牛奶", "燕麦", "西兰花", "三文鱼", "牛肉", "豆腐", "米饭", "番茄", "虾仁", "菠菜")
+
+
+def _populate(n_recipes: int, rng: random.Random) -> CustomUser:
+    call_command("migrate", verbosity=0)
+    records = []
+    for i in range(n_recipes):
+        protein, carbs, fats = rng.uniform(5, 60), rng.uniform(5, 110), rng.uniform(2, 40)
+        picked = rng.sample(INGREDIENTS, 3)
+        records.append(
+            {
+                "name": f"{picked[0]}{picked[1]}餐 {i}",
+                "calories": max(round(protein * 4 + carbs * 4 + fats * 9 + rng.uniform(-20, 20)), 50),
+                "protein": round(protein, 1),
+                "carbs": round(carbs, 1),
+                "fats": round(fats, 1),
+                "ingredients": "、".join(f"{name} {rng.randint(50, 200)}g" for name in picked),
+                "instructions": "略",
+            }
+        )
+    ingest_recipes(records)
+    user = CustomUser.objects.create(
+        username="bench", gender="female", age=32, height=165, weight=60, activity_level=1.55, goal="lose"
+    )
+    call_command("compute_targets", verbosity=0)
+    call_command("generate_plans", start=START, verbosity=0)
+    return user
+
+
+def _run(client: Client, label: str, url: str, n: int, **headers) -> str | None:
+    first = client.get(url, **headers)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        response = client.get(url, **headers)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    wall = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{label:<24} {response.status_code}  {n / wall:>7.0f} 请求/秒  p50 {statistics.median(latencies):6.2f}ms"
+        f"  p95 {latencies[int(n * 0.95)]:6.2f}ms  {len(response.content):>6} 字节"
+    )
+    return first.get("ETag")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="只读 JSON API：请求/秒与条件请求收益")
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500, help="每个场景的请求数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    user = _populate(args.recipes, rng)
+    print(f"临时库 {DB_PATH}：{args.recipes} 道食谱，准备耗时 {time.perf_counter() - started:.2f}s")
+
+    client = Client(SERVER_NAME="localhost")
+    scenarios = {
+        "食谱列表首页": "/api/recipes/?limit=20",
+        "食谱列表深翻页": f"/api/recipes/?limit=20&cursor={args.recipes * 9 // 10}",
+        "营养区间筛选": "/api/recipes/?calories_min=300&calories_max=500&protein_min=25",
+        "食材全文检索": "/api/recipes/?q=三文鱼,西兰花",
+        "结构化食材筛选": "/api/recipes/?ingredients=鸡胸肉&exclude=牛奶",
+        "食谱详情": "/api/recipes/1/",
+    }
+    for label, url in scenarios.items():
+        etag = _run(client, label, url, args.requests)
+        _run(client, f"{label}（304）", url, args.requests, HTTP_IF_NONE_MATCH=etag)
+    _run(client, "营养目标计算", "/api/targets/?gender=male&age=30&height=175&weight=70&activity=1.55", args.requests)
+
+    client.force_login(user)
+    url = f"/api/plans/?start={START.isoformat()}&days=7"
+    etag = _run(client, "一周计划", url, args.requests)
+    _run(client, "一周计划（304）", url, args.requests, HTTP_IF_NONE_MATCH=etag)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,74 @@
+"""
+sklearn 随机森林 (.pkl) 与导出的纯 NumPy 森林 (.npz) 对比：加载耗时、文件大小、单行/小批量推理延迟，
+并在 train_ml_model.py 的留出集上校验两者预测逐条一致。
+
+用法：python train_ml_model.py && python bench_compiled_forest.py --repeat 200
+"""
+import argparse
+import os
+import statistics
+import time
+import warnings
+
+import joblib
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from diet_planner.compiled_forest import load_compiled_forest
+from train_ml_model import _build_synthetic_dataset
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "diet_planner", "ml_models")
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="sklearn vs NumPy 森林推理基准")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pkl_path = os.path.join(MODEL_DIR, "diet_model_v1.pkl")
+    npz_path = os.path.join(MODEL_DIR, "diet_model_v1.npz")
+
+    started = time.perf_counter()
+    sk_model = joblib.load(pkl_path)
+    sk_load = time.perf_counter() - started
+    started = time.perf_counter()
+    np_model = load_compiled_forest(npz_path)
+    np_load = time.perf_counter() - started
+
+    df = _build_synthetic_dataset(n=1000, seed=42)
+    X = df[["age", "weight", "height", "activity_level"]]
+    _, X_test, _, y_test = train_test_split(X, df["target"], test_size=0.2, random_state=42, stratify=df["target"])
+    X_test_np = X_test.to_numpy()
+
+    sk_pred = sk_model.predict(X_test)
+    np_pred = np_model.predict(X_test_np)
+    print(f"留出集准确率 sklearn={np.mean(sk_pred == y_test.to_numpy()):.4f} "
+          f"numpy={np.mean(np_pred == y_test.to_numpy()):.4f} 逐条一致={np.array_equal(sk_pred, np_pred)}")
+
+    one_row = X_test_np[:1]
+    few_rows = X_test_np[:8]
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        rows = [
+            ("sklearn .pkl", pkl_path, sk_load, sk_model),
+            ("numpy .npz", npz_path, np_load, np_model),
+        ]
+        print(f"{'model':<14} {'file(KB)':>10} {'load(ms)':>10} {'1 row(ms)':>10} {'8 rows(ms)':>11}")
+        for name, path, load_s, model in rows:
+            single = _median_ms(lambda: model.predict(one_row), args.repeat)
+            batch = _median_ms(lambda: model.predict(few_rows), args.repeat)
+            print(f"{name:<14} {os.path.getsize(path) / 1024:>10.1f} {load_s * 1000:>10.1f} {single:>10.3f} {batch:>11.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
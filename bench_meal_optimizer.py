@@ -0,0 +1,86 @@
+"""
+一日膳食优化器基准：随机生成 N 道食谱的营养矩阵（默认 1 万道，不需要数据库），
+按 app.py 的方式为一批随机用户算出营养目标，逐个求解，统计求解耗时、搜索规模与达标率。
+
+用法：python bench_meal_optimizer.py --recipes 10000 --users 200
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+import numpy as np
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
+django.setup()
+
+from diet_planner.nutrition import ACTIVITY_FACTORS, compute_targets  # noqa: E402
+from diet_planner.optimizer import DEFAULT_TOP_K, RecipeMatrix, optimize_day  # noqa: E402
+
+
+def _synthetic_matrix(n: int, rng: np.random.Generator) -> RecipeMatrix:
+    protein = rng.uniform(5, 60, n)
+    carbs = rng.uniform(5, 110, n)
+    fats = rng.uniform(2, 40, n)
+    calories = np.maximum(np.round(protein * 4 + carbs * 4 + fats * 9 + rng.uniform(-20, 20, n)), 50)
+    return RecipeMatrix(np.arange(1, n + 1, dtype=np.int64), np.column_stack([calories, protein, carbs, fats]))
+
+
+def _synthetic_targets(n: int, rng: np.random.Generator) -> list[dict[str, float]]:
+    targets = compute_targets(
+        rng.choice(["male", "female"], n),
+        rng.integers(18, 70, n),
+        rng.uniform(150, 195, n),
+        rng.uniform(45, 110, n),
+        rng.choice(ACTIVITY_FACTORS, n),
+        rng.choice(["lose", "maintain", "gain"], n),
+    )
+    return [
+        {
+            "calories": float(targets["target_calories"][i]),
+            "protein": float(targets["protein_g"][i]),
+            "carbs": float(targets["carbs_g"][i]),
+            "fats": float(targets["fat_g"][i]),
+        }
+        for i in range(n)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="一日膳食优化器：求解耗时与达标率")
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    matrix = _synthetic_matrix(args.recipes, rng)
+    users = _synthetic_targets(args.users, rng)
+    # 预热：首次调用有 NumPy 内部缓冲区分配等一次性开销
+    optimize_day(matrix, users[0], top_k=args.top_k)
+
+    elapsed: list[float] = []
+    nodes: list[int] = []
+    feasible = 0
+    started = time.perf_counter()
+    for targets in users:
+        plan = optimize_day(matrix, targets, top_k=args.top_k)
+        elapsed.append(plan.elapsed * 1000)
+        nodes.append(plan.nodes)
+        feasible += plan.within_tolerance
+    wall = time.perf_counter() - started
+
+    elapsed.sort()
+    print(f"{args.recipes} 道食谱 × {args.users} 个用户，每餐候选 {args.top_k} 道")
+    print(
+        f"求解耗时 p50 {statistics.median(elapsed):.2f}ms  p95 {elapsed[int(len(elapsed) * 0.95)]:.2f}ms"
+        f"  max {elapsed[-1]:.2f}ms  （{args.users / wall:.0f} 计划/秒）"
+    )
+    print(f"评估组合数中位数 {statistics.median(nodes):.0f}，达标 {feasible}/{args.users}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
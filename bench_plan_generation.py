@@ -0,0 +1,116 @@
+"""
+批量排餐基准：在临时 SQLite 库里造 N 个随机用户（默认 10 万）和一批随机食谱，
+用 compute_targets 算出营养目标，再跑 manage.py generate_plans 为每人生成一周计划，统计：
+
+1. 首次全量生成：用户/秒、写入的计划与条目数；
+2. 原样重跑：所有用户计划已齐全，应当全部跳过（中断后续跑走的就是这条路径）；
+3. 删掉一部分用户的计划后重跑：只补这些用户。
+
+库建在临时目录里，不会碰项目的 db.sqlite3。
+
+用法：python bench_plan_generation.py --users 100000 --recipes 5000 --workers 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+import django
+from django.conf import settings
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="smartdiet-bench-"), "bench.sqlite3")
+settings.DATABASES["default"]["NAME"] = DB_PATH
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+
+from diet_planner.models import DietPlan, DietPlanItem  # noqa: E402
+from diet_planner.nutrition import ACTIVITY_FACTORS  # noqa: E402
+from recipes.ingest import ingest_recipes  # noqa: E402
+from users.models import CustomUser  # noqa: E402
+
+START = date(2026, 1, 5)
+
+
+def _populate(n_users: int, n_recipes: int, rng: random.Random) -> None:
+    call_command("migrate", verbosity=0)
+    records = []
+    for i in range(n_recipes):
+        protein, carbs, fats = rng.uniform(5, 60), rng.uniform(5, 110), rng.uniform(2, 40)
+        records.append(
+            {
+                "name": f"基准食谱 {i}",
+                "calories": max(round(protein * 4 + carbs * 4 + fats * 9 + rng.uniform(-20, 20)), 50),
+                "protein": round(protein, 1),
+                "carbs": round(carbs, 1),
+                "fats": round(fats, 1),
+                "ingredients": "鸡胸肉 100g, 米饭 150g",
+                "instructions": "略",
+            }
+        )
+    ingest_recipes(records)
+    CustomUser.objects.bulk_create(
+        [
+            CustomUser(
+                username=f"bench{i}",
+                password="!",
+                gender=rng.choice(["male", "female"]),
+                age=rng.randint(18, 70),
+                height=round(rng.uniform(150, 195)),
+                weight=round(rng.uniform(45, 110)),
+                activity_level=rng.choice(ACTIVITY_FACTORS),
+                goal=rng.choice(["lose", "maintain", "gain"]),
+            )
+            for i in range(n_users)
+        ],
+        batch_size=5000,
+    )
+    call_command("compute_targets", verbosity=0)
+
+
+def _timed_run(label: str, **options) -> float:
+    print(f"--- {label}")
+    started = time.perf_counter()
+    call_command("generate_plans", start=START, verbosity=0, **options)
+    elapsed = time.perf_counter() - started
+    print(f"{label}：{elapsed:.2f}s")
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="generate_plans：全量生成、原样重跑与部分补跑")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--recipes", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--redo", type=float, default=0.01, help="第三轮删掉计划重新生成的用户比例")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    _populate(args.users, args.recipes, rng)
+    print(f"临时库 {DB_PATH}：{args.users} 个用户、{args.recipes} 道食谱，准备耗时 {time.perf_counter() - started:.2f}s")
+
+    options = {"days": args.days, "workers": args.workers, "chunk_size": args.chunk_size}
+    elapsed = _timed_run("首次全量生成", **options)
+    print(
+        f"计划 {DietPlan.objects.count()} 份，条目 {DietPlanItem.objects.count()} 条，"
+        f"{args.users / elapsed:.0f} 用户/秒"
+    )
+    _timed_run("原样重跑（应全部跳过）", **options)
+
+    redo = rng.sample(range(1, args.users + 1), max(int(args.users * args.redo), 1))
+    DietPlan.objects.filter(user_id__in=redo[:1], date=START).delete()
+    DietPlan.objects.filter(user_id__in=redo[1:]).delete()
+    _timed_run(f"删掉 {len(redo)} 个用户的计划后补跑", **options)
+    print(f"计划 {DietPlan.objects.count()} 份（应为 {args.users * args.days}）")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
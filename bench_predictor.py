@@ -0,0 +1,66 @@
+"""
+侧边栏策略预测的单次调用延迟对比：
+- legacy：原 app.py 写法（单行 pandas.DataFrame + model.predict，模型已预加载，不计 joblib.load）
+- service(miss)：StrategyPredictor 缓存未命中（预分配 NumPy 行 + model.predict）
+- service(hit)：StrategyPredictor 缓存命中（只动侧边栏的目标/性别时的常见情况）
+
+用法：python bench_predictor.py --repeat 200
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
+django.setup()
+
+import pandas as pd  # noqa: E402
+
+from diet_planner.model_registry import registry  # noqa: E402
+from diet_planner.predictor import StrategyPredictor, map_prediction_label  # noqa: E402
+
+
+def _legacy_predict(model, age: int, weight: float, height: float, activity: float) -> str:
+    features = pd.DataFrame(
+        [{"age": int(age), "weight": float(weight), "height": float(height), "activity_level": float(activity)}]
+    )
+    prediction = model.predict(features)
+    return map_prediction_label(prediction[0])
+
+
+def _time_calls(fn, repeat: int) -> list[float]:
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="策略模型预测延迟基准")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    model = registry.get().model
+    predictor = StrategyPredictor(cache_size=args.repeat * 2)
+    inputs = [(20 + i % 40, 50.0 + (i % 120) * 0.5, 150.0 + i % 50, 1.375) for i in range(args.repeat)]
+
+    results = {
+        "legacy": _time_calls(lambda i: _legacy_predict(model, *inputs[i]), args.repeat),
+        "service(miss)": _time_calls(lambda i: predictor.predict(*inputs[i]), args.repeat),
+        "service(hit)": _time_calls(lambda i: predictor.predict(*inputs[i]), args.repeat),
+    }
+    mismatches = sum(_legacy_predict(model, *x) != predictor.predict(*x) for x in inputs)
+
+    print(f"{'path':<15} {'p50(ms)':>10} {'mean(ms)':>10} {'max(ms)':>10}")
+    for name, samples in results.items():
+        print(f"{name:<15} {statistics.median(samples):>10.3f} {statistics.mean(samples):>10.3f} {max(samples):>10.3f}")
+    print(f"标签不一致：{mismatches}/{len(inputs)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
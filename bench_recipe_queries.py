@@ -0,0 +1,125 @@
+"""
+食谱营养区间查询基准：在临时 SQLite 库里生成 N 条食谱（默认 10 万），分别在有/无营养索引时
+测 RecipeQuerySet 几类典型查询的延迟，并打印 SQLite 的查询计划。不会碰项目自己的 db.sqlite3。
+
+用法：python bench_recipe_queries.py --rows 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import django
+from django.conf import settings
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
+# 必须在 django.setup() 之前改库路径，连接是按首次访问时的配置建立的
+_TMP_DIR = tempfile.mkdtemp(prefix="smartdiet-bench-")
+settings.DATABASES["default"]["NAME"] = os.path.join(_TMP_DIR, "bench.sqlite3")
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+
+from recipes.models import Recipe  # noqa: E402
+
+# 一餐目标附近的窄区间查询（agent 选菜时的典型形态），命中率在百分之几以内
+QUERIES = {
+    "480-520kcal & 蛋白≥30g": lambda: Recipe.objects.calories_between(480, 520).protein_between(low=30),
+    "蛋白≥60g & ≤600kcal": lambda: Recipe.objects.protein_between(low=60).calories_between(high=600),
+    "蛋白供能≥55%": lambda: Recipe.objects.protein_ratio_between(low=0.55),
+    "每100kcal蛋白≥14g & 300-450kcal": lambda: Recipe.objects.protein_per_kcal_at_least(14).calories_between(300, 450),
+    "低碳：碳水≤20g & 500-520kcal": lambda: Recipe.objects.calories_between(500, 520).carbs_between(high=20),
+}
+
+
+def _populate(rows: int, seed: int) -> None:
+    rng = random.Random(seed)
+    batch = []
+    # 整个灌数过程放在一个事务里，否则 SQLite 每插一行都要单独提交落盘
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(rows):
+            protein = round(rng.uniform(5, 70), 1)
+            carbs = round(rng.uniform(5, 120), 1)
+            fats = round(rng.uniform(2, 45), 1)
+            calories = int(protein * 4 + carbs * 4 + fats * 9 + rng.uniform(-30, 30))
+            batch.append((f"bench-{i}", max(calories, 50), protein, carbs, fats, "", ""))
+            if len(batch) == 10000:
+                cursor.executemany(
+                    "INSERT INTO recipes_recipe (name, calories, protein, carbs, fats, ingredients, instructions)"
+                    " VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                    batch,
+                )
+                batch.clear()
+        if batch:
+            cursor.executemany(
+                "INSERT INTO recipes_recipe (name, calories, protein, carbs, fats, ingredients, instructions)"
+                " VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                batch,
+            )
+        cursor.execute("ANALYZE")
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _time_query(build, repeat: int) -> tuple[float, float, int]:
+    """返回 (COUNT 耗时, 取回全部命中行耗时, 命中行数)。COUNT 只反映筛选本身，取回还包含建对象的开销。"""
+    count_ms = _median_ms(lambda: build().count(), repeat)
+    fetch_ms = _median_ms(lambda: list(build().values_list("id", "name", "calories", "protein")), repeat)
+    return count_ms, fetch_ms, build().count()
+
+
+def _plan(build) -> str:
+    queryset = build()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return "; ".join(row[-1] for row in cursor.fetchall())
+
+
+def _run(repeat: int) -> dict[str, tuple[float, float, int, str]]:
+    return {name: (*_time_query(build, repeat), _plan(build)) for name, build in QUERIES.items()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="食谱营养区间查询：有/无索引延迟对比")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    started = time.perf_counter()
+    _populate(args.rows, args.seed)
+    print(f"生成 {args.rows} 条食谱，用时 {time.perf_counter() - started:.1f}s（{settings.DATABASES['default']['NAME']}）")
+
+    with_indexes = _run(args.repeat)
+    indexes = Recipe._meta.indexes
+    with connection.schema_editor() as editor:
+        for index in indexes:
+            editor.remove_index(Recipe, index)
+    without_indexes = _run(args.repeat)
+
+    print(f"{'query':<32} {'rows':>6} {'count 索引/扫描(ms)':>22} {'fetch 索引/扫描(ms)':>22}")
+    for name, (count_ms, fetch_ms, rows, plan) in with_indexes.items():
+        scan_count_ms, scan_fetch_ms, _, scan_plan = without_indexes[name]
+        print(
+            f"{name:<32} {rows:>6} {count_ms:>8.2f} / {scan_count_ms:>6.2f} ({scan_count_ms / count_ms:>4.1f}x)"
+            f" {fetch_ms:>8.2f} / {scan_fetch_ms:>6.2f} ({scan_fetch_ms / fetch_ms:>4.1f}x)"
+        )
+        print(f"    有索引：{plan}")
+        print(f"    无索引：{scan_plan}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+"""
+食谱全文检索基准：在临时 SQLite 库里生成 N 条食谱（默认 10 万，食材从常见食材表随机组合），
+对比 FTS5 trigram 检索与纯 LIKE 兜底（recipes.search._search_orm）在几类“含/不含食材”查询上的延迟，
+同时核对两条路径返回的 id 集合一致。不会碰项目自己的 db.sqlite3。
+
+用法：python bench_recipe_search.py --rows 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import django
+from django.conf import settings
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
+# 必须在 django.setup() 之前改库路径，连接是按首次访问时的配置建立的
+_TMP_DIR = tempfile.mkdtemp(prefix="smartdiet-bench-")
+settings.DATABASES["default"]["NAME"] = os.path.join(_TMP_DIR, "bench.sqlite3")
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+
+from recipes.search import _search_orm, recipe_ids_matching, search_recipes  # noqa: E402
+
+INGREDIENTS = (
+    "鸡胸肉", "牛里脊", "三文鱼", "鳕鱼", "虾仁", "鸡蛋", "牛奶", "豆腐", "鹰嘴豆", "藜麦", "燕麦",
+    "全麦面", "糙米", "红薯", "西兰花", "菠菜", "番茄", "黄瓜", "胡萝卜", "彩椒", "洋葱", "香菇",
+    "牛油果", "蓝莓", "香蕉", "核桃", "花生", "橄榄油", "酸奶", "奶酪", "紫甘蓝", "芦笋", "南瓜",
+)
+# 食材出现频率按 Zipf 分布：排在前面的常见食材出现在大量食谱里，靠后的（芦笋、南瓜）只占很少一部分
+INGREDIENT_WEIGHTS = [1.0 / (rank + 1) for rank in range(len(INGREDIENTS))]
+DISHES = ("沙拉", "炒饭", "汤", "碗", "卷", "焗", "炖", "拌", "蒸", "煎")
+COOKING = ("焯水", "煎至两面金黄", "小火慢炖", "大火快炒", "清蒸 8 分钟", "烤箱 200 度烤 15 分钟")
+
+QUERIES = {
+    "含 鸡胸肉（3 字，MATCH）": dict(include=["鸡胸肉"]),
+    "含 牛奶（2 字，LIKE）": dict(include=["牛奶"]),
+    "含 三文鱼 且 不含 花生": dict(include=["三文鱼"], exclude=["花生"]),
+    "含 紫甘蓝（低频）": dict(include=["紫甘蓝"]),
+    "不含 牛奶、鸡蛋、花生": dict(exclude=["牛奶", "鸡蛋", "花生"]),
+    "自由文本：牛油果 全麦面": dict(query="牛油果 全麦面"),
+}
+
+
+def _populate(rows: int, seed: int) -> None:
+    rng = random.Random(seed)
+    sql = (
+        "INSERT INTO recipes_recipe (name, calories, protein, carbs, fats, ingredients, instructions)"
+        " VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    )
+    batch = []
+    # 整个灌数过程放在一个事务里，FTS5 触发器同步写索引
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(rows):
+            count = rng.randint(3, 7)
+            picked: list[str] = []
+            while len(picked) < count:
+                item = rng.choices(INGREDIENTS, weights=INGREDIENT_WEIGHTS)[0]
+                if item not in picked:
+                    picked.append(item)
+            name = f"{picked[0]}{picked[1]}{rng.choice(DISHES)}-{i}"
+            ingredients = "、".join(f"{item} {rng.randint(1, 30) * 10}g" for item in picked)
+            instructions = "；".join(rng.sample(COOKING, 2))
+            batch.append((name, rng.randint(200, 900), 30.0, 40.0, 15.0, ingredients, instructions))
+            if len(batch) == 10000:
+                cursor.executemany(sql, batch)
+                batch.clear()
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="食谱全文检索：FTS5 与 LIKE 延迟对比")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20, help="排序检索取前多少条")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    started = time.perf_counter()
+    _populate(args.rows, args.seed)
+    print(f"生成 {args.rows} 条食谱（含 FTS 索引同步），用时 {time.perf_counter() - started:.1f}s")
+
+    print(
+        f"{'query':<26} {'hits':>7} {'fts top-k(ms)':>14} {'fts 全部(ms)':>13} {'LIKE 全部(ms)':>14}"
+        f" {'include 仅 id(ms)':>18} {'一致':>4}"
+    )
+    for name, spec in QUERIES.items():
+        query = spec.get("query", "")
+        include = spec.get("include", [])
+        exclude = spec.get("exclude", [])
+        fts_all = search_recipes(query, include=include, exclude=exclude, limit=None)
+        like_all = _search_orm(query, include, exclude, None)
+        top_ms = _median_ms(
+            lambda: search_recipes(query, include=include, exclude=exclude, limit=args.limit), args.repeat
+        )
+        all_ms = _median_ms(lambda: search_recipes(query, include=include, exclude=exclude, limit=None), args.repeat)
+        like_ms = _median_ms(lambda: _search_orm(query, include, exclude, None), args.repeat)
+        same = {hit.id for hit in fts_all} == {hit.id for hit in like_all}
+        # agent_core 预过滤走的是 recipe_ids_matching：只取 id、不算 bm25
+        ids_ms = _median_ms(lambda: recipe_ids_matching(include), args.repeat) if include and not exclude else None
+        ids_col = f"{ids_ms:>18.2f}" if ids_ms is not None else f"{'-':>18}"
+        print(
+            f"{name:<26} {len(fts_all):>7} {top_ms:>14.2f} {all_ms:>13.2f} {like_ms:>14.2f}"
+            f" {ids_col} {'是' if same else '否':>4}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,199 @@
+"""
+SQLite 并发读写基准：M 个读进程（模拟多个 Streamlit 会话按热量/蛋白质查食谱）+ 1 个写进程
+（模拟 auto_populate_db.py 用 ingest_recipes 整批写入），分别在两种配置下跑固定时长：
+
+- rollback：改造前的配置，SQLite 默认的回滚日志模式 + DEFERRED 事务；
+- wal：settings 里的默认配置（nutrition_project/sqlite.py 的 "wal" 档 + BEGIN IMMEDIATE）。
+
+统计读吞吐、读延迟分位数、"database is locked" 次数和写入速度。库建在临时目录里，不会碰项目的 db.sqlite3。
+
+回滚日志模式下写者提交（以及页缓存溢出）时要独占整个库，读者全部排队，单个事务写得久了读者就会
+等满 busy_timeout 报锁错误；WAL 下读写互不阻塞。机器核数少时，读者不再被挡住会多占 CPU，
+写进程的行/秒相应下降，这是 CPU 争用而不是锁争用。
+
+用法：python bench_sqlite_concurrency.py --readers 4 --seconds 10 --writer-batch 20000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+CONFIGS = {
+    "rollback": {"profile": "rollback", "transaction_mode": "DEFERRED"},
+    "wal": {"profile": "wal", "transaction_mode": "IMMEDIATE"},
+}
+
+
+def _setup(db_path: str, config: dict) -> None:
+    """子进程（spawn）里初始化 Django，指向基准库并套用指定配置。"""
+    os.environ["DJANGO_SETTINGS_MODULE"] = "nutrition_project.settings"
+    os.environ["SMARTDIET_SQLITE_PROFILE"] = config["profile"]
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = db_path
+    settings.DATABASES["default"]["OPTIONS"]["transaction_mode"] = config["transaction_mode"]
+    django.setup()
+
+
+def _is_locked(exc: Exception) -> bool:
+    return "locked" in str(exc) or "busy" in str(exc)
+
+
+def _reader(db_path: str, config: dict, start, deadline: float, seed: int, results) -> None:
+    _setup(db_path, config)
+    from django.db import OperationalError
+
+    from recipes.models import Recipe
+
+    rng = random.Random(seed)
+    latencies: list[float] = []
+    errors = 0
+    start.wait()
+    while time.time() < deadline:
+        low = rng.randint(200, 800)
+        started = time.perf_counter()
+        try:
+            rows = list(
+                Recipe.objects.calories_between(low, low + 60)
+                .protein_between(low=rng.randint(10, 40))
+                .values_list("id", "name", "calories", "protein")[:20]
+            )
+            Recipe.objects.calories_between(low, low + 60).count()
+        except OperationalError as exc:
+            if not _is_locked(exc):
+                raise
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert rows is not None
+    results.put(("reader", latencies, errors))
+
+
+def _writer(db_path: str, config: dict, start, deadline: float, batch: int, results) -> None:
+    _setup(db_path, config)
+    from django.db import OperationalError
+
+    from recipes.ingest import ingest_recipes
+
+    rng = random.Random(0)
+    written = 0
+    errors = 0
+    serial = 0
+    start.wait()
+    started = time.perf_counter()
+    while time.time() < deadline:
+        records = []
+        for _ in range(batch):
+            serial += 1
+            protein = rng.randint(10, 60)
+            records.append(
+                {
+                    "name": f"writer-{serial}",
+                    "calories": rng.randint(200, 900),
+                    "protein": protein,
+                    "carbs": rng.randint(10, 90),
+                    "fats": rng.randint(5, 40),
+                    "ingredients": f"鸡胸肉 {protein * 5}g、糙米 80g、西兰花 100g、橄榄油 1大勺、盐 适量",
+                    "instructions": "食材处理干净；按常规方式烹调；装盘。",
+                }
+            )
+        try:
+            # 与 auto_populate_db 默认行为一致：一次调用一个事务
+            written += ingest_recipes(records).created
+        except OperationalError as exc:
+            if not _is_locked(exc):
+                raise
+            errors += 1
+    results.put(("writer", written / (time.perf_counter() - started), errors))
+
+
+def _prepare(db_path: str, rows: int) -> None:
+    _setup(db_path, CONFIGS["rollback"])
+    from django.core.management import call_command
+
+    from recipes.ingest import ingest_recipes
+
+    call_command("migrate", verbosity=0)
+    rng = random.Random(42)
+    ingest_recipes(
+        {
+            "name": f"base-{i}",
+            "calories": rng.randint(200, 900),
+            "protein": rng.randint(5, 60),
+            "carbs": rng.randint(10, 90),
+            "fats": rng.randint(5, 40),
+            "ingredients": "鸡蛋 2个、牛奶 200ml、燕麦 50g",
+            "instructions": "",
+        }
+        for i in range(rows)
+    )
+
+
+def _run(name: str, args) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    db_path = os.path.join(tempfile.mkdtemp(prefix="smartdiet-bench-"), "bench.sqlite3")
+    prepare = ctx.Process(target=_prepare, args=(db_path, args.rows))
+    prepare.start()
+    prepare.join()
+
+    config = CONFIGS[name]
+    start = ctx.Event()
+    results = ctx.Queue()
+    # 子进程启动、初始化 Django 需要一点时间，截止时间从统一开跑后再算
+    deadline = time.time() + args.seconds + 5
+    procs = [
+        ctx.Process(target=_reader, args=(db_path, config, start, deadline, i, results)) for i in range(args.readers)
+    ]
+    procs.append(ctx.Process(target=_writer, args=(db_path, config, start, deadline, args.writer_batch, results)))
+    for proc in procs:
+        proc.start()
+    time.sleep(5)
+    start.set()
+    collected = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    latencies = sorted(lat for kind, lat, _ in collected if kind == "reader" for lat in lat)
+    writer = next(item for item in collected if item[0] == "writer")
+    return {
+        "reads_per_s": len(latencies) / args.seconds,
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p99": latencies[int(len(latencies) * 0.99)] if latencies else float("nan"),
+        "max": latencies[-1] if latencies else float("nan"),
+        "read_errors": sum(errors for kind, _, errors in collected if kind == "reader"),
+        "write_rows_per_s": writer[1],
+        "write_errors": writer[2],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SQLite 并发读写：回滚日志 vs WAL")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--rows", type=int, default=20_000, help="开跑前预置的食谱数")
+    parser.add_argument("--writer-batch", type=int, default=20_000, help="写进程每次 ingest_recipes 的条数（一个事务）")
+    args = parser.parse_args()
+
+    print(
+        f"{args.readers} 个读进程 + 1 个写进程，各跑 {args.seconds:.0f}s，预置 {args.rows} 条食谱，"
+        f"本机 {os.cpu_count()} 核"
+    )
+    print(
+        f"{'config':<10} {'读/秒':>8} {'p50(ms)':>8} {'p99(ms)':>8} {'max(ms)':>9}"
+        f" {'读锁错误':>8} {'写入行/秒':>10} {'写锁错误':>8}"
+    )
+    for name in CONFIGS:
+        r = _run(name, args)
+        print(
+            f"{name:<10} {r['reads_per_s']:>8.0f} {r['p50']:>8.2f} {r['p99']:>8.2f} {r['max']:>9.1f}"
+            f" {r['read_errors']:>8} {r['write_rows_per_s']:>10.0f} {r['write_errors']:>8}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
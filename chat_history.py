@@ -0,0 +1,77 @@
+import hashlib
+import os
+from collections.abc import MutableMapping
+from typing import Any
+
+from token_budget import estimate_tokens
+
+# ==========================================
+# 对话历史窗口：最近 N 轮保留原文，更早的轮次压缩成滚动摘要
+# ==========================================
+# 摘要是确定性的抽取式压缩（不额外调用模型），并缓存在调用方提供的 state 里
+# （Streamlit 中即 st.session_state 的一个字典），每轮只处理新滑出窗口的消息。
+_ROLE_LABELS = {"user": "用户", "assistant": "营养师"}
+_LINE_CHARS = 60
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _summarize_message(msg: dict[str, str]) -> str:
+    text = " ".join(msg["content"].split())
+    if len(text) > _LINE_CHARS:
+        text = text[:_LINE_CHARS] + "…"
+    return f"- {_ROLE_LABELS.get(msg['role'], msg['role'])}：{text}"
+
+
+def _message_digest(msg: dict[str, str]) -> str:
+    return hashlib.sha1(f"{msg['role']}\x00{msg['content']}".encode("utf-8")).hexdigest()
+
+
+def window_history(
+    messages: list[dict[str, str]],
+    state: MutableMapping[str, Any] | None = None,
+    *,
+    keep_turns: int | None = None,
+    token_budget: int | None = None,
+    summary_token_budget: int | None = None,
+) -> tuple[list[dict[str, str]], str]:
+    """返回 (原样保留的最近消息, 更早消息的摘要文本)。
+
+    messages 需已经过 _normalize_messages；state 用于跨轮缓存摘要，不传则每次从头压缩。
+    保留窗口最多 keep_turns 轮（一问一答为一轮），且估算 token 数不超过 token_budget，
+    但至少保留最后一条消息；摘要超过 summary_token_budget 时丢弃最早的摘要行。
+    """
+    if state is None:
+        state = {}
+    if keep_turns is None:
+        keep_turns = _env_int("SMARTDIET_HISTORY_TURNS", 6)
+    if token_budget is None:
+        token_budget = _env_int("SMARTDIET_HISTORY_TOKENS", 2000)
+    if summary_token_budget is None:
+        summary_token_budget = _env_int("SMARTDIET_HISTORY_SUMMARY_TOKENS", 400)
+
+    cut = max(0, len(messages) - keep_turns * 2)
+    used = sum(estimate_tokens(m["content"]) for m in messages[cut:])
+    while cut < len(messages) - 1 and used > token_budget:
+        used -= estimate_tokens(messages[cut]["content"])
+        cut += 1
+
+    # 只校验已摘要部分的最后一条消息（O(1)）；对不上（新会话/历史被改写）或窗口回退时从头重建
+    done = state.get("summarized", 0)
+    lines: list[str] = list(state.get("lines", []))
+    if done > cut or (done and _message_digest(messages[done - 1]) != state.get("tail")):
+        done, lines = 0, []
+
+    for msg in messages[done:cut]:
+        lines.append(_summarize_message(msg))
+
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > summary_token_budget:
+        lines.pop(0)
+
+    state.update(summarized=cut, tail=_message_digest(messages[cut - 1]) if cut else "", lines=lines)
+    return messages[cut:], "\n".join(lines)
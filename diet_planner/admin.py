@@ -10,9 +10,11 @@ class DietPlanItemInline(admin.TabularInline):
 
 @admin.register(DietPlan)
 class DietPlanAdmin(admin.ModelAdmin):
-	list_display = ("user", "date", "target_calories")
+	# 总量是 DietPlan 上的冗余列，列表页不必再逐行关联条目与食谱
+	list_display = ("user", "date", "target_calories", "total_calories", "total_protein", "total_carbs", "total_fats")
 	list_filter = ("date",)
 	search_fields = ("user__username",)
+	readonly_fields = ("total_calories", "total_protein", "total_carbs", "total_fats")
 	inlines = (DietPlanItemInline,)
 
 
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class DietPlannerConfig(AppConfig):
     name = 'diet_planner'
+
+    def ready(self):
+        # totals 注册信号接收器，随计划条目增删改维护 DietPlan 上的当天营养总量
+        from . import totals  # noqa: F401
@@ -0,0 +1,52 @@
+"""
+批量生成计划（manage.py generate_plans）的进程池工作函数。
+
+食谱营养矩阵由主进程写成 .npy 文件，各子进程以只读内存映射方式打开，
+多个进程共享操作系统页缓存里的同一份数据。spawn 启动方式下子进程会先导入本模块
+再执行 initializer，所以模型相关的导入都放在函数里，等 Django 初始化之后再做。
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+
+_matrix = None
+
+
+def write_shared_matrix(matrix, directory: Path) -> None:
+	np.save(directory / "ids.npy", np.ascontiguousarray(matrix.ids))
+	np.save(directory / "macros.npy", np.ascontiguousarray(matrix.macros))
+
+
+def init_worker(directory: str) -> None:
+	import django
+	from django.apps import apps
+
+	if not apps.ready:
+		os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nutrition_project.settings")
+		django.setup()
+
+	from .optimizer import RecipeMatrix
+
+	global _matrix
+	_matrix = RecipeMatrix(
+		np.load(os.path.join(directory, "ids.npy"), mmap_mode="r"),
+		np.load(os.path.join(directory, "macros.npy"), mmap_mode="r"),
+	)
+
+
+def plan_targets(shard: list[tuple[int, ...]], days: int, meal_types: tuple[str, ...]) -> list[tuple]:
+	"""为每组营养目标生成连续 days 天的计划。
+
+	优化器是确定性的，目标相同的用户计划也相同，所以主进程只按去重后的目标派发。
+	返回 [(目标, [[(餐次, 食谱 id, 份数), ...] 每天一组], [当天总量（按 NUTRIENTS 顺序）每天一组], 达标天数), ...]。
+	"""
+	from .optimizer import NUTRIENTS, optimize_days
+
+	results = []
+	for key in shard:
+		plans = optimize_days(_matrix, dict(zip(NUTRIENTS, map(float, key))), days, meal_types=meal_types)
+		week = [[(meal.meal_type, meal.recipe_id, meal.portion) for meal in plan.meals] for plan in plans]
+		totals = [tuple(plan.totals[nutrient] for nutrient in NUTRIENTS) for plan in plans]
+		results.append((key, week, totals, sum(plan.within_tolerance for plan in plans)))
+	return results
@@ -0,0 +1,134 @@
+from pathlib import Path
+
+import numpy as np
+
+# 导出格式版本：数组布局变化时递增，加载时校验
+FORMAT_VERSION = 1
+
+
+class CompiledForest:
+	"""把 sklearn RandomForestClassifier 展平成连续数组后的纯 NumPy 推理器（不依赖 sklearn）。
+
+	所有树的节点拼接在一起：feature/threshold/left/right 按全局节点下标索引，
+	叶子节点的左右孩子指向自身，因此只需固定迭代 max_depth 次即可让每棵树都落到叶子上。
+	概率的累加顺序、float32 比较与 sklearn 保持一致，预测结果与原模型逐条相同。
+	"""
+
+	def __init__(
+		self,
+		*,
+		feature: np.ndarray,
+		threshold: np.ndarray,
+		left: np.ndarray,
+		right: np.ndarray,
+		leaf_proba: np.ndarray,
+		roots: np.ndarray,
+		max_depth: int,
+		classes: np.ndarray,
+		feature_names: np.ndarray,
+	) -> None:
+		self.feature = feature
+		self.threshold = threshold
+		self.left = left
+		self.right = right
+		self.leaf_proba = leaf_proba
+		self.roots = roots
+		self.max_depth = int(max_depth)
+		self.classes_ = classes
+		self.feature_names_in_ = feature_names
+		self.n_features_in_ = len(feature_names)
+
+	def _leaves(self, X: np.ndarray) -> np.ndarray:
+		# sklearn 的树在 float32 上比较阈值
+		X = np.asarray(X, dtype=np.float32)
+		rows = np.arange(X.shape[0])[:, None]
+		idx = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+		for _ in range(self.max_depth):
+			go_left = X[rows, self.feature[idx]] <= self.threshold[idx]
+			idx = np.where(go_left, self.left[idx], self.right[idx])
+		return idx
+
+	def predict_proba(self, X: np.ndarray) -> np.ndarray:
+		proba = self.leaf_proba[self._leaves(X)]
+		# 按树的顺序逐棵累加（cumsum 是顺序累加），与 sklearn 的求和顺序一致
+		return np.cumsum(proba, axis=1)[:, -1, :] / len(self.roots)
+
+	def predict(self, X: np.ndarray) -> np.ndarray:
+		return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def compile_forest(model) -> CompiledForest:
+	"""从已训练的 RandomForestClassifier 或单棵 DecisionTreeClassifier（单输出）构建 CompiledForest。"""
+	features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+	max_depth = 0
+	offset = 0
+	for estimator in getattr(model, "estimators_", [model]):
+		tree = estimator.tree_
+		n = tree.node_count
+		node_ids = np.arange(n, dtype=np.int32)
+		is_leaf = tree.children_left == -1
+
+		features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+		thresholds.append(np.where(is_leaf, 0.0, tree.threshold).astype(np.float64))
+		lefts.append((np.where(is_leaf, node_ids, tree.children_left) + offset).astype(np.int32))
+		rights.append((np.where(is_leaf, node_ids, tree.children_right) + offset).astype(np.int32))
+
+		value = tree.value[:, 0, :].astype(np.float64)
+		normalizer = value.sum(axis=1, keepdims=True)
+		normalizer[normalizer == 0.0] = 1.0
+		probas.append(value / normalizer)
+
+		roots.append(offset)
+		max_depth = max(max_depth, int(tree.max_depth))
+		offset += n
+
+	feature_names = getattr(model, "feature_names_in_", None)
+	if feature_names is None:
+		feature_names = np.array([f"x{i}" for i in range(model.n_features_in_)])
+
+	return CompiledForest(
+		feature=np.concatenate(features),
+		threshold=np.concatenate(thresholds),
+		left=np.concatenate(lefts),
+		right=np.concatenate(rights),
+		leaf_proba=np.concatenate(probas),
+		roots=np.array(roots, dtype=np.int32),
+		max_depth=max_depth,
+		classes=np.asarray(model.classes_).astype(str),
+		feature_names=np.asarray(feature_names).astype(str),
+	)
+
+
+def save_compiled_forest(forest: CompiledForest, path: str | Path) -> None:
+	np.savez(
+		path,
+		format_version=np.array(FORMAT_VERSION),
+		feature=forest.feature,
+		threshold=forest.threshold,
+		left=forest.left,
+		right=forest.right,
+		leaf_proba=forest.leaf_proba,
+		roots=forest.roots,
+		max_depth=np.array(forest.max_depth),
+		classes=forest.classes_,
+		feature_names=forest.feature_names_in_,
+	)
+
+
+def load_compiled_forest(path: str | Path) -> CompiledForest:
+	with np.load(path, allow_pickle=False) as data:
+		version = int(data["format_version"])
+		if version != FORMAT_VERSION:
+			raise ValueError(f"不支持的模型导出格式版本：{version}（当前支持 {FORMAT_VERSION}）")
+		arrays = {name: data[name] for name in data.files if name != "format_version"}
+	return CompiledForest(
+		feature=arrays["feature"],
+		threshold=arrays["threshold"],
+		left=arrays["left"],
+		right=arrays["right"],
+		leaf_proba=arrays["leaf_proba"],
+		roots=arrays["roots"],
+		max_depth=int(arrays["max_depth"]),
+		classes=arrays["classes"],
+		feature_names=arrays["feature_names"],
+	)
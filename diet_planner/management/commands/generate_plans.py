@@ -0,0 +1,207 @@
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from diet_planner.batch import init_worker, plan_targets, write_shared_matrix
+from diet_planner.models import DietPlan, DietPlanItem
+from diet_planner.optimizer import DEFAULT_MEAL_SHARES, NUTRIENTS, load_recipe_matrix
+from diet_planner.totals import TOTAL_FIELDS, delete_plan_items
+from users.models import CustomUser
+
+# 与 optimizer.NUTRIENTS 的顺序一一对应
+TARGET_FIELDS = ("target_calories", "protein_g", "carbs_g", "fat_g")
+ITEM_COLUMNS = ("diet_plan_id", "recipe_id", "meal_type", "portion")
+# 主进程缓存的“目标 -> 一周计划”条数上限，超过后丢弃最早的
+PLAN_CACHE_LIMIT = 50_000
+
+
+class Command(BaseCommand):
+	help = "为所有已有营养目标的用户生成连续多天的饮食计划：进程池并行求解，按块事务写入，可中断后续跑"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--start", type=date.fromisoformat, help="起始日期（YYYY-MM-DD），默认明天")
+		parser.add_argument("--days", type=int, default=7, help="连续生成的天数")
+		parser.add_argument(
+			"--meals", default=",".join(DEFAULT_MEAL_SHARES), help="餐次，逗号分隔（breakfast,lunch,dinner,snack）"
+		)
+		parser.add_argument("--workers", type=int, default=None, help="求解进程数，默认等于 CPU 核数")
+		parser.add_argument("--chunk-size", type=int, default=1000, help="每个写入事务包含的用户数")
+		parser.add_argument("--shard-size", type=int, default=64, help="每个进程池任务包含的（去重后）营养目标数")
+		parser.add_argument("--force", action="store_true", help="已有完整计划的用户也重新生成")
+
+	def handle(self, *args, **options):
+		self.verbosity = options["verbosity"]
+		days = options["days"]
+		if days < 1:
+			raise CommandError("--days 至少为 1")
+		meal_types = tuple(m.strip() for m in options["meals"].split(",") if m.strip())
+		unknown = [m for m in meal_types if m not in DEFAULT_MEAL_SHARES]
+		if unknown or not meal_types:
+			raise CommandError(f"未知的餐次: {', '.join(unknown) or '（空）'}")
+		start = options["start"] or timezone.localdate() + timedelta(days=1)
+		dates = [start + timedelta(days=i) for i in range(days)]
+
+		matrix = load_recipe_matrix()
+		if len(matrix) < len(meal_types):
+			raise CommandError("食谱库中的食谱不足以排满一天的餐次")
+		# 缺少营养目标的用户无法规划（先运行 manage.py compute_targets）
+		users = CustomUser.objects.filter(
+			target_calories__gt=0, protein_g__isnull=False, carbs_g__isnull=False, fat_g__isnull=False
+		)
+		total = users.count()
+		self.stdout.write(
+			f"为 {total} 个用户生成 {dates[0]} ~ {dates[-1]} 的计划（{len(matrix)} 道食谱，餐次 {','.join(meal_types)}）"
+		)
+
+		matrix_dir = Path(tempfile.mkdtemp(prefix="smartdiet-plans-"))
+		write_shared_matrix(matrix, matrix_dir)
+		# 子进程只做计算不碰数据库；fork 前关掉连接，避免子进程继承打开的数据库句柄
+		connections.close_all()
+
+		stats = {"users": 0, "skipped": 0, "plans": 0, "solved": 0, "off_target": 0, "failed": 0}
+		cache: dict[tuple, tuple] = {}
+		# 已提交、结果还没取回的目标
+		self._inflight: set[tuple] = set()
+		# 最近提交、还没写入的那块用户用到的全部目标（含命中缓存的），淘汰缓存时不能动
+		self._pinned: set[tuple] = set()
+		started = time.perf_counter()
+		try:
+			with ProcessPoolExecutor(
+				max_workers=options["workers"], initializer=init_worker, initargs=(str(matrix_dir),)
+			) as pool:
+				# 读下一块并提交求解后，再等待并写入上一块：写库与求解重叠进行
+				previous = None
+				for rows in self._pending_chunks(users, dates, options["chunk_size"], options["force"], stats):
+					futures = self._submit(pool, rows, cache, options["shard_size"], days, meal_types)
+					if previous is not None:
+						self._finish(*previous, cache, dates, stats, total, started)
+					previous = (rows, futures)
+				if previous is not None:
+					self._finish(*previous, cache, dates, stats, total, started)
+		finally:
+			shutil.rmtree(matrix_dir, ignore_errors=True)
+
+		elapsed = time.perf_counter() - started
+		rate = stats["users"] / elapsed if elapsed > 0 else 0.0
+		self.stdout.write(
+			self.style.SUCCESS(
+				f"完成：为 {stats['users']} 个用户写入 {stats['plans']} 份计划，跳过已完成的 {stats['skipped']} 个；"
+				f"求解 {stats['solved']} 组不同的营养目标，{stats['off_target']} 天未达容差，"
+				f"{stats['failed']} 天无可用食谱；耗时 {elapsed:.2f}s（{rate:.0f} 用户/秒）"
+			)
+		)
+
+	def _pending_chunks(self, users, dates, chunk_size, force, stats):
+		"""按主键 keyset 分页读用户，跳过日期范围内计划已齐全的（中断后重跑即从这里续上）。"""
+		last_id = 0
+		while True:
+			rows = list(users.filter(id__gt=last_id).order_by("id").values_list("id", *TARGET_FIELDS)[:chunk_size])
+			if not rows:
+				return
+			last_id = rows[-1][0]
+			if not force:
+				complete = set(
+					DietPlan.objects.filter(user_id__in=[row[0] for row in rows], date__range=(dates[0], dates[-1]))
+					.values("user_id")
+					.annotate(n=Count("id"))
+					.filter(n=len(dates))
+					.values_list("user_id", flat=True)
+				)
+				stats["skipped"] += len(complete)
+				rows = [row for row in rows if row[0] not in complete]
+			if rows:
+				yield rows
+
+	def _submit(self, pool, rows, cache, shard_size, days, meal_types):
+		self._pinned = {tuple(row[1:]) for row in rows}
+		# 只提交缓存里没有、也不在前一块里等待的目标
+		keys = list(dict.fromkeys(tuple(row[1:]) for row in rows if tuple(row[1:]) not in cache))
+		keys = [key for key in keys if key not in self._inflight]
+		self._inflight.update(keys)
+		return [
+			pool.submit(plan_targets, keys[i : i + shard_size], days, meal_types) for i in range(0, len(keys), shard_size)
+		]
+
+	def _finish(self, rows, futures, cache, dates, stats, total, started):
+		for future in futures:
+			for key, week, totals, ok_days in future.result():
+				cache[key] = (week, totals, ok_days)
+				self._inflight.discard(key)
+				stats["solved"] += 1
+		self._write(rows, cache, dates, stats)
+		self._evict(cache)
+
+		stats["users"] += len(rows)
+		if self.verbosity >= 1:
+			elapsed = time.perf_counter() - started
+			done = stats["users"] + stats["skipped"]
+			rate = stats["users"] / elapsed if elapsed > 0 else 0.0
+			eta = (total - done) / rate if rate > 0 else 0.0
+			self.stdout.write(
+				f"  [{done}/{total}] 已写入 {stats['plans']} 份计划，{rate:.0f} 用户/秒，预计还需 {eta:.0f}s"
+			)
+
+	def _evict(self, cache):
+		"""超过上限时按插入顺序丢弃最早的目标，但保留下一块写入还要用的（提交时它们命中了缓存，不会重新求解）。"""
+		excess = len(cache) - PLAN_CACHE_LIMIT
+		if excess <= 0:
+			return
+		for key in [key for key in cache if key not in self._pinned][:excess]:
+			del cache[key]
+
+	def _write(self, rows, cache, dates, stats):
+		"""一块用户一个事务：upsert DietPlan（连同当天总量），删掉这些计划的旧条目，再整块插入新条目。
+
+		条目的删除与插入都不经过模型信号，总量直接用优化器算好的值写入。
+		"""
+		total_fields = [TOTAL_FIELDS[nutrient] for nutrient in NUTRIENTS]
+		plans = []
+		for user_id, *key in rows:
+			week, totals, ok_days = cache[tuple(key)]
+			stats["off_target"] += sum(1 for meals in week if meals) - ok_days
+			for plan_date, meals, day_totals in zip(dates, week, totals):
+				if not meals:
+					stats["failed"] += 1
+					continue
+				plans.append((user_id, plan_date, key[0], meals, day_totals))
+		if not plans:
+			return
+
+		user_ids = [row[0] for row in rows]
+		with transaction.atomic():
+			DietPlan.objects.bulk_create(
+				[
+					DietPlan(user_id=user_id, date=plan_date, target_calories=kcal, **dict(zip(total_fields, day_totals)))
+					for user_id, plan_date, kcal, _, day_totals in plans
+				],
+				batch_size=1000,
+				update_conflicts=True,
+				unique_fields=["user", "date"],
+				update_fields=["target_calories", *total_fields],
+			)
+			plan_ids = {
+				(user_id, plan_date): plan_id
+				for user_id, plan_date, plan_id in DietPlan.objects.filter(
+					user_id__in=user_ids, date__range=(dates[0], dates[-1])
+				).values_list("user_id", "date", "id")
+			}
+			delete_plan_items([plan_ids[(user_id, plan_date)] for user_id, plan_date, *_ in plans])
+			items = [
+				(plan_ids[(user_id, plan_date)], recipe_id, meal_type, portion)
+				for user_id, plan_date, _, meals, _ in plans
+				for meal_type, recipe_id, portion in meals
+			]
+			# 条目量是用户数 × 天数 × 餐次，直接 executemany，省掉逐个构造模型对象的开销
+			table = connection.ops.quote_name(DietPlanItem._meta.db_table)
+			columns = ", ".join(connection.ops.quote_name(c) for c in ITEM_COLUMNS)
+			with connection.cursor() as cursor:
+				cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s)", items)
+		stats["plans"] += len(plans)
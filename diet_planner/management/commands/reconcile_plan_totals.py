@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from diet_planner.models import DietPlan
+from diet_planner.totals import recompute_plan_totals
+
+
+class Command(BaseCommand):
+	help = "按 id 分块重新汇总饮食计划的当天营养总量：每块一条聚合查询，只写回与条目不一致的计划"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--chunk-size", type=int, default=2000, help="每块汇总并写回的计划数")
+
+	def handle(self, *args, **options):
+		chunk_size = options["chunk_size"]
+		started = time.perf_counter()
+		checked = 0
+		fixed = 0
+		last_id = 0
+
+		while True:
+			# 按主键做 keyset 分页；绕过信号的批量写入（食谱 bulk 更新、手写 SQL 等）之后跑一遍即可对齐
+			ids = list(DietPlan.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:chunk_size])
+			if not ids:
+				break
+			last_id = ids[-1]
+			fixed += recompute_plan_totals(ids)
+			checked += len(ids)
+			if options["verbosity"] > 1:
+				self.stdout.write(f"已核对 {checked} 份计划（最后 id={last_id}），修正 {fixed} 份")
+
+		elapsed = time.perf_counter() - started
+		rate = checked / elapsed if elapsed > 0 else 0.0
+		self.stdout.write(
+			self.style.SUCCESS(
+				f"完成：核对 {checked} 份计划，修正 {fixed} 份，耗时 {elapsed:.2f}s（{rate:.0f} 计划/秒）"
+			)
+		)
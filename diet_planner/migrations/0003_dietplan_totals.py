@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-17 10:12
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    # 已有计划按条目一次性汇总：每个总量列一个相关子查询，整表一条 UPDATE
+    DietPlan = apps.get_model('diet_planner', 'DietPlan')
+    DietPlanItem = apps.get_model('diet_planner', 'DietPlanItem')
+
+    def item_sum(nutrient):
+        per_plan = (
+            DietPlanItem.objects.filter(diet_plan_id=OuterRef('pk'))
+            .values('diet_plan_id')
+            .annotate(total=Sum(F(f'recipe__{nutrient}') * F('portion'), output_field=FloatField()))
+            .values('total')
+        )
+        return Coalesce(Subquery(per_plan, output_field=FloatField()), 0.0)
+
+    DietPlan.objects.update(
+        total_calories=item_sum('calories'),
+        total_protein=item_sum('protein'),
+        total_carbs=item_sum('carbs'),
+        total_fats=item_sum('fats'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diet_planner', '0002_dietplanitem_alter_dietplan_recipes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dietplan',
+            name='total_calories',
+            field=models.FloatField(default=0, editable=False, verbose_name='当天总热量(kcal)'),
+        ),
+        migrations.AddField(
+            model_name='dietplan',
+            name='total_carbs',
+            field=models.FloatField(default=0, editable=False, verbose_name='当天总碳水(g)'),
+        ),
+        migrations.AddField(
+            model_name='dietplan',
+            name='total_fats',
+            field=models.FloatField(default=0, editable=False, verbose_name='当天总脂肪(g)'),
+        ),
+        migrations.AddField(
+            model_name='dietplan',
+            name='total_protein',
+            field=models.FloatField(default=0, editable=False, verbose_name='当天总蛋白质(g)'),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import joblib
+
+from .compiled_forest import load_compiled_forest
+
+MODEL_DIR = Path(__file__).resolve().parent / "ml_models"
+DEFAULT_MODEL_NAME = "diet_model_v1.pkl"
+# train_ml_model.py 导出的纯 NumPy 版本：存在时优先使用，推理时不需要导入 sklearn
+COMPILED_MODEL_NAME = "diet_model_v1.npz"
+# train_pipeline.py 写出的最新一次训练的指标清单
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass
+class LoadedModel:
+	name: str
+	path: Path
+	model: Any
+	mtime_ns: int
+	size_bytes: int
+	sha256: str
+	load_seconds: float
+	memory_bytes: int | None
+	mmap_mode: str | None
+	loads: int = 1
+
+
+def _file_sha256(path: Path) -> str:
+	digest = hashlib.sha256()
+	with open(path, "rb") as f:
+		for block in iter(lambda: f.read(1 << 20), b""):
+			digest.update(block)
+	return digest.hexdigest()
+
+
+def _rss_bytes() -> int | None:
+	# 只在 Linux 上可以零成本读取常驻内存；其他平台返回 None（指标显示为不可用）
+	try:
+		with open("/proc/self/statm") as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (OSError, ValueError, AttributeError, IndexError):
+		return None
+
+
+def _default_mmap_mode() -> str | None:
+	# 多个 server worker 共享同一份模型数组页：SMARTDIET_MODEL_MMAP=1 时以只读方式内存映射
+	return "r" if os.getenv("SMARTDIET_MODEL_MMAP") in {"1", "true", "TRUE", "yes", "YES"} else None
+
+
+class ModelRegistry:
+	"""进程内的模型注册表：每个模型文件只反序列化一次，文件内容变化后才重新加载。
+
+	每次 get() 只做一次 stat；mtime/大小变了再算 sha256，内容确实不同才重新 joblib.load。
+	"""
+
+	def __init__(self, model_dir: Path = MODEL_DIR) -> None:
+		self.model_dir = Path(model_dir)
+		self._lock = threading.Lock()
+		self._models: dict[str, LoadedModel] = {}
+
+	def get(self, name: str = DEFAULT_MODEL_NAME, *, mmap_mode: str | None = None) -> LoadedModel:
+		path = self.model_dir / name
+		stat = path.stat()  # 文件不存在时抛 FileNotFoundError，由调用方提示“模型未挂载”
+		if mmap_mode is None:
+			mmap_mode = _default_mmap_mode()
+
+		with self._lock:
+			entry = self._models.get(name)
+			if entry is not None and entry.mmap_mode == mmap_mode:
+				if (entry.mtime_ns, entry.size_bytes) == (stat.st_mtime_ns, stat.st_size):
+					return entry
+				sha256 = _file_sha256(path)
+				if sha256 == entry.sha256:
+					entry.mtime_ns = stat.st_mtime_ns
+					return entry
+			else:
+				sha256 = _file_sha256(path)
+
+			loaded = self._load(name, path, stat, sha256, mmap_mode)
+			if entry is not None:
+				loaded.loads = entry.loads + 1
+			self._models[name] = loaded
+			return loaded
+
+	@staticmethod
+	def _load(name: str, path: Path, stat: os.stat_result, sha256: str, mmap_mode: str | None) -> LoadedModel:
+		rss_before = _rss_bytes()
+		started = time.perf_counter()
+		if path.suffix == ".npz":
+			model = load_compiled_forest(path)
+		else:
+			model = joblib.load(path, mmap_mode=mmap_mode)
+		load_seconds = time.perf_counter() - started
+		# 常驻内存增量：内存映射且尚未被访问的数组页不计入，多个 worker 之间共享
+		rss_after = _rss_bytes()
+		memory_bytes = max(0, rss_after - rss_before) if rss_before is not None and rss_after is not None else None
+
+		return LoadedModel(
+			name=name,
+			path=path,
+			model=model,
+			mtime_ns=stat.st_mtime_ns,
+			size_bytes=stat.st_size,
+			sha256=sha256,
+			load_seconds=load_seconds,
+			memory_bytes=memory_bytes,
+			mmap_mode=mmap_mode,
+		)
+
+	def metrics(self) -> dict[str, dict[str, Any]]:
+		"""各已加载模型的加载耗时、内存占用、文件大小与加载次数。"""
+		with self._lock:
+			return {
+				name: {
+					"sha256": entry.sha256[:12],
+					"load_seconds": entry.load_seconds,
+					"memory_bytes": entry.memory_bytes,
+					"file_bytes": entry.size_bytes,
+					"mmap_mode": entry.mmap_mode,
+					"loads": entry.loads,
+				}
+				for name, entry in self._models.items()
+			}
+
+
+registry = ModelRegistry()
+
+
+def preferred_model_name(model_dir: Path = MODEL_DIR) -> str:
+	"""有导出的 .npz 时用它，否则退回 sklearn 的 .pkl。"""
+	return COMPILED_MODEL_NAME if (Path(model_dir) / COMPILED_MODEL_NAME).exists() else DEFAULT_MODEL_NAME
+
+
+_manifest_cache: dict[str, Any] = {"key": None, "manifest": None}
+
+
+def _read_manifest(model_dir: Path) -> dict | None:
+	path = Path(model_dir) / MANIFEST_NAME
+	try:
+		mtime_ns = path.stat().st_mtime_ns
+	except FileNotFoundError:
+		return None
+	if _manifest_cache["key"] != (str(path), mtime_ns):
+		_manifest_cache["manifest"] = json.loads(path.read_text(encoding="utf-8"))
+		_manifest_cache["key"] = (str(path), mtime_ns)
+	return _manifest_cache["manifest"]
+
+
+def select_model_name(model_dir: Path = MODEL_DIR, accuracy_floor: float | None = None) -> str:
+	"""按训练清单选模型：准确率不低于 accuracy_floor 的候选里单行 p99 延迟最低的一个。
+
+	没有清单或没有候选达标时退回 preferred_model_name()。
+	accuracy_floor 默认取 SMARTDIET_MODEL_ACCURACY_FLOOR（0.9）。
+	"""
+	if accuracy_floor is None:
+		try:
+			accuracy_floor = float(os.getenv("SMARTDIET_MODEL_ACCURACY_FLOOR") or 0.9)
+		except ValueError:
+			accuracy_floor = 0.9
+
+	manifest = _read_manifest(model_dir)
+	if manifest:
+		eligible = [
+			c
+			for c in manifest.get("candidates", [])
+			if c.get("accuracy", 0.0) >= accuracy_floor and (Path(model_dir) / c["artifact"]).exists()
+		]
+		if eligible:
+			return min(eligible, key=lambda c: c["p99_single_row_ms"])["artifact"]
+	return preferred_model_name(model_dir)
+
+
+def get_model(name: str = DEFAULT_MODEL_NAME) -> Any:
+	"""返回已加载（并按需热更新）的模型对象。"""
+	return registry.get(name).model
@@ -42,6 +42,12 @@ class DietPlan(models.Model):
 	)
 	date = models.DateField("日期")
 	target_calories = models.PositiveIntegerField("当天目标总热量(kcal)")
+	# 当天各条目 食谱营养 × 份数 之和，由 diet_planner.totals 随条目增删改增量维护，
+	# 看板/历史曲线读一行即可；批量写入绕过信号时由写入方直接算好，或事后跑 reconcile_plan_totals
+	total_calories = models.FloatField("当天总热量(kcal)", default=0, editable=False)
+	total_protein = models.FloatField("当天总蛋白质(g)", default=0, editable=False)
+	total_carbs = models.FloatField("当天总碳水(g)", default=0, editable=False)
+	total_fats = models.FloatField("当天总脂肪(g)", default=0, editable=False)
 
 	recipes = models.ManyToManyField(
 		"recipes.Recipe",
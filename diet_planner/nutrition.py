@@ -0,0 +1,87 @@
+import numpy as np
+
+# ==========================================
+# 营养目标计算核心：BMR（Mifflin-St Jeor）→ TDEE → 目标热量 → 三大宏量克数
+# ==========================================
+# 所有函数都接受标量或等长数组，返回 NumPy 数组，可一次性计算整批用户。
+# 标签同时兼容侧边栏的中文（男/女、减脂/维持/增肌）与 users.CustomUser 的英文取值。
+
+MALE_VALUES = ("male", "m", "男")
+
+GOAL_ALIASES = {
+	"lose": "lose",
+	"减脂": "lose",
+	"maintain": "maintain",
+	"维持": "maintain",
+	"gain": "gain",
+	"增肌": "gain",
+}
+GOAL_CODES = ("lose", "maintain", "gain")
+
+# 目标热量 = TDEE + 调整量
+GOAL_CALORIE_DELTA = {"lose": -500.0, "maintain": 0.0, "gain": 300.0}
+# (碳水, 蛋白, 脂肪) 的供能比
+GOAL_MACRO_RATIOS = {
+	"lose": (0.40, 0.40, 0.20),
+	"maintain": (0.50, 0.20, 0.30),
+	"gain": (0.50, 0.30, 0.20),
+}
+
+ACTIVITY_FACTORS = (1.2, 1.375, 1.55, 1.725, 1.9)
+
+
+def _goal_index(goal) -> np.ndarray:
+	"""把目标标签数组映射为 GOAL_CODES 下标（只对去重后的取值查表）。"""
+	values, inverse = np.unique(np.atleast_1d(np.asarray(goal, dtype=str)), return_inverse=True)
+	try:
+		codes = np.array([GOAL_CODES.index(GOAL_ALIASES[v.strip().lower()]) for v in values], dtype=np.intp)
+	except KeyError as e:
+		raise ValueError(f"未知的健康目标：{e.args[0]}") from None
+	return codes[inverse.reshape(-1)]
+
+
+def bmr(gender, age, height_cm, weight_kg) -> np.ndarray:
+	"""Mifflin-St Jeor 基础代谢（kcal）。"""
+	is_male = np.isin(np.char.lower(np.atleast_1d(np.asarray(gender, dtype=str))), MALE_VALUES)
+	weight = np.asarray(weight_kg, dtype=float)
+	height = np.asarray(height_cm, dtype=float)
+	age = np.asarray(age, dtype=float)
+	return 10 * weight + 6.25 * height - 5 * age + np.where(is_male, 5, -161)
+
+
+def tdee(bmr_kcal, activity_factor) -> np.ndarray:
+	return np.asarray(bmr_kcal, dtype=float) * np.asarray(activity_factor, dtype=float)
+
+
+def target_calories(tdee_kcal, goal) -> np.ndarray:
+	delta = np.array([GOAL_CALORIE_DELTA[c] for c in GOAL_CODES])
+	return np.asarray(tdee_kcal, dtype=float) + delta[_goal_index(goal)]
+
+
+def macro_grams(target_kcal, goal) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""按目标的供能比把目标热量拆成 (碳水 g, 蛋白 g, 脂肪 g)，四舍五入为整数。"""
+	ratios = np.array([GOAL_MACRO_RATIOS[c] for c in GOAL_CODES])[_goal_index(goal)]
+	kcal = np.asarray(target_kcal, dtype=float)
+	carbs = np.round(kcal * ratios[:, 0] / 4).astype(int)
+	protein = np.round(kcal * ratios[:, 1] / 4).astype(int)
+	fat = np.round(kcal * ratios[:, 2] / 9).astype(int)
+	return carbs, protein, fat
+
+
+def compute_targets(gender, age, height_cm, weight_kg, activity_factor, goal) -> dict[str, np.ndarray]:
+	"""一次算出整批用户的 bmr/tdee/target_calories（四舍五入为整数 kcal）与 carbs_g/protein_g/fat_g。
+
+	宏量克数基于取整后的目标热量计算，与侧边栏显示保持一致。
+	"""
+	bmr_kcal = bmr(gender, age, height_cm, weight_kg)
+	tdee_kcal = tdee(bmr_kcal, activity_factor)
+	target = np.round(target_calories(tdee_kcal, goal)).astype(int)
+	carbs, protein, fat = macro_grams(target, goal)
+	return {
+		"bmr": np.round(bmr_kcal).astype(int),
+		"tdee": np.round(tdee_kcal).astype(int),
+		"target_calories": target,
+		"carbs_g": carbs,
+		"protein_g": protein,
+		"fat_g": fat,
+	}
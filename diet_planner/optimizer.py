@@ -0,0 +1,379 @@
+import threading
+import time
+from collections.abc import Collection, Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import date
+
+import numpy as np
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.signals import get_recipe_version
+
+from .models import DietPlan, DietPlanItem
+from .totals import TOTAL_FIELDS, delete_plan_items
+
+# ==========================================
+# 一日膳食优化：为每个餐次选一道食谱和份数，使全天热量/三大宏量落在目标容差内
+# ==========================================
+# 食谱的 (热量, 蛋白, 碳水, 脂肪) 预先整理成 NumPy 矩阵；每个餐次先向量化地从
+# 食谱里挑出最接近该餐目标的 top_k 道（连同各种份数）作为候选，再在候选上做分支定界：
+# 用剩余餐次候选的逐列最小/最大值给出目标函数下界，下界不优于当前最优解的分支直接剪掉。
+# 结果只取决于食谱矩阵与参数（同分按食谱 id 排序），同样的输入总是得到同样的计划。
+
+NUTRIENTS = ("calories", "protein", "carbs", "fats")
+# 各餐次占全天热量的比例（没有加餐时按其余三餐的比例重新归一）
+DEFAULT_MEAL_SHARES = {
+	DietPlanItem.MealType.BREAKFAST: 0.25,
+	DietPlanItem.MealType.LUNCH: 0.35,
+	DietPlanItem.MealType.DINNER: 0.30,
+	DietPlanItem.MealType.SNACK: 0.10,
+}
+DEFAULT_PORTIONS = (0.5, 0.75, 1.0, 1.25, 1.5, 2.0)
+# 相对容差：热量 ±5%，三大宏量 ±10%
+DEFAULT_TOLERANCES = {"calories": 0.05, "protein": 0.10, "carbs": 0.10, "fats": 0.10}
+# 每个餐次参与分支定界的候选食谱数（每道食谱带上全部份数）
+DEFAULT_TOP_K = 12
+# 餐次热量偏离该餐份额的惩罚权重（相对全天热量），避免“早餐吃一整天的量”这种凑数解
+SLOT_BALANCE_WEIGHT = 2.0
+# 分支定界的最优性间隙（目标函数单位，1 相当于一项营养恰好偏到容差边缘）。
+# 最优值不小于 0，所以找到目标函数不超过间隙的解后搜索即可结束
+DEFAULT_OPTIMALITY_GAP = 0.5
+# 搜索预算（已评估的组合数）：目标刁钻、候选集里没有足够好的解时，到预算即返回当前最优解
+DEFAULT_MAX_NODES = 100_000
+
+
+@dataclass(frozen=True)
+class RecipeMatrix:
+	"""优化器的输入：食谱 id 与对应的 (热量, 蛋白, 碳水, 脂肪) 矩阵，行一一对应。"""
+
+	ids: np.ndarray
+	macros: np.ndarray
+	version: int | None = None
+
+	def __len__(self) -> int:
+		return len(self.ids)
+
+
+@dataclass(frozen=True)
+class PlannedMeal:
+	meal_type: str
+	recipe_id: int
+	portion: float
+	calories: float
+	protein: float
+	carbs: float
+	fats: float
+
+
+@dataclass
+class MealPlan:
+	meals: list[PlannedMeal]
+	targets: dict[str, float]
+	totals: dict[str, float]
+	# 各项与目标的相对偏差（正数为超出）
+	deviations: dict[str, float]
+	within_tolerance: bool
+	objective: float
+	nodes: int = 0
+	elapsed: float = 0.0
+	tolerances: dict[str, float] = field(default_factory=lambda: dict(DEFAULT_TOLERANCES))
+
+
+def load_recipe_matrix() -> RecipeMatrix:
+	"""从食谱表读出优化所需的五列（热量为 0 的食谱无法按份数配比，跳过）。"""
+	version = get_recipe_version()
+	rows = list(
+		Recipe.objects.filter(calories__gt=0).order_by("id").values_list("id", "calories", "protein", "carbs", "fats")
+	)
+	if not rows:
+		return RecipeMatrix(np.empty(0, dtype=np.int64), np.empty((0, 4)), version)
+	data = np.asarray(rows, dtype=np.float64)
+	return RecipeMatrix(data[:, 0].astype(np.int64), np.ascontiguousarray(data[:, 1:]), version)
+
+
+_matrix: RecipeMatrix | None = None
+_matrix_lock = threading.Lock()
+
+
+def get_recipe_matrix() -> RecipeMatrix:
+	"""进程内共享的食谱矩阵，食谱表版本号变化后重新加载。"""
+	global _matrix
+	matrix = _matrix
+	if matrix is not None and matrix.version == get_recipe_version():
+		return matrix
+	with _matrix_lock:
+		if _matrix is None or _matrix.version != get_recipe_version():
+			_matrix = load_recipe_matrix()
+		return _matrix
+
+
+def _target_vector(targets: Mapping[str, float]) -> np.ndarray:
+	try:
+		vector = np.array([float(targets[key]) for key in NUTRIENTS])
+	except KeyError as e:
+		raise ValueError(f"营养目标缺少 {e.args[0]}") from None
+	if np.any(vector <= 0):
+		raise ValueError("营养目标必须都是正数")
+	return vector
+
+
+def _slot_shares(meal_types: Sequence[str]) -> np.ndarray:
+	shares = np.array([DEFAULT_MEAL_SHARES[meal] for meal in meal_types])
+	return shares / shares.sum()
+
+
+def _interval_distance(target: np.ndarray, low: np.ndarray, high: np.ndarray, weights: np.ndarray) -> np.ndarray:
+	"""target 到区间 [low, high] 的加权 L1 距离，low/high 可以带前导维度。"""
+	return (np.maximum(low - target, 0) + np.maximum(target - high, 0)) @ weights
+
+
+def _slot_candidates(
+	matrix: RecipeMatrix,
+	slot_targets: np.ndarray,
+	weights: np.ndarray,
+	portions: np.ndarray,
+	top_k: int,
+	allowed: np.ndarray,
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+	"""为每个餐次返回候选 (食谱行号, 份数, 营养向量)。
+
+	每道食谱先取热量最接近该餐目标的份数，按这个份数下与该餐目标的距离取最接近的 top_k 道；
+	再把这些食谱的每种份数都作为候选，让分支定界可以用份数微调全天总量。
+	"""
+	macros = matrix.macros
+	# (S, n)：热量最接近各餐目标的份数下标（portions 升序）
+	ideal = slot_targets[:, 0:1] / macros[:, 0]
+	upper = np.clip(np.searchsorted(portions, ideal), 1, len(portions) - 1)
+	nearest = np.where(ideal - portions[upper - 1] <= portions[upper] - ideal, upper - 1, upper)
+	# (S, n)：该份数下与各餐目标的加权 L1 距离
+	distance = np.abs(portions[nearest][:, :, None] * macros[None] - slot_targets[:, None, :]) @ weights
+	usable = allowed.any(axis=1)
+
+	candidates = []
+	for s in range(len(slot_targets)):
+		scores = np.where(usable, distance[s], np.inf)
+		k = min(top_k, int(usable.sum()))
+		if k == 0:
+			return []
+		picked = np.argpartition(scores, k - 1)[:k]
+		# 同距离按食谱 id 排序，保证结果确定
+		picked = picked[np.lexsort((matrix.ids[picked], scores[picked]))]
+		rows = np.repeat(picked, len(portions))
+		cols = np.tile(np.arange(len(portions)), k)
+		keep = allowed[rows, cols]
+		rows, cols = rows[keep], cols[keep]
+		candidates.append((rows, portions[cols], macros[rows] * portions[cols, None]))
+	return candidates
+
+
+def optimize_day(
+	matrix: RecipeMatrix,
+	targets: Mapping[str, float],
+	*,
+	meal_types: Sequence[str] = tuple(DEFAULT_MEAL_SHARES),
+	portions: Sequence[float] = DEFAULT_PORTIONS,
+	tolerances: Mapping[str, float] | None = None,
+	exclude_ids: Collection[int] = (),
+	top_k: int = DEFAULT_TOP_K,
+	optimality_gap: float = DEFAULT_OPTIMALITY_GAP,
+	max_nodes: int = DEFAULT_MAX_NODES,
+) -> MealPlan:
+	"""为 meal_types 中每个餐次选一道不重复的食谱和份数，使全天营养尽量贴近 targets。
+
+	targets 与 app.py 的 nutrition_targets 同形：{"calories", "protein", "carbs", "fats"}。
+	目标函数是各项偏差除以 (容差 × 目标) 之和，再加上餐次热量偏离份额的惩罚；
+	所有偏差都不超过容差时 within_tolerance 为 True。候选不足时返回空的 meals。
+	optimality_gap > 0 时只要求结果与候选集上的最优解相差不超过这个值，换取更少的搜索节点；
+	评估的组合数超过 max_nodes 时提前结束，返回当时的最优解。
+	"""
+	started = time.perf_counter()
+	tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+	target = _target_vector(targets)
+	weights = 1.0 / (np.array([tolerances[key] for key in NUTRIENTS]) * target)
+	portions_arr = np.asarray(portions, dtype=np.float64)
+	shares = _slot_shares(meal_types)
+	allowed = np.ones((len(matrix), len(portions_arr)), dtype=bool)
+	if exclude_ids:
+		allowed[np.isin(matrix.ids, np.fromiter(exclude_ids, dtype=np.int64))] = False
+
+	candidates = _slot_candidates(matrix, shares[:, None] * target, weights, portions_arr, top_k, allowed)
+	if not candidates:
+		return _empty_plan(target, tolerances, started)
+	slots = [
+		(rows, slot_portions, vectors, SLOT_BALANCE_WEIGHT * np.abs(vectors[:, 0] - share * target[0]) / target[0])
+		for (rows, slot_portions, vectors), share in zip(candidates, shares)
+	]
+
+	# 剩余餐次（从第 s 个起）营养总和的逐列下/上界，以及惩罚项的下界
+	n_slots = len(slots)
+	suffix_low = np.zeros((n_slots + 1, 4))
+	suffix_high = np.zeros((n_slots + 1, 4))
+	suffix_penalty = np.zeros(n_slots + 1)
+	for s in range(n_slots - 1, -1, -1):
+		_, _, vectors, penalty = slots[s]
+		suffix_low[s] = suffix_low[s + 1] + vectors.min(axis=0)
+		suffix_high[s] = suffix_high[s + 1] + vectors.max(axis=0)
+		suffix_penalty[s] = suffix_penalty[s + 1] + penalty.min()
+
+	best_objective = np.inf
+	best_choice: list[int] | None = None
+	nodes = 0
+	choice: list[int] = []
+	used_rows: list[int] = []
+
+	def finish_pair(partial: np.ndarray, partial_penalty: float) -> None:
+		# 最后两个餐次一次性枚举全部组合（向量化），省掉最深两层的逐节点递归
+		nonlocal best_objective, best_choice, nodes
+		rows_a, _, vectors_a, penalty_a = slots[-2]
+		rows_b, _, vectors_b, penalty_b = slots[-1]
+		totals = partial + vectors_a[:, None, :] + vectors_b[None, :, :]
+		objective = (
+			np.abs(totals - target) @ weights + partial_penalty + penalty_a[:, None] + penalty_b[None, :]
+		)
+		objective[rows_a[:, None] == rows_b[None, :]] = np.inf
+		if used_rows:
+			objective[np.isin(rows_a, used_rows)] = np.inf
+			objective[:, np.isin(rows_b, used_rows)] = np.inf
+		nodes += objective.size
+		a, b = np.unravel_index(np.argmin(objective), objective.shape)
+		if objective[a, b] < best_objective - optimality_gap or best_choice is None and np.isfinite(objective[a, b]):
+			best_objective = float(objective[a, b])
+			best_choice = [*choice, int(a), int(b)]
+
+	def search(depth: int, partial: np.ndarray, partial_penalty: float) -> None:
+		nonlocal best_objective, best_choice, nodes
+		if depth + 2 == n_slots:
+			finish_pair(partial, partial_penalty)
+			return
+		rows, _, vectors, penalty = slots[depth]
+		sums = partial + vectors
+		if depth + 1 == n_slots:
+			# 只有一个餐次时直接取最优
+			objective = np.abs(sums - target) @ weights + penalty
+			i = int(np.argmin(objective))
+			best_objective, best_choice = float(objective[i]), [i]
+			nodes += len(objective)
+			return
+		bounds = (
+			_interval_distance(target, sums + suffix_low[depth + 1], sums + suffix_high[depth + 1], weights)
+			+ partial_penalty
+			+ penalty
+			+ suffix_penalty[depth + 1]
+		)
+		# 先走下界小的分支，更快找到好的可行解，后面剪枝更狠
+		for i in np.argsort(bounds, kind="stable"):
+			if bounds[i] >= best_objective - optimality_gap or nodes >= max_nodes:
+				break
+			row = int(rows[i])
+			if row in used_rows:
+				continue
+			nodes += 1
+			choice.append(int(i))
+			used_rows.append(row)
+			search(depth + 1, sums[i], partial_penalty + float(penalty[i]))
+			choice.pop()
+			used_rows.pop()
+
+	search(0, np.zeros(4), 0.0)
+	if best_choice is None:
+		return _empty_plan(target, tolerances, started, nodes)
+
+	meals = []
+	for meal_type, (rows, slot_portions, vectors, _), i in zip(meal_types, slots, best_choice):
+		meals.append(
+			PlannedMeal(
+				str(meal_type),
+				int(matrix.ids[rows[i]]),
+				float(slot_portions[i]),
+				*(round(float(v), 1) for v in vectors[i]),
+			)
+		)
+	totals = np.sum([slots[s][2][i] for s, i in enumerate(best_choice)], axis=0)
+	deviations = (totals - target) / target
+	return MealPlan(
+		meals=meals,
+		targets=dict(zip(NUTRIENTS, target.tolist())),
+		totals={key: round(float(v), 1) for key, v in zip(NUTRIENTS, totals)},
+		deviations={key: round(float(v), 4) for key, v in zip(NUTRIENTS, deviations)},
+		within_tolerance=all(abs(deviations[j]) <= tolerances[key] + 1e-9 for j, key in enumerate(NUTRIENTS)),
+		objective=best_objective,
+		nodes=nodes,
+		elapsed=time.perf_counter() - started,
+		tolerances=tolerances,
+	)
+
+
+def _empty_plan(target: np.ndarray, tolerances: dict[str, float], started: float, nodes: int = 0) -> MealPlan:
+	return MealPlan(
+		meals=[],
+		targets=dict(zip(NUTRIENTS, target.tolist())),
+		totals=dict.fromkeys(NUTRIENTS, 0.0),
+		deviations=dict.fromkeys(NUTRIENTS, -1.0),
+		within_tolerance=False,
+		objective=float("inf"),
+		nodes=nodes,
+		elapsed=time.perf_counter() - started,
+		tolerances=tolerances,
+	)
+
+
+def optimize_days(matrix: RecipeMatrix, targets: Mapping[str, float], days: int, **options) -> list[MealPlan]:
+	"""连续 days 天的计划，尽量不重复食谱：每天排除此前各天用过的食谱。
+
+	食谱库太小、排除后凑不出计划时，先退到只排除前一天的食谱，再不行就不排除。
+	options 透传给 optimize_day（exclude_ids 会与这里的排除集合并）。
+	"""
+	base_exclude = set(options.pop("exclude_ids", ()))
+	plans: list[MealPlan] = []
+	used: set[int] = set()
+	for _ in range(days):
+		previous = {meal.recipe_id for meal in plans[-1].meals} if plans else set()
+		for exclude in (used, previous, set()):
+			plan = optimize_day(matrix, targets, exclude_ids=base_exclude | exclude, **options)
+			if plan.meals:
+				break
+		plans.append(plan)
+		used.update(meal.recipe_id for meal in plan.meals)
+	return plans
+
+
+# ==========================================
+# 写入 DietPlan / DietPlanItem
+# ==========================================
+def user_targets(user) -> dict[str, float] | None:
+	"""CustomUser 上由 compute_targets 写回的目标；还没计算过时返回 None。"""
+	values = (user.target_calories, user.protein_g, user.carbs_g, user.fat_g)
+	if any(v is None for v in values) or not user.target_calories:
+		return None
+	return dict(zip(NUTRIENTS, map(float, values)))
+
+
+def save_meal_plan(user, plan_date: date, plan: MealPlan) -> DietPlan:
+	"""把计划写成 (user, date) 的 DietPlan：已存在则替换其条目，条目一次 bulk_create 写入。
+
+	bulk_create 与直接删除都不触发条目信号，当天总量直接取 plan.totals 一并写入。
+	"""
+	defaults = {"target_calories": int(round(plan.targets["calories"]))}
+	defaults.update({field: round(plan.totals[nutrient], 2) for nutrient, field in TOTAL_FIELDS.items()})
+	with transaction.atomic():
+		diet_plan, _ = DietPlan.objects.update_or_create(user=user, date=plan_date, defaults=defaults)
+		delete_plan_items([diet_plan.pk])
+		DietPlanItem.objects.bulk_create(
+			[
+				DietPlanItem(diet_plan=diet_plan, recipe_id=meal.recipe_id, meal_type=meal.meal_type, portion=meal.portion)
+				for meal in plan.meals
+			]
+		)
+	return diet_plan
+
+
+def plan_day_for_user(user, plan_date: date, **options) -> tuple[DietPlan, MealPlan]:
+	"""按用户已保存的营养目标生成并保存某一天的计划，options 透传给 optimize_day。"""
+	targets = user_targets(user)
+	if targets is None:
+		raise ValueError(f"用户 {user} 还没有营养目标，请先运行 manage.py compute_targets")
+	plan = optimize_day(get_recipe_matrix(), targets, **options)
+	if not plan.meals:
+		raise ValueError("食谱库中没有足够的可用食谱来生成计划")
+	return save_meal_plan(user, plan_date, plan), plan
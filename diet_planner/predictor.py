@@ -0,0 +1,109 @@
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+
+from .model_registry import ModelRegistry, registry, select_model_name
+
+FEATURE_ORDER = ("age", "weight", "height", "activity_level")
+
+PRED_MAP = {
+	"0": "减脂",
+	"1": "维持",
+	"2": "增肌",
+	"cut": "减脂",
+	"loss": "减脂",
+	"lose": "减脂",
+	"maintain": "维持",
+	"bulk": "增肌",
+	"gain": "增肌",
+	"减脂": "减脂",
+	"维持": "维持",
+	"增肌": "增肌",
+}
+
+
+def map_prediction_label(value: object) -> str:
+	"""把模型输出（数字/英文/中文标签）统一映射为 减脂/维持/增肌。"""
+	text = str(value)
+	return PRED_MAP.get(text.strip().lower(), text)
+
+
+def quantize_features(age: int, weight: float, height: float, activity_level: float) -> tuple[int, float, float, float]:
+	# 与侧边栏控件步长一致：年龄 1 岁、体重 0.5kg、身高 1cm
+	return (
+		int(age),
+		round(float(weight) * 2) / 2,
+		float(round(float(height))),
+		round(float(activity_level), 3),
+	)
+
+
+class StrategyPredictor:
+	"""侧边栏策略模型的预测服务。
+
+	以 (量化后的特征, 模型 sha256) 为键做有界 LRU 缓存；未命中时用按模型特征顺序
+	预分配的单行 NumPy 数组推理，不经过 pandas。返回值已映射为中文策略标签。
+	model_name 为空时按训练清单挑达到准确率下限且最快的模型，没有清单则优先用导出的 .npz，再退回 .pkl。
+	"""
+
+	def __init__(
+		self,
+		model_name: str | None = None,
+		*,
+		model_registry: ModelRegistry = registry,
+		cache_size: int = 1024,
+	) -> None:
+		self.model_name = model_name
+		self.model_registry = model_registry
+		self.cache_size = cache_size
+		self._lock = threading.Lock()
+		self._cache: OrderedDict[tuple, str] = OrderedDict()
+		self._local = threading.local()
+		self.hits = 0
+		self.misses = 0
+
+	def _row_buffer(self, model: object) -> tuple[np.ndarray, list[int]]:
+		# 每个线程一份预分配的 (1, 4) 数组；列顺序以训练时记录的 feature_names_in_ 为准
+		names = tuple(getattr(model, "feature_names_in_", FEATURE_ORDER))
+		cached = getattr(self._local, "buffer", None)
+		if cached is None or cached[0] != names:
+			order = [FEATURE_ORDER.index(name) for name in names]
+			cached = (names, np.empty((1, len(names)), dtype=np.float64), order)
+			self._local.buffer = cached
+		return cached[1], cached[2]
+
+	def predict(self, age: int, weight: float, height: float, activity_level: float) -> str:
+		loaded = self.model_registry.get(self.model_name or select_model_name(self.model_registry.model_dir))
+		features = quantize_features(age, weight, height, activity_level)
+		key = (features, loaded.sha256)
+
+		with self._lock:
+			label = self._cache.get(key)
+			if label is not None:
+				self._cache.move_to_end(key)
+				self.hits += 1
+				return label
+			self.misses += 1
+
+		row, order = self._row_buffer(loaded.model)
+		row[0, :] = [features[i] for i in order]
+		with warnings.catch_warnings():
+			# 模型按 DataFrame 训练，传 ndarray 时 sklearn 会提示缺少特征名；列顺序已按 feature_names_in_ 对齐
+			warnings.filterwarnings("ignore", message="X does not have valid feature names")
+			prediction = loaded.model.predict(row)
+		label = map_prediction_label(prediction[0] if hasattr(prediction, "__len__") else prediction)
+
+		with self._lock:
+			self._cache[key] = label
+			while len(self._cache) > self.cache_size:
+				self._cache.popitem(last=False)
+		return label
+
+
+predictor = StrategyPredictor()
+
+
+def predict_strategy(age: int, weight: float, height: float, activity_level: float) -> str:
+	return predictor.predict(age, weight, height, activity_level)
@@ -1,3 +1,336 @@
-from django.test import TestCase
+import io
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+import chat_history
+from chat_history import window_history
+from recipes.models import Recipe
+from token_budget import estimate_tokens
+from users.models import CustomUser
+
+from .models import DietPlan, DietPlanItem
+from .optimizer import (
+	DEFAULT_PORTIONS,
+	DEFAULT_TOLERANCES,
+	NUTRIENTS,
+	RecipeMatrix,
+	optimize_day,
+	optimize_days,
+	save_meal_plan,
+)
+from .totals import TOTAL_FIELDS, recompute_plan_totals
+
+TARGETS = {"calories": 2000, "protein": 120, "carbs": 230, "fats": 65}
+
+
+def _conversation(turns: int, words: int = 20) -> list[dict[str, str]]:
+	messages = []
+	for i in range(turns):
+		messages.append({"role": "user", "content": f"第{i}轮提问：" + "想吃高蛋白的晚餐 " * words})
+		messages.append({"role": "assistant", "content": f"第{i}轮回答：" + "推荐清蒸鳕鱼配时蔬 " * words})
+	return messages
+
+
+# ==========================================
+# 对话历史窗口：token 预算与增量滚动摘要
+# ==========================================
+class WindowHistoryTests(SimpleTestCase):
+	def test_window_respects_turns_and_token_budget(self):
+		messages = _conversation(10)
+		kept, summary = window_history(messages, keep_turns=4, token_budget=10_000, summary_token_budget=10_000)
+		self.assertEqual(kept, messages[-8:])
+		self.assertEqual(len(summary.splitlines()), 12)
+
+		kept, _ = window_history(messages, keep_turns=4, token_budget=300, summary_token_budget=10_000)
+		self.assertLess(len(kept), 8)
+		self.assertLessEqual(sum(estimate_tokens(m["content"]) for m in kept), 300)
+		self.assertEqual(kept[-1], messages[-1])
+
+	def test_last_message_kept_even_over_budget(self):
+		messages = _conversation(3, words=200)
+		kept, _ = window_history(messages, keep_turns=4, token_budget=10, summary_token_budget=10_000)
+		self.assertEqual(kept, messages[-1:])
+
+	def test_summary_respects_token_budget(self):
+		messages = _conversation(20)
+		_, summary = window_history(messages, keep_turns=2, token_budget=10_000, summary_token_budget=120)
+		self.assertLessEqual(estimate_tokens(summary), 120)
+		# 超预算时丢弃的是最早的摘要行，最近滑出窗口的消息仍在
+		self.assertIn("第17轮回答", summary)
+		self.assertNotIn("第0轮提问", summary)
+
+	def test_summary_updates_incrementally(self):
+		messages = _conversation(12)
+		options = {"keep_turns": 3, "token_budget": 10_000, "summary_token_budget": 10_000}
+		state: dict = {}
+		window_history(messages[:16], state, **options)
+		self.assertEqual(state["summarized"], 10)
+
+		with mock.patch.object(chat_history, "_summarize_message", wraps=chat_history._summarize_message) as summarize:
+			kept, summary = window_history(messages, state, **options)
+		# 只压缩新滑出窗口的 8 条消息，之前的摘要行直接沿用
+		self.assertEqual(summarize.call_count, 8)
+		self.assertEqual((kept, summary), window_history(messages, **options))
+
+	def test_new_conversation_rebuilds_summary(self):
+		options = {"keep_turns": 2, "token_budget": 10_000, "summary_token_budget": 10_000}
+		state: dict = {}
+		window_history(_conversation(8), state, **options)
+
+		# 同一个 state 换了一段对话（已摘要部分的最后一条对不上），摘要从头重建
+		other = [{"role": m["role"], "content": "素食早餐：" + m["content"]} for m in _conversation(8)]
+		_, summary = window_history(other, state, **options)
+		self.assertEqual(summary, window_history(other, **options)[1])
+		self.assertTrue(all("素食早餐" in line for line in summary.splitlines()))
+
+
+# ==========================================
+# 膳食优化器：确定性与容差
+# ==========================================
+def _random_matrix(n: int, seed: int = 7) -> RecipeMatrix:
+	rng = np.random.default_rng(seed)
+	protein, carbs, fats = rng.uniform(5, 60, n), rng.uniform(5, 110, n), rng.uniform(2, 40, n)
+	calories = protein * 4 + carbs * 4 + fats * 9 + rng.uniform(-20, 20, n)
+	return RecipeMatrix(np.arange(1, n + 1, dtype=np.int64), np.column_stack([calories, protein, carbs, fats]))
+
+
+class OptimizerTests(SimpleTestCase):
+	def setUp(self):
+		self.matrix = _random_matrix(400)
+
+	def _signature(self, plan) -> list[tuple]:
+		return [(meal.meal_type, meal.recipe_id, meal.portion) for meal in plan.meals]
+
+	def test_same_input_same_plan(self):
+		first = optimize_day(self.matrix, TARGETS)
+		second = optimize_day(self.matrix, TARGETS)
+		self.assertEqual(self._signature(first), self._signature(second))
+		self.assertEqual((first.totals, first.objective), (second.totals, second.objective))
+
+	def test_row_order_does_not_matter(self):
+		order = np.random.default_rng(1).permutation(len(self.matrix))
+		shuffled = RecipeMatrix(self.matrix.ids[order], self.matrix.macros[order])
+		self.assertEqual(
+			self._signature(optimize_day(self.matrix, TARGETS)), self._signature(optimize_day(shuffled, TARGETS))
+		)
+
+	def test_plan_within_tolerance(self):
+		plan = optimize_day(self.matrix, TARGETS)
+		self.assertTrue(plan.within_tolerance)
+		self.assertEqual(plan.tolerances, DEFAULT_TOLERANCES)
+		for nutrient in NUTRIENTS:
+			with self.subTest(nutrient=nutrient):
+				self.assertLessEqual(abs(plan.deviations[nutrient]), DEFAULT_TOLERANCES[nutrient] + 1e-9)
+				self.assertAlmostEqual(
+					plan.totals[nutrient], sum(getattr(meal, nutrient) for meal in plan.meals), delta=0.3
+				)
+
+	def test_plan_shape(self):
+		plan = optimize_day(self.matrix, TARGETS, exclude_ids=range(1, 201))
+		self.assertEqual([meal.meal_type for meal in plan.meals], ["breakfast", "lunch", "dinner", "snack"])
+		recipe_ids = [meal.recipe_id for meal in plan.meals]
+		self.assertEqual(len(set(recipe_ids)), len(recipe_ids))
+		self.assertTrue(all(recipe_id > 200 for recipe_id in recipe_ids))
+		self.assertTrue(all(meal.portion in DEFAULT_PORTIONS for meal in plan.meals))
+
+	def test_tighter_tolerance_is_reported(self):
+		tight = {nutrient: 0.01 for nutrient in NUTRIENTS}
+		plan = optimize_day(self.matrix, TARGETS, tolerances=tight)
+		self.assertEqual(plan.tolerances, tight)
+		within = all(abs(plan.deviations[nutrient]) <= 0.01 for nutrient in NUTRIENTS)
+		self.assertEqual(plan.within_tolerance, within)
+
+	def test_unreachable_target_is_not_within_tolerance(self):
+		plan = optimize_day(self.matrix, {"calories": 9000, "protein": 40, "carbs": 50, "fats": 10})
+		self.assertTrue(plan.meals)
+		self.assertFalse(plan.within_tolerance)
+
+	def test_not_enough_recipes(self):
+		plan = optimize_day(_random_matrix(2), TARGETS)
+		self.assertEqual(plan.meals, [])
+		self.assertFalse(plan.within_tolerance)
+
+	def test_consecutive_days_do_not_repeat_recipes(self):
+		plans = optimize_days(self.matrix, TARGETS, 5)
+		recipe_ids = [meal.recipe_id for plan in plans for meal in plan.meals]
+		self.assertEqual(len(recipe_ids), 20)
+		self.assertEqual(len(set(recipe_ids)), 20)
+		again = optimize_days(self.matrix, TARGETS, 5)
+		self.assertEqual([self._signature(plan) for plan in plans], [self._signature(plan) for plan in again])
+
+
+# ==========================================
+# 计划总量：条目增删改时增量维护
+# ==========================================
+class PlanTotalsTests(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.user = CustomUser.objects.create(username="totals")
+		cls.oats = Recipe.objects.create(name="燕麦杯", calories=400, protein=20, carbs=60, fats=10)
+		cls.chicken = Recipe.objects.create(name="鸡胸肉沙拉", calories=350, protein=40, carbs=10, fats=12)
+
+	def setUp(self):
+		self.plan = DietPlan.objects.create(user=self.user, date=date(2026, 1, 5), target_calories=2000)
+
+	def _totals(self) -> tuple[float, ...]:
+		self.plan.refresh_from_db()
+		return tuple(round(getattr(self.plan, field), 2) for field in TOTAL_FIELDS.values())
+
+	def _add(self, recipe: Recipe, portion: float = 1.0, meal_type: str = "lunch") -> DietPlanItem:
+		return DietPlanItem.objects.create(diet_plan=self.plan, recipe=recipe, meal_type=meal_type, portion=portion)
+
+	def test_create(self):
+		self.assertEqual(self._totals(), (0, 0, 0, 0))
+		self._add(self.oats, 1.5, "breakfast")
+		self.assertEqual(self._totals(), (600, 30, 90, 15))
+		self._add(self.chicken)
+		self.assertEqual(self._totals(), (950, 70, 100, 27))
+
+	def test_edit_portion_and_recipe(self):
+		item = self._add(self.oats)
+		item.portion = 2
+		item.save()
+		self.assertEqual(self._totals(), (800, 40, 120, 20))
+		item.recipe = self.chicken
+		item.save()
+		self.assertEqual(self._totals(), (700, 80, 20, 24))
+
+	def test_move_item_between_plans(self):
+		other = DietPlan.objects.create(user=self.user, date=date(2026, 1, 6), target_calories=2000)
+		item = self._add(self.oats)
+		item.diet_plan = other
+		item.save()
+		other.refresh_from_db()
+		self.assertEqual(self._totals(), (0, 0, 0, 0))
+		self.assertEqual(other.total_calories, 400)
+
+	def test_delete(self):
+		item = self._add(self.oats)
+		self._add(self.chicken, 0.5)
+		item.delete()
+		self.assertEqual(self._totals(), (175, 20, 5, 6))
+		self.plan.items.all().delete()
+		self.assertEqual(self._totals(), (0, 0, 0, 0))
+
+	def test_recipe_macro_change_recomputes_plans(self):
+		self._add(self.oats, 2)
+		self.oats.calories = 450
+		self.oats.save(update_fields=["calories"])
+		self.assertEqual(self._totals()[0], 900)
+
+	def test_deleting_recipe_removes_its_share(self):
+		self._add(self.oats)
+		self._add(self.chicken)
+		self.chicken.delete()
+		self.assertEqual(self._totals(), (400, 20, 60, 10))
+
+	def test_bulk_writes_and_reconcile(self):
+		beef = Recipe.objects.create(name="牛肉饭", calories=500, protein=30, carbs=50, fats=20)
+		recipes = (self.oats, self.chicken, beef)
+		matrix = RecipeMatrix(
+			np.array([recipe.pk for recipe in recipes], dtype=np.int64),
+			np.array([[getattr(recipe, nutrient) for nutrient in NUTRIENTS] for recipe in recipes], dtype=np.float64),
+		)
+		plan = optimize_day(matrix, TARGETS, meal_types=("breakfast", "lunch"))
+		self.assertTrue(plan.meals)
+		# save_meal_plan 绕过条目信号，总量随计划一并写入
+		saved = save_meal_plan(self.user, date(2026, 1, 7), plan)
+		self.assertAlmostEqual(saved.total_calories, plan.totals["calories"], delta=0.1)
+		self.assertEqual(recompute_plan_totals([saved.pk]), 0)
+
+		# 直接改库造成的偏差由 reconcile_plan_totals 修正
+		DietPlan.objects.filter(pk=self.plan.pk).update(total_calories=123)
+		self._add(self.oats)
+		call_command("reconcile_plan_totals", stdout=io.StringIO())
+		self.assertEqual(self._totals(), (400, 20, 60, 10))
+
+
+# ==========================================
+# 计划 API：start / days 参数与权限
+# ==========================================
+class PlanListViewTests(TestCase):
+	URL = "/api/plans/"
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.user = CustomUser.objects.create(username="planner")
+		cls.other = CustomUser.objects.create(username="other")
+		cls.recipe = Recipe.objects.create(name="燕麦杯", calories=400, protein=20, carbs=60, fats=10)
+		for day in (date(2026, 1, 5), date(2026, 1, 7), date(2026, 1, 12), date.max):
+			plan = DietPlan.objects.create(user=cls.user, date=day, target_calories=2000)
+			DietPlanItem.objects.create(diet_plan=plan, recipe=cls.recipe, meal_type="breakfast", portion=1.5)
+		DietPlan.objects.create(user=cls.other, date=date(2026, 1, 5), target_calories=1800)
+
+	def setUp(self):
+		self.client.force_login(self.user)
+
+	def _dates(self, response) -> list[str]:
+		self.assertEqual(response.status_code, 200, response.content)
+		return [plan["date"] for plan in response.json()["plans"]]
+
+	def test_start_and_days(self):
+		response = self.client.get(self.URL, {"start": "2026-01-05", "days": 7})
+		self.assertEqual(self._dates(response), ["2026-01-05", "2026-01-07"])
+		body = response.json()
+		self.assertEqual((body["user"], body["start"], body["days"]), (self.user.pk, "2026-01-05", 7))
+		self.assertEqual(body["plans"][0]["totals"], {"calories": 600.0, "protein": 30.0, "carbs": 90.0, "fats": 15.0})
+		self.assertEqual(body["plans"][0]["meals"][0]["recipe"], "燕麦杯")
+
+		self.assertEqual(self._dates(self.client.get(self.URL, {"start": "2026-01-06", "days": 1})), [])
+		response = self.client.get(self.URL, {"start": "2026-01-07", "days": "31"})
+		self.assertEqual(self._dates(response), ["2026-01-07", "2026-01-12"])
+
+	def test_defaults_to_a_week_from_today(self):
+		today = timezone.localdate()
+		DietPlan.objects.create(user=self.user, date=today + timedelta(days=6), target_calories=2000)
+		DietPlan.objects.create(user=self.user, date=today + timedelta(days=7), target_calories=2000)
+		body = self.client.get(self.URL).json()
+		self.assertEqual((body["start"], body["days"]), (today.isoformat(), 7))
+		self.assertIn((today + timedelta(days=6)).isoformat(), self._dates(self.client.get(self.URL)))
+		self.assertNotIn((today + timedelta(days=7)).isoformat(), self._dates(self.client.get(self.URL)))
+
+	def test_range_near_date_max(self):
+		for start in ("9999-12-25", "9999-12-30", "9999-12-31"):
+			with self.subTest(start=start):
+				response = self.client.get(self.URL, {"start": start, "days": 31})
+				self.assertEqual(self._dates(response), ["9999-12-31"])
+
+	def test_invalid_parameters(self):
+		for params in (
+			{"days": 0},
+			{"days": 32},
+			{"days": "abc"},
+			{"start": "2026-13-01"},
+			{"start": "yesterday"},
+			{"user": 0},
+		):
+			with self.subTest(params=params):
+				response = self.client.get(self.URL, params)
+				self.assertEqual(response.status_code, 400)
+				self.assertIn("error", response.json())
+
+	def test_authentication_and_permissions(self):
+		self.assertEqual(self.client.get(self.URL, {"user": self.user.pk}).status_code, 200)
+		self.assertEqual(self.client.get(self.URL, {"user": self.other.pk}).status_code, 403)
+
+		self.user.is_staff = True
+		self.user.save(update_fields=["is_staff"])
+		response = self.client.get(self.URL, {"user": self.other.pk, "start": "2026-01-01", "days": 31})
+		self.assertEqual(self._dates(response), ["2026-01-05"])
+
+		self.client.logout()
+		self.assertEqual(self.client.get(self.URL).status_code, 401)
+
+	def test_conditional_request(self):
+		params = {"start": "2026-01-05", "days": 7}
+		etag = self.client.get(self.URL, params)["ETag"]
+		self.assertEqual(self.client.get(self.URL, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		DietPlanItem.objects.create(
+			diet_plan=DietPlan.objects.get(user=self.user, date=date(2026, 1, 5)), recipe=self.recipe, meal_type="lunch"
+		)
+		self.assertEqual(self.client.get(self.URL, params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,150 @@
+from collections import defaultdict
+from collections.abc import Iterable
+
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.models import Recipe
+
+from .models import DietPlan, DietPlanItem
+
+# 食谱营养列 -> DietPlan 上对应的总量列
+TOTAL_FIELDS = {
+	"calories": "total_calories",
+	"protein": "total_protein",
+	"carbs": "total_carbs",
+	"fats": "total_fats",
+}
+# 重新汇总时，与已存值相差不超过这个量就视为一致：
+# 增量更新有浮点累积误差，优化器写入的总量保留一位小数
+TOTAL_EPSILON = 0.1
+
+
+# ==========================================
+# 批量重算：一块计划一条聚合查询
+# ==========================================
+def _aggregate_totals(plan_ids: list[int]) -> dict[int, tuple[float, ...]]:
+	rows = (
+		DietPlanItem.objects.filter(diet_plan_id__in=plan_ids)
+		.values("diet_plan_id")
+		.annotate(
+			**{
+				field: Sum(F(f"recipe__{nutrient}") * F("portion"), output_field=FloatField())
+				for nutrient, field in TOTAL_FIELDS.items()
+			}
+		)
+		.values_list("diet_plan_id", *TOTAL_FIELDS.values())
+	)
+	return {plan_id: tuple(round(v or 0.0, 2) for v in values) for plan_id, *values in rows}
+
+
+def recompute_plan_totals(plan_ids: Iterable[int]) -> int:
+	"""按条目重新汇总这些计划的总量，只写回与已存值不一致的计划，返回写回的个数。
+
+	没有条目的计划总量为 0。plan_ids 的个数由调用方控制（IN 列表受数据库参数个数限制）。
+	"""
+	plan_ids = list(plan_ids)
+	if not plan_ids:
+		return 0
+	totals = _aggregate_totals(plan_ids)
+	zero = (0.0,) * len(TOTAL_FIELDS)
+	changed = []
+	for plan in DietPlan.objects.filter(pk__in=plan_ids).only("id", *TOTAL_FIELDS.values()):
+		expected = totals.get(plan.pk, zero)
+		current = [getattr(plan, field) for field in TOTAL_FIELDS.values()]
+		if any(abs(a - b) > TOTAL_EPSILON for a, b in zip(current, expected)):
+			for field, value in zip(TOTAL_FIELDS.values(), expected):
+				setattr(plan, field, value)
+			changed.append(plan)
+	DietPlan.objects.bulk_update(changed, list(TOTAL_FIELDS.values()), batch_size=1000)
+	return len(changed)
+
+
+def delete_plan_items(plan_ids: list[int], chunk_size: int = 5000) -> None:
+	"""直接用 SQL 删掉这些计划的全部条目，不触发 post_delete。
+
+	供整天替换条目的批量写入使用，调用方须同时写好（或随后重算）这些计划的总量。
+	"""
+	table = connection.ops.quote_name(DietPlanItem._meta.db_table)
+	column = connection.ops.quote_name("diet_plan_id")
+	with connection.cursor() as cursor:
+		# 分段删除，IN 列表不超过数据库的参数个数上限
+		for i in range(0, len(plan_ids), chunk_size):
+			chunk = plan_ids[i : i + chunk_size]
+			placeholders = ", ".join(["%s"] * len(chunk))
+			cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", chunk)
+
+
+# ==========================================
+# 增量维护：条目增删改时按差值更新所属计划
+# ==========================================
+def _apply_deltas(changes: list[tuple[int, int, float]]) -> None:
+	"""changes 为 [(计划 id, 食谱 id, 份数变化), ...]，合并成每个计划一条 UPDATE ... SET total = total + delta。"""
+	macros = {
+		row[0]: row[1:]
+		for row in Recipe.objects.filter(pk__in={recipe_id for _, recipe_id, _ in changes}).values_list(
+			"id", *TOTAL_FIELDS
+		)
+	}
+	deltas: dict[int, list[float]] = defaultdict(lambda: [0.0] * len(TOTAL_FIELDS))
+	stale: set[int] = set()
+	for plan_id, recipe_id, portion in changes:
+		if recipe_id not in macros:
+			# 食谱已经不在了，差值无从算起，改为整体重算
+			stale.add(plan_id)
+			continue
+		delta = deltas[plan_id]
+		for i, value in enumerate(macros[recipe_id]):
+			delta[i] += (value or 0.0) * portion
+	with transaction.atomic():
+		for plan_id, delta in deltas.items():
+			if plan_id in stale or not any(delta):
+				continue
+			DietPlan.objects.filter(pk=plan_id).update(
+				**{field: F(field) + value for field, value in zip(TOTAL_FIELDS.values(), delta)}
+			)
+		recompute_plan_totals(stale)
+
+
+@receiver(pre_save, sender=DietPlanItem, dispatch_uid="diet_planner.totals.remember_item")
+def _remember_item(sender, instance: DietPlanItem, raw: bool = False, **kwargs) -> None:
+	# 修改已有条目时记下库里的旧值，保存后先减旧再加新
+	instance._totals_previous = None
+	if raw or instance.pk is None:
+		return
+	instance._totals_previous = (
+		DietPlanItem.objects.filter(pk=instance.pk).values_list("diet_plan_id", "recipe_id", "portion").first()
+	)
+
+
+@receiver(post_save, sender=DietPlanItem, dispatch_uid="diet_planner.totals.item_saved")
+def _on_item_saved(sender, instance: DietPlanItem, raw: bool = False, **kwargs) -> None:
+	# loaddata（raw=True）时计划的总量随夹具一起导入
+	if raw:
+		return
+	changes = [(instance.diet_plan_id, instance.recipe_id, instance.portion)]
+	previous = getattr(instance, "_totals_previous", None)
+	if previous is not None:
+		plan_id, recipe_id, portion = previous
+		changes.append((plan_id, recipe_id, -portion))
+	_apply_deltas(changes)
+
+
+@receiver(post_delete, sender=DietPlanItem, dispatch_uid="diet_planner.totals.item_deleted")
+def _on_item_deleted(sender, instance: DietPlanItem, **kwargs) -> None:
+	# 级联删除时条目先于食谱删除，这里仍能查到食谱的营养值
+	_apply_deltas([(instance.diet_plan_id, instance.recipe_id, -instance.portion)])
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="diet_planner.totals.recipe_saved")
+def _on_recipe_saved(sender, instance: Recipe, created: bool, raw: bool = False, update_fields=None, **kwargs) -> None:
+	# 食谱营养值改了，用到它的计划整体重算；新食谱还没有计划引用
+	if created or raw or (update_fields is not None and not set(update_fields) & set(TOTAL_FIELDS)):
+		return
+	plan_ids = list(
+		DietPlanItem.objects.filter(recipe_id=instance.pk).values_list("diet_plan_id", flat=True).distinct()
+	)
+	for i in range(0, len(plan_ids), 1000):
+		recompute_plan_totals(plan_ids[i : i + 1000])
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = "diet_planner"
+
+urlpatterns = [
+	path("targets/", views.targets, name="targets"),
+	path("plans/", views.plan_list, name="plan-list"),
+]
@@ -1,3 +1,83 @@
-from django.shortcuts import render
+from datetime import date, timedelta
 
-# Create your views here.
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.views.decorators.cache import cache_control
+
+from nutrition_project.api import ApiError, api_view, json_response, query_date, query_float, query_int, require
+
+from .models import DietPlan, DietPlanItem
+from .nutrition import GOAL_ALIASES, MALE_VALUES, compute_targets
+from .totals import TOTAL_FIELDS
+
+MAX_PLAN_DAYS = 31
+MEAL_ORDER = {value: i for i, value in enumerate(DietPlanItem.MealType.values)}
+
+
+@api_view
+@cache_control(public=True, max_age=86400)
+def targets(request):
+	"""营养目标计算器：与侧边栏、compute_targets 命令同一套公式。结果只取决于参数，可以长期缓存。"""
+	gender = require(request.GET.get("gender"), "gender").strip().lower()
+	if gender not in MALE_VALUES and gender not in ("female", "f", "女"):
+		raise ApiError("参数 gender 应为 male 或 female")
+	goal = request.GET.get("goal", "maintain").strip().lower()
+	if goal not in GOAL_ALIASES:
+		raise ApiError("参数 goal 应为 lose、maintain 或 gain")
+	age = require(query_int(request, "age", low=10, high=100), "age")
+	height = require(query_float(request, "height", low=100, high=250), "height")
+	weight = require(query_float(request, "weight", low=20, high=300), "weight")
+	activity = query_float(request, "activity", 1.375, low=1.2, high=1.9)
+
+	result = compute_targets(gender, age, height, weight, activity, goal)
+	return json_response(
+		{
+			"gender": "male" if gender in MALE_VALUES else "female",
+			"age": age,
+			"height": height,
+			"weight": weight,
+			"activity": activity,
+			"goal": GOAL_ALIASES[goal],
+			**{key: int(value.item()) for key, value in result.items()},
+		}
+	)
+
+
+@api_view
+@cache_control(private=True, no_cache=True)
+def plan_list(request):
+	"""当前登录用户从 start 起 days 天的饮食计划（含当天总量与各餐条目），管理员可用 user 查看他人。
+
+	计划表没有修改时间，ETag 按响应内容计算：仍要查询，但未变化时省掉传输。
+	"""
+	if not request.user.is_authenticated:
+		raise ApiError("需要登录", status=401)
+	user_id = request.user.pk
+	other = query_int(request, "user", low=1)
+	if other is not None and other != user_id:
+		if not request.user.is_staff:
+			raise ApiError("无权查看其他用户的计划", status=403)
+		user_id = other
+	start = query_date(request, "start", timezone.localdate())
+	days = query_int(request, "days", 7, low=1, high=MAX_PLAN_DAYS)
+	# 临近 9999-12-31 时 start + days 会越界，截到 date.max
+	end = start + min(timedelta(days=days - 1), date.max - start)
+
+	plans = list(
+		DietPlan.objects.filter(user_id=user_id, date__range=(start, end))
+		.order_by("date")
+		.values("id", "date", "target_calories", *TOTAL_FIELDS.values())
+	)
+	meals: dict[int, list[dict]] = {plan["id"]: [] for plan in plans}
+	items = DietPlanItem.objects.filter(diet_plan_id__in=list(meals)).values_list(
+		"diet_plan_id", "meal_type", "recipe_id", "recipe__name", "portion"
+	)
+	for plan_id, meal_type, recipe_id, name, portion in items:
+		meals[plan_id].append({"meal_type": meal_type, "recipe_id": recipe_id, "recipe": name, "portion": portion})
+	for plan in plans:
+		plan["date"] = plan["date"].isoformat()
+		plan["totals"] = {nutrient: round(plan.pop(field), 1) for nutrient, field in TOTAL_FIELDS.items()}
+		plan["meals"] = sorted(meals[plan["id"]], key=lambda meal: (MEAL_ORDER.get(meal["meal_type"], 99), meal["recipe_id"]))
+
+	response = set_response_etag(json_response({"user": user_id, "start": start.isoformat(), "days": days, "plans": plans}))
+	return get_conditional_response(request, etag=response.get("ETag"), response=response)
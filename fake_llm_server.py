@@ -0,0 +1,212 @@
+"""
+本地假的 OpenAI 兼容接口（POST .../chat/completions），供测试与压测使用：不联网、不计费。
+
+- 默认回复固定文本（或 content(序号, 请求体) 生成的文本），stream=true 时按 SSE + 分块传输逐片发出；
+- script() 可以为接下来的请求依次指定状态码、响应头（如 Retry-After）、延迟，或让流发到一半断开；
+- 记录请求数、发出时间、同时在途的最大请求数与建立过的 TCP 连接数，用来断言并发上限、限速与连接复用。
+
+用法：python fake_llm_server.py --port 8001 --latency-ms 200
+"""
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONTENT = "推荐：泰式青柠煎鸡胸。"
+
+
+@dataclass
+class FakeReply:
+    """一次编排好的响应。chunks 为 None 时流式回复按 content 整段发出；cut_after 为发出几片后直接断开连接。"""
+
+    status: int = 200
+    content: str | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+    chunks: list[str] | None = None
+    cut_after: int | None = None
+    delay: float = 0.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: "FakeLLMServer"
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+    def setup(self):
+        # 每个处理器实例对应一条 TCP 连接，keep-alive 时同一连接上的请求都走这里
+        super().setup()
+        self.fake._on_connect()
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}", "type": "not_found"}})
+            return
+
+        index, reply = self.fake._begin(payload)
+        try:
+            time.sleep(self.fake.latency + reply.delay)
+            if reply.status != 200:
+                self._send_json(
+                    reply.status,
+                    {"error": {"message": f"fake error {reply.status}", "type": "fake_error", "code": reply.status}},
+                    reply.headers,
+                )
+                return
+            content = reply.content if reply.content is not None else self.fake.render(index, payload)
+            if payload.get("stream"):
+                self._send_stream(reply.chunks if reply.chunks is not None else [content], reply)
+            else:
+                self._send_json(200, _completion(content, payload), reply.headers)
+        finally:
+            self.fake._end()
+
+    def _send_json(self, status: int, body: dict, headers: dict[str, str] | None = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, chunks: list[str], reply: FakeReply) -> None:
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        for name, value in reply.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        for i, text in enumerate(chunks):
+            if reply.cut_after is not None and i >= reply.cut_after:
+                # 不发结束块直接断开：客户端读到的是不完整的分块响应
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self._write_chunk(f"data: {json.dumps(_chunk(text), ensure_ascii=False)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _write_chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _completion(content: str, payload: dict) -> dict:
+    return {
+        "id": "fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model") or "fake",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+def _chunk(text: str) -> dict:
+    return {
+        "id": "fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "fake",
+        "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+    }
+
+
+class FakeLLMServer:
+    """在 127.0.0.1 的随机端口上起一个假接口；url 可直接作为 base_url 传给 OpenAI 客户端。"""
+
+    def __init__(
+        self, *, port: int = 0, latency: float = 0.0, content: str | Callable[[int, dict], str] = DEFAULT_CONTENT
+    ):
+        self.latency = latency
+        self.content = content
+        self.request_times: list[float] = []
+        self.payloads: list[dict] = []
+        self.connections = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self._replies: deque[FakeReply] = deque()
+        self._lock = threading.Lock()
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def requests(self) -> int:
+        with self._lock:
+            return len(self.request_times)
+
+    def script(self, *replies: FakeReply) -> None:
+        """接下来的请求依次使用这些响应，用完后恢复默认回复。"""
+        with self._lock:
+            self._replies.extend(replies)
+
+    def render(self, index: int, payload: dict) -> str:
+        return self.content(index, payload) if callable(self.content) else self.content
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _on_connect(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def _begin(self, payload: dict) -> tuple[int, FakeReply]:
+        with self._lock:
+            index = len(self.request_times)
+            self.request_times.append(time.monotonic())
+            self.payloads.append(payload)
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+            return index, self._replies.popleft() if self._replies else FakeReply()
+
+    def _end(self) -> None:
+        with self._lock:
+            self.inflight -= 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本地假的 OpenAI 兼容接口")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeLLMServer(port=args.port, latency=args.latency_ms / 1000).start()
+    print(f"假接口已启动：DEEPSEEK_BASE_URL={fake.url}")
+    try:
+        fake._thread.join()
+    except KeyboardInterrupt:
+        fake.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+import json
+from collections.abc import Iterable, Iterator
+
+# ==========================================
+# 增量 JSON 对象解析（面向流式 LLM 输出）
+# ==========================================
+# 模型输出形如 ```json [ {...}, {...} ] ``` 外加可能的说明文字。这里逐字符跟踪花括号深度与
+# 字符串/转义状态，只缓存“当前这一个”最外层对象的文本：每当它的右花括号到达就立即
+# json.loads 并产出，对象之外的代码块标记、方括号、逗号和尾部杂质一律忽略。
+# 单个对象解析失败只丢这一个，不影响前后的对象；内存占用与对象大小有关，与输出总长无关。
+
+
+class JsonObjectStream:
+    """把任意切分的文本片段喂进来，产出其中完整的最外层 JSON 对象。"""
+
+    def __init__(self) -> None:
+        self._buffer: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.objects = 0
+        self.errors = 0
+
+    def feed(self, text: str) -> list[dict]:
+        completed: list[dict] = []
+        buffer = self._buffer
+        start = 0 if self._depth else None
+        for i, ch in enumerate(text):
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    start = i
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    buffer.append(text[start : i + 1])
+                    obj = self._decode("".join(buffer))
+                    buffer.clear()
+                    start = None
+                    if obj is not None:
+                        completed.append(obj)
+        if self._depth and start is not None:
+            buffer.append(text[start:])
+        return completed
+
+    def _decode(self, raw: str) -> dict | None:
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError:
+            self.errors += 1
+            return None
+        if not isinstance(obj, dict):
+            self.errors += 1
+            return None
+        self.objects += 1
+        return obj
+
+    @property
+    def pending(self) -> bool:
+        """是否还有未闭合的对象（流在对象中途被截断时为 True）。"""
+        return self._depth > 0
+
+
+def iter_json_objects(chunks: Iterable[str]) -> Iterator[dict]:
+    """逐片消费文本，按到达顺序产出完整的 JSON 对象。"""
+    stream = JsonObjectStream()
+    for chunk in chunks:
+        if chunk:
+            yield from stream.feed(chunk)
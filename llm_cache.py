@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+# ==========================================
+# LLM 响应缓存：内存 LRU + SQLite 持久层（TTL）
+# ==========================================
+# 相同 (模型, messages, 采样参数, 作用域) 的请求直接复用上一次的回答。
+# 作用域由调用方给出，例如 Agent 传入食谱库内容摘要，食谱库一变旧条目自然失效。
+_TRUE_VALUES = {"1", "true", "TRUE", "yes", "YES"}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        *,
+        max_entries: int = 256,
+        ttl: float = 24 * 3600,
+        path: str | os.PathLike | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "stores": 0, "evictions": 0}
+        self._db: sqlite3.Connection | None = None
+        if path:
+            self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=5)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM llm_response_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict[str, Any]], *, scope: str = "", **params: Any) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params, "scope": scope},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] >= now:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_response_cache WHERE key = ? AND expires_at >= ?",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0], row[1])
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                    return row[0]
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._stats["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_response_cache")
+                self._db.commit()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "memory_entries": len(self._memory)}
+
+
+_cache_lock = threading.Lock()
+_cache: ResponseCache | None = None
+
+
+def is_cache_enabled() -> bool:
+    return os.getenv("SMARTDIET_LLM_CACHE") in _TRUE_VALUES
+
+
+def get_response_cache() -> ResponseCache | None:
+    """返回进程级共享的响应缓存；未设置 SMARTDIET_LLM_CACHE=1 时返回 None。
+
+    SMARTDIET_LLM_CACHE_PATH 指定持久层 SQLite 文件（默认项目根目录 llm_cache.sqlite3，设为空串则只用内存），
+    SMARTDIET_LLM_CACHE_TTL（秒）与 SMARTDIET_LLM_CACHE_MAX_ENTRIES 控制过期时间与内存条目上限。
+    """
+    global _cache
+    if not is_cache_enabled():
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                path = os.getenv("SMARTDIET_LLM_CACHE_PATH")
+                if path is None:
+                    path = str(Path(__file__).resolve().parent / "llm_cache.sqlite3")
+                _cache = ResponseCache(
+                    max_entries=int(_env_float("SMARTDIET_LLM_CACHE_MAX_ENTRIES", 256)),
+                    ttl=_env_float("SMARTDIET_LLM_CACHE_TTL", 24 * 3600),
+                    path=path or None,
+                )
+    return _cache
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+try:
+    import httpx
+except ImportError:  # openai>=3 底层换成了 httpx2，API 兼容
+    import httpx2 as httpx
+
+DEFAULT_BASE_URL = "https://api.deepseek.com"
+
+# ==========================================
+# 进程级共享的 OpenAI 兼容客户端（按 base_url + api_key 复用）
+# ==========================================
+# 每个 OpenAI(...) 都自带一个 httpx 连接池；每轮对话都新建客户端意味着每次都重新
+# TCP + TLS 握手。这里按 (base_url, api_key) 缓存客户端，连续的对话复用热连接。
+_clients_lock = threading.Lock()
+_clients: dict[tuple[str, str], OpenAI] = {}
+# AsyncOpenAI 底层的连接绑定在创建时所在的事件循环上，因此异步客户端按事件循环分别缓存
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[str, str], AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(_env_float("SMARTDIET_HTTP_MAX_CONNECTIONS", 20)),
+        max_keepalive_connections=int(_env_float("SMARTDIET_HTTP_MAX_KEEPALIVE", 10)),
+        keepalive_expiry=_env_float("SMARTDIET_HTTP_KEEPALIVE_EXPIRY", 60.0),
+    )
+
+
+def http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        _env_float("SMARTDIET_HTTP_TIMEOUT", 120.0),
+        connect=_env_float("SMARTDIET_HTTP_CONNECT_TIMEOUT", 10.0),
+    )
+
+
+def resolve_base_url() -> str:
+    return os.getenv("DEEPSEEK_BASE_URL") or DEFAULT_BASE_URL
+
+
+def resolve_model_name() -> str:
+    return os.getenv("DEEPSEEK_MODEL") or "deepseek-chat"
+
+
+def get_client(api_key: str, base_url: str | None = None) -> OpenAI:
+    """返回 (base_url, api_key) 对应的共享客户端，首次调用时才创建。"""
+    key = (base_url or resolve_base_url(), api_key)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            timeout = http_timeout()
+            client = OpenAI(
+                api_key=api_key,
+                base_url=key[0],
+                timeout=timeout,
+                http_client=openai.DefaultHttpxClient(limits=http_limits(), timeout=timeout),
+            )
+            _clients[key] = client
+        return client
+
+
+def get_async_client(api_key: str, base_url: str | None = None) -> AsyncOpenAI:
+    """get_client 的异步版本：返回当前事件循环内共享的 AsyncOpenAI 客户端。"""
+    loop = asyncio.get_running_loop()
+    key = (base_url or resolve_base_url(), api_key)
+    with _clients_lock:
+        loop_clients = _async_clients.setdefault(loop, {})
+        client = loop_clients.get(key)
+        if client is None:
+            timeout = http_timeout()
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=key[0],
+                timeout=timeout,
+                http_client=openai.DefaultAsyncHttpxClient(limits=http_limits(), timeout=timeout),
+            )
+            loop_clients[key] = client
+        return client
+
+
+def close_clients() -> None:
+    """关闭并清空所有共享客户端（测试或进程退出时使用）。"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_async_clients() -> None:
+    """关闭当前事件循环内的所有异步客户端。"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        clients = list(_async_clients.pop(loop, {}).values())
+    for client in clients:
+        await client.close()
+
+
+# ==========================================
+# 令牌桶限速（多线程共享）
+# ==========================================
+class TokenBucket:
+    """以 rate 个/秒匀速补充、最多攒 capacity 个令牌；acquire() 拿不到令牌时阻塞等待。"""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """取走 tokens 个令牌，返回为此等待的秒数。"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,103 @@
+"""
+只读 JSON API 的公共部分：统一的 JSON 响应、错误格式与查询参数解析。
+
+各 app 的 views.py 用 @api_view 包装视图函数：只接受 GET/HEAD，
+视图里抛出的 ApiError 转成 {"error": "..."} 与对应的状态码。
+"""
+from datetime import date
+from functools import wraps
+
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+
+class ApiError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def json_response(payload, *, status: int = 200) -> JsonResponse:
+    # 中文原样输出，体积比 \uXXXX 转义小一半以上
+    return JsonResponse(payload, status=status, safe=False, json_dumps_params={"ensure_ascii": False})
+
+
+def api_view(view):
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return json_response({"error": exc.message}, status=exc.status)
+
+    return wrapper
+
+
+# ==========================================
+# 查询参数解析：缺省返回 default，格式不对或越界抛 ApiError(400)
+# ==========================================
+def _raw(request, name: str) -> str | None:
+    value = request.GET.get(name)
+    return value.strip() if value is not None and value.strip() else None
+
+
+def _check_range(name: str, value, low, high):
+    if (low is not None and value < low) or (high is not None and value > high):
+        bounds = f"{'' if low is None else low} ~ {'' if high is None else high}"
+        raise ApiError(f"参数 {name} 超出范围（{bounds.strip()}）")
+    return value
+
+
+def query_int(request, name: str, default: int | None = None, *, low: int | None = None, high: int | None = None):
+    raw = _raw(request, name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ApiError(f"参数 {name} 应为整数") from None
+    return _check_range(name, value, low, high)
+
+
+def query_float(
+    request, name: str, default: float | None = None, *, low: float | None = None, high: float | None = None
+):
+    raw = _raw(request, name)
+    if raw is None:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ApiError(f"参数 {name} 应为数字") from None
+    if value != value or value in (float("inf"), float("-inf")):
+        raise ApiError(f"参数 {name} 应为有限的数字")
+    return _check_range(name, value, low, high)
+
+
+def query_date(request, name: str, default: date | None = None) -> date | None:
+    raw = _raw(request, name)
+    if raw is None:
+        return default
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        raise ApiError(f"参数 {name} 应为 YYYY-MM-DD 格式的日期") from None
+
+
+def query_list(request, name: str) -> list[str]:
+    """逗号分隔的列表参数（中英文逗号、顿号均可），也接受同名参数重复出现。"""
+    items: list[str] = []
+    for raw in request.GET.getlist(name):
+        for item in raw.replace("，", ",").replace("、", ",").split(","):
+            item = item.strip()
+            if item and item not in items:
+                items.append(item)
+    return items
+
+
+def require(value, name: str):
+    if value is None:
+        raise ApiError(f"缺少参数 {name}")
+    return value
@@ -0,0 +1,84 @@
+"""
+进程级的一次性数据库初始化：迁移建表 + 写入初始食谱。
+
+app.py、agent_core 导入时以及 `manage.py bootstrap_db` 都会调用
+ensure_database_ready()；同一进程内只真正执行一次，之后只是一次布尔判断，
+多个 Streamlit 会话（同进程内的多个线程）也不会同时对 db.sqlite3 跑 migrate。
+
+多个进程（Streamlit、API 服务、批量命令同时启动）之间再用一个文件锁串行化：
+锁文件放在系统临时目录，按主库名区分，后拿到锁的进程跑 migrate 时已无事可做，
+seed_recipes 也只在食谱表为空时写入。部署时也可以先单独执行 `manage.py bootstrap_db`。
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management import call_command
+
+_bootstrap_lock = threading.Lock()
+_completed_at: float | None = None
+
+
+def is_database_ready() -> bool:
+    return _completed_at is not None
+
+
+def _lock_path() -> str:
+    name = str(settings.DATABASES["default"].get("NAME", ""))
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"smartdiet-bootstrap-{digest}.lock")
+
+
+@contextmanager
+def _interprocess_lock(path: str):
+    """阻塞地独占 path 上的文件锁；进程退出时操作系统会自动释放。"""
+    with open(path, "a+b") as handle:
+        if os.name == "nt":
+            import msvcrt
+
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK 只重试约 10 秒，迁移更久时继续等
+                    continue
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def ensure_database_ready(*, seed: bool = True, verbosity: int = 0) -> bool:
+    """执行迁移与初始食谱写入；本进程已完成过则直接返回 False。"""
+    global _completed_at
+    if _completed_at is not None:
+        return False
+
+    with _bootstrap_lock:
+        if _completed_at is not None:
+            return False
+
+        with _interprocess_lock(_lock_path()):
+            call_command("migrate", interactive=False, run_syncdb=True, verbosity=verbosity)
+            if seed:
+                from recipes.seed import seed_recipes
+
+                seed_recipes()
+
+        _completed_at = time.time()
+        return True
@@ -0,0 +1,58 @@
+"""
+主从路由：食谱类模型的读分到只读副本（agent_core 检索与膳食规划的大头），其余读与所有写走主库。
+
+以下情况读也回到主库，保证“写完马上读得到”：
+- 当前线程在主库的 atomic() 块里（事务里的读必须和写在同一个连接上）；
+- 处在 use_primary() 上下文里（例如 ingest_recipes 在事务外按批提交时统计新增条数）。
+副本之间随机挑选；没有配置副本时这个路由什么也不做。
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# 走副本读的模型（app_label.model_name）
+REPLICA_READ_MODELS = frozenset({"recipes.recipe", "recipes.ingredient", "recipes.recipeingredient"})
+
+_pinned = threading.local()
+
+
+@contextmanager
+def use_primary():
+    """上下文内本线程的读全部走主库，可以嵌套。"""
+    _pinned.depth = getattr(_pinned, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _pinned.depth -= 1
+
+
+def _replicas() -> list[str]:
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = _replicas()
+        if not replicas or model._meta.label_lower not in REPLICA_READ_MODELS:
+            return DEFAULT_DB_ALIAS
+        if getattr(_pinned, "depth", 0) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # 必须显式返回主库：从副本读出来的实例 save() 时，Django 默认会写回它来源的那个库
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 主库与副本是同一份数据，跨库的外键赋值（副本读出的 Recipe 挂到主库的 DietPlanItem）是允许的
+        cluster = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in cluster and obj2._state.db in cluster:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构随复制（或 sync_sqlite_replicas 整库复制）而来，不单独迁移
+        return db == DEFAULT_DB_ALIAS
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 
+from nutrition_project.database import database_settings, replica_aliases
+from nutrition_project.sqlite import sqlite_pragmas
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -76,12 +79,14 @@ WSGI_APPLICATION = 'nutrition_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# 主库与只读副本都由环境变量决定（SQLite 或 PostgreSQL），见 nutrition_project/database.py
+DATABASES = database_settings(BASE_DIR)
+DATABASE_REPLICAS = replica_aliases(DATABASES)
+DATABASE_ROUTERS = ['nutrition_project.routers.PrimaryReplicaRouter']
+
+# 每个新的 SQLite 连接建立时执行的 PRAGMA（WAL、synchronous、busy_timeout 等），见 nutrition_project/sqlite.py；
+# 用 SMARTDIET_SQLITE_PROFILE=rollback 可以切回 SQLite 默认的回滚日志模式
+SQLITE_PRAGMAS = sqlite_pragmas()
 
 
 # Password validation
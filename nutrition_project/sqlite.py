@@ -0,0 +1,68 @@
+"""
+SQLite 连接调优：每个新连接建立时（connection_created 信号）按配置档执行一组 PRAGMA。
+
+默认的 "wal" 档让 Streamlit 多个会话读食谱的同时 auto_populate_db.py 可以写入：
+WAL 模式下读者读的是快照，不会被写者挡住，写者也不必等读者释放共享锁，
+不再出现 "database is locked"。"rollback" 档是 SQLite 出厂的回滚日志模式，只留作对照。
+
+配置档由 settings.SQLITE_PRAGMAS 决定（来自 SMARTDIET_SQLITE_PROFILE 环境变量），
+busy_timeout / cache_size / mmap_size 还可以用 SMARTDIET_SQLITE_<NAME> 单独覆盖。
+"""
+import os
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+SQLITE_PROFILES = {
+    "wal": {
+        # journal_mode 写进数据库文件，对之后所有连接都生效；其余 PRAGMA 只作用于当前连接
+        "journal_mode": "WAL",
+        # WAL 下 NORMAL 只在检查点时 fsync：掉电可能丢最后几个事务，但不会损坏数据库
+        "synchronous": "NORMAL",
+        # 写锁被占用时最多等 5 秒，而不是立刻报 "database is locked"
+        "busy_timeout": 5000,
+        # 负数的单位是 KiB：每个连接约 32MB 页缓存
+        "cache_size": -32000,
+        # 用 256MB 内存映射读库文件，省掉读页时的一次拷贝
+        "mmap_size": 256 * 1024 * 1024,
+        # 排序、临时索引放内存
+        "temp_store": "MEMORY",
+    },
+    # 回滚日志模式：journal_mode 会持久化在文件里，切回来时要显式改回 DELETE
+    "rollback": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+    },
+}
+DEFAULT_PROFILE = "wal"
+_OVERRIDABLE = ("busy_timeout", "cache_size", "mmap_size")
+
+
+def sqlite_pragmas(profile: str | None = None) -> dict[str, str | int]:
+    """返回配置档对应的 PRAGMA（已合并环境变量覆盖项）。"""
+    name = profile or os.getenv("SMARTDIET_SQLITE_PROFILE") or DEFAULT_PROFILE
+    if name not in SQLITE_PROFILES:
+        raise ValueError(f"未知的 SQLite 配置档: {name}（可选 {', '.join(SQLITE_PROFILES)}）")
+    pragmas = dict(SQLITE_PROFILES[name])
+    for key in _OVERRIDABLE:
+        value = os.getenv(f"SMARTDIET_SQLITE_{key.upper()}")
+        if value:
+            pragmas[key] = int(value)
+    return pragmas
+
+
+def apply_pragmas(connection, pragmas: dict[str, str | int]) -> None:
+    with connection.cursor() as cursor:
+        for key, value in pragmas.items():
+            cursor.execute(f"PRAGMA {key} = {value}")
+
+
+@receiver(connection_created, dispatch_uid="nutrition_project.sqlite.configure")
+def configure_sqlite_connection(sender, connection, **kwargs) -> None:
+    if connection.vendor != "sqlite":
+        return
+    from django.conf import settings
+
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", None)
+    if pragmas:
+        apply_pragmas(connection, pragmas)
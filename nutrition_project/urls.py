@@ -15,8 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # 只读 JSON API：食谱检索、营养目标计算、饮食计划
+    path('api/', include('recipes.urls')),
+    path('api/', include('diet_planner.urls')),
 ]
@@ -2,14 +2,33 @@ from django.contrib import admin
 from django.db import models
 from django.forms import Textarea
 
-from .models import Recipe
+from .models import Ingredient, Recipe, RecipeIngredient
+
+
+class RecipeIngredientInline(admin.TabularInline):
+	# 结构化食材由 ingredients 文本解析生成，保存食谱时会重建，这里只读展示
+	model = RecipeIngredient
+	fields = ("position", "ingredient", "quantity", "unit", "note", "optional", "raw")
+	readonly_fields = fields
+	extra = 0
+	can_delete = False
+
+	def has_add_permission(self, request, obj=None):
+		return False
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
 	list_display = ("name", "calories", "protein", "carbs", "fats")
 	search_fields = ("name",)
+	inlines = (RecipeIngredientInline,)
 
 	formfield_overrides = {
 		models.TextField: {"widget": Textarea(attrs={"rows": 6, "cols": 100})},
 	}
+
+
+@admin.register(Ingredient)
+class IngredientAdmin(admin.ModelAdmin):
+	list_display = ("name",)
+	search_fields = ("name",)
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class RecipesConfig(AppConfig):
     name = 'recipes'
+
+    def ready(self):
+        # retrieval 会先导入 signals，保证版本号的信号接收器先于索引增量更新执行；
+        # search 注册 post_migrate 接收器，每次迁移后补齐 FTS5 表与触发器；
+        # ingredients 在食谱保存后同步结构化食材
+        from . import ingredients, retrieval, search, signals  # noqa: F401
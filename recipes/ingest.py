@@ -0,0 +1,90 @@
+import time
+from collections.abc import Iterable
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from nutrition_project.routers import use_primary
+
+from .ingredients import sync_recipe_ingredients
+from .models import Recipe
+from .signals import bump_recipe_version
+
+RECIPE_FIELDS = ("name", "calories", "protein", "carbs", "fats", "ingredients", "instructions")
+DEFAULT_BATCH_SIZE = 500
+
+
+@dataclass
+class IngestResult:
+	created: int = 0
+	skipped: int = 0
+	elapsed: float = 0.0
+
+	@property
+	def rows_per_second(self) -> float:
+		total = self.created + self.skipped
+		return total / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def ingest_recipes(
+	records: Iterable[dict],
+	*,
+	batch_size: int = DEFAULT_BATCH_SIZE,
+	commit_every_batch: bool = False,
+) -> IngestResult:
+	"""批量写入食谱：已有名称只读一次进集合，内存去重后按批 bulk_create，全程一个事务。
+
+	records 中每项是已清洗过的字段字典（见 RECIPE_FIELDS），可以是生成器，边产出边入库。
+	records 来自耗时很长的生成过程时传 commit_every_batch=True：每批单独提交，
+	既不会长时间占着 SQLite 的写锁，中途失败时已提交的批次也会保留。
+	"""
+	result = IngestResult()
+	started = time.perf_counter()
+	batch: list[Recipe] = []
+	attempted = 0
+
+	# 去重用的已有名称、前后行数都必须读主库：配置了只读副本时，副本可能还没复制到刚写入的批次
+	with use_primary(), (nullcontext() if commit_every_batch else transaction.atomic()):
+		before = Recipe.objects.count()
+		seen = set(Recipe.objects.values_list("name", flat=True))
+
+		def flush() -> None:
+			# name 上有唯一约束；ignore_conflicts 兜底并发写入者抢先插入的同名食谱
+			with transaction.atomic() if commit_every_batch else nullcontext():
+				Recipe.objects.bulk_create(batch, batch_size=batch_size, ignore_conflicts=True)
+				# bulk_create 不触发 post_save，结构化食材在这里按批同步（ignore_conflicts 拿不到主键，按名称回查）
+				names = [recipe.name for recipe in batch]
+				sync_recipe_ingredients(Recipe.objects.filter(name__in=names).only("id", "ingredients"))
+			batch.clear()
+
+		try:
+			for data in records:
+				name = str(data.get("name") or "").strip()
+				if not name or name in seen:
+					result.skipped += 1
+					continue
+				seen.add(name)
+				attempted += 1
+				batch.append(Recipe(**{field: data[field] for field in RECIPE_FIELDS if field != "name"}, name=name))
+				if len(batch) >= batch_size:
+					flush()
+		except BaseException:
+			# 逐批提交时，上游（如流式生成）中途失败也要把已收到的食谱落库
+			if commit_every_batch and attempted:
+				if batch:
+					flush()
+				bump_recipe_version()
+			raise
+		if batch:
+			flush()
+
+		# ignore_conflicts 拿不到逐行结果，用前后行数差得到真实新增数
+		result.created = Recipe.objects.count() - before
+		result.skipped += attempted - result.created
+
+	if result.created:
+		# bulk_create 不触发 post_save，手动通知检索索引与响应缓存失效
+		bump_recipe_version()
+	result.elapsed = time.perf_counter() - started
+	return result
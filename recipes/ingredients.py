@@ -0,0 +1,238 @@
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Ingredient, Recipe, RecipeIngredient
+from .signals import invalidate_recipe_table_state
+
+# ==========================================
+# 食材清单解析：“鸡胸肉 200g、藜麦(熟) 180g、牛奶/无糖豆奶 200ml、黑胡椒/盐 适量”
+# ==========================================
+# 覆盖 seed.py、auto_populate_db._offline_recipes 与 LLM 提示词约定的写法：逗号/顿号/分号分隔，
+# 括号里是备注（熟、干重、可选），斜杠/“或”分隔多种食材（数字之间的斜杠是分数），
+# 用量一般在名称之后（可有空格），也接受“半个洋葱”“1/2 个牛油果”这种写在前面的用量。
+# 斜杠本身不说明关系（“生菜/黄瓜/小番茄”是一起用的），只有写明“或/或者/任选”才标注可互换；
+# 不可互换的几种食材共用一个数值用量时，用量只记在第一种上，避免按条目汇总时重复计算。
+_SEPARATORS = set(",，、;；\n")
+_OPEN_PARENS = "(（"
+_CLOSE_PARENS = ")）"
+_NOTE_RE = re.compile(r"[（(]([^）)]*)[）)]")
+_OPTIONAL_NOTES = {"可选", "选用", "可不加", "可省略"}
+_VAGUE_UNITS = ("适量", "少许", "少量")
+_COUNT_UNITS = (
+	"个", "根", "片", "瓣", "大勺", "小勺", "勺", "汤匙", "茶匙", "杯", "碗", "罐", "小把", "把",
+	"块", "颗", "只", "条", "袋", "盒", "枚", "粒", "张", "撮",
+)
+# 换算到基准单位（g / ml）的系数
+_UNIT_FACTORS = {
+	"g": ("g", 1.0), "克": ("g", 1.0), "mg": ("g", 0.001), "kg": ("g", 1000.0), "千克": ("g", 1000.0),
+	"公斤": ("g", 1000.0), "斤": ("g", 500.0), "两": ("g", 50.0),
+	"ml": ("ml", 1.0), "毫升": ("ml", 1.0), "l": ("ml", 1000.0), "升": ("ml", 1000.0),
+}
+_CN_DIGITS = {"半": 0.5, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+_UNIT_PATTERN = "|".join(
+	sorted({*_UNIT_FACTORS, *_COUNT_UNITS, *_VAGUE_UNITS}, key=len, reverse=True)
+)
+_QUANTITY_RE = re.compile(
+	rf"^(?P<name>.*?)\s*(?:(?P<num>\d+(?:\.\d+)?(?:\s*/\s*\d+)?)\s*(?P<unit>{_UNIT_PATTERN})?"
+	rf"|(?P<cn>[半一二两三四五六七八九十]{{1,2}})\s*(?P<cn_unit>{_UNIT_PATTERN})"
+	rf"|(?P<vague>{'|'.join(_VAGUE_UNITS)}))\s*$",
+	re.IGNORECASE,
+)
+# 写在名称前面的用量：中文数字后必须跟单位，否则“三文鱼”“五花肉”会被拆开
+_MEASURE_PATTERN = "|".join(sorted({*_UNIT_FACTORS, *_COUNT_UNITS}, key=len, reverse=True))
+_LEADING_QUANTITY_RE = re.compile(
+	rf"^(?:(?P<num>\d+(?:\.\d+)?(?:\s*/\s*\d+)?)\s*(?:(?P<unit>{_MEASURE_PATTERN})(?![a-z]))?"
+	rf"|(?P<cn>[半一二两三四五六七八九十]{{1,2}})\s*(?P<cn_unit>{_MEASURE_PATTERN}))\s*(?P<name>[^\d\s].*)$",
+	re.IGNORECASE,
+)
+_FRACTION_SLASH_RE = re.compile(r"(?<=\d)\s*/\s*(?=\d)")
+_NAME_SLASH_RE = re.compile(r"(?<!\d)/|/(?!\d)")
+_ALTERNATIVE_RE = re.compile(r"\s*(?:或者|或)\s*")
+_CHOICE_WORD = "任选"
+_LEADING_VAGUE_RE = re.compile(rf"^(?P<vague>{'|'.join(_VAGUE_UNITS)})\s*(?P<name>.+)$")
+
+
+@dataclass(frozen=True)
+class ParsedIngredient:
+	name: str
+	quantity: float | None
+	unit: str
+	note: str = ""
+	optional: bool = False
+	raw: str = ""
+
+
+def _split_fragments(text: str) -> list[str]:
+	"""按分隔符切分，括号内的分隔符不算（“时蔬（西兰花、胡萝卜）”是一项）。"""
+	fragments: list[str] = []
+	depth = 0
+	current: list[str] = []
+	for ch in text or "":
+		if ch in _OPEN_PARENS:
+			depth += 1
+		elif ch in _CLOSE_PARENS:
+			depth = max(0, depth - 1)
+		elif ch in _SEPARATORS and depth == 0:
+			fragments.append("".join(current))
+			current = []
+			continue
+		current.append(ch)
+	fragments.append("".join(current))
+	return [f.strip() for f in fragments if f.strip()]
+
+
+def _parse_number(text: str) -> float | None:
+	text = text.replace(" ", "")
+	try:
+		if "/" in text:
+			numerator, denominator = text.split("/", 1)
+			return float(numerator) / float(denominator)
+		return float(text)
+	except (ValueError, ZeroDivisionError):
+		return None
+
+
+def _parse_cn_number(text: str) -> float:
+	"""半/一…九/十/十二/二十 这类常见写法。"""
+	if text in _CN_DIGITS:
+		return float(_CN_DIGITS[text])
+	if "十" in text:
+		tens, _, ones = text.partition("十")
+		return float(_CN_DIGITS.get(tens, 1) * 10 + _CN_DIGITS.get(ones, 0))
+	return float(sum(_CN_DIGITS.get(ch, 0) for ch in text))
+
+
+def _normalize_unit(quantity: float | None, unit: str) -> tuple[float | None, str]:
+	factor = _UNIT_FACTORS.get(unit.lower())
+	if factor is None:
+		return quantity, unit
+	base, scale = factor
+	return (round(quantity * scale, 3) if quantity is not None else None), base
+
+
+def parse_ingredient(fragment: str) -> list[ParsedIngredient]:
+	"""解析单项食材；“生菜/黄瓜”“牛奶或无糖豆奶 200ml”这类多种食材的写法拆成多条。
+
+	只有原文写明“或/或者/任选”时才标注“可互换”，各条都带上用量；单纯的斜杠不算，
+	共用的数值用量只记在第一条上。
+	"""
+	raw = fragment.strip()
+	interchangeable = _CHOICE_WORD in raw or _ALTERNATIVE_RE.search(_NOTE_RE.sub(" ", raw)) is not None
+	notes = [n.strip() for n in _NOTE_RE.findall(raw) if n.strip() and n.strip() != _CHOICE_WORD]
+	optional = any(n in _OPTIONAL_NOTES for n in notes)
+	notes = [n for n in notes if n not in _OPTIONAL_NOTES]
+	body = _NOTE_RE.sub(" ", raw).replace(_CHOICE_WORD, " ").strip(" ：:")
+
+	quantity: float | None = None
+	unit = ""
+	leading = _LEADING_VAGUE_RE.match(body)
+	if leading:
+		unit, body = leading.group("vague"), leading.group("name").strip()
+	match = _QUANTITY_RE.match(body)
+	if not (match and match.group("name").strip()):
+		match = _LEADING_QUANTITY_RE.match(body)
+	if match and match.group("name").strip():
+		if match.group("num"):
+			quantity = _parse_number(match.group("num"))
+			unit = match.group("unit") or ""
+		elif match.group("cn"):
+			quantity = _parse_cn_number(match.group("cn"))
+			unit = match.group("cn_unit")
+		else:
+			unit = match.group("vague")
+		body = match.group("name").strip()
+	quantity, unit = _normalize_unit(quantity, unit)
+
+	body = _FRACTION_SLASH_RE.sub("/", body)
+	names = [n.strip() for part in _NAME_SLASH_RE.split(body) for n in _ALTERNATIVE_RE.split(part) if n.strip()]
+	if len(names) > 1 and interchangeable:
+		notes.append("可互换")
+	note = "，".join(notes)[:64]
+	if len(names) < 2 or interchangeable or quantity is None:
+		return [ParsedIngredient(name[:64], quantity, unit, note, optional, raw[:128]) for name in names]
+	# 一起用的几种食材共用一个用量：只记在第一种上，其余注明用量已计入
+	first = names[0][:64]
+	shared = "，".join([*notes, f"用量计入{first}"])[:64]
+	return [ParsedIngredient(first, quantity, unit, note, optional, raw[:128])] + [
+		ParsedIngredient(name[:64], None, "", shared, optional, raw[:128]) for name in names[1:]
+	]
+
+
+def parse_ingredients(text: str) -> list[ParsedIngredient]:
+	"""把整段食材清单解析成结构化列表（同名食材只保留第一次出现）。"""
+	parsed: list[ParsedIngredient] = []
+	seen: set[str] = set()
+	for fragment in _split_fragments(text):
+		for item in parse_ingredient(fragment):
+			if item.name not in seen:
+				seen.add(item.name)
+				parsed.append(item)
+	return parsed
+
+
+# ==========================================
+# 同步 RecipeIngredient
+# ==========================================
+def _ingredient_ids(names: set[str], chunk: int = 500) -> dict[str, int]:
+	"""返回名称 -> Ingredient.id，缺的先批量建出来（ignore_conflicts 兜底并发写入）。"""
+	ordered = sorted(names)
+	ids: dict[str, int] = {}
+	for i in range(0, len(ordered), chunk):
+		part = ordered[i : i + chunk]
+		ids.update(Ingredient.objects.filter(name__in=part).values_list("name", "id"))
+		missing = [name for name in part if name not in ids]
+		if missing:
+			Ingredient.objects.bulk_create([Ingredient(name=name) for name in missing], ignore_conflicts=True)
+			ids.update(Ingredient.objects.filter(name__in=missing).values_list("name", "id"))
+	return ids
+
+
+_LINK_COLUMNS = ("recipe_id", "ingredient_id", "quantity", "unit", "note", "optional", "position", "raw")
+
+
+def sync_recipe_ingredients(recipes: Iterable[Recipe]) -> int:
+	"""按 recipes 当前的 ingredients 文本重建它们的 RecipeIngredient 行，返回写入的行数。
+
+	只需要 recipe 的 id 与 ingredients 两列，调用方可以传 .only("id", "ingredients") 的查询集。
+	关联行直接 executemany 插入：入库每批几百条食谱、每条五六项食材，逐个建模型对象的开销比插入本身还大。
+	原本已有关联行的食谱会顺带推进 updated_at，API 的 Last-Modified/ETag 随之变化
+	（新入库的食谱刚写过 updated_at，不再重复更新）。
+	"""
+	parsed = {recipe.pk: parse_ingredients(recipe.ingredients) for recipe in recipes}
+	if not parsed:
+		return 0
+	with transaction.atomic():
+		ids = _ingredient_ids({item.name for items in parsed.values() for item in items})
+		replaced = list(
+			RecipeIngredient.objects.filter(recipe_id__in=list(parsed)).values_list("recipe_id", flat=True).distinct()
+		)
+		RecipeIngredient.objects.filter(recipe_id__in=list(parsed)).delete()
+		if replaced:
+			Recipe.objects.filter(pk__in=replaced).update(updated_at=timezone.now())
+		rows = [
+			(recipe_id, ids[item.name], item.quantity, item.unit, item.note, item.optional, position, item.raw)
+			for recipe_id, items in parsed.items()
+			for position, item in enumerate(items)
+		]
+		if rows:
+			table = connection.ops.quote_name(RecipeIngredient._meta.db_table)
+			columns = ", ".join(connection.ops.quote_name(c) for c in _LINK_COLUMNS)
+			placeholders = ", ".join(["%s"] * len(_LINK_COLUMNS))
+			with connection.cursor() as cursor:
+				cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+		transaction.on_commit(invalidate_recipe_table_state)
+	return len(rows)
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.ingredients.sync_on_save")
+def _on_recipe_saved(sender, instance: Recipe, raw: bool = False, update_fields=None, **kwargs) -> None:
+	# loaddata（raw=True）与未改动 ingredients 的部分保存不需要重新解析
+	if raw or (update_fields is not None and "ingredients" not in update_fields):
+		return
+	sync_recipe_ingredients([instance])
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from recipes.ingredients import sync_recipe_ingredients
+from recipes.models import Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+	help = "按 id 分块解析已有食谱的食材清单文本，回填 Ingredient / RecipeIngredient"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--chunk-size", type=int, default=1000, help="每块解析并写入的食谱数")
+		parser.add_argument("--force", action="store_true", help="已有结构化食材的食谱也重新解析")
+
+	def handle(self, *args, **options):
+		chunk_size = options["chunk_size"]
+		recipes = Recipe.objects.all()
+		if not options["force"]:
+			# 默认只补还没有结构化食材的食谱，中断后重跑会从剩下的继续
+			recipes = recipes.filter(~Exists(RecipeIngredient.objects.filter(recipe_id=OuterRef("pk"))))
+		started = time.perf_counter()
+		processed = 0
+		links = 0
+		last_id = 0
+
+		while True:
+			# 按主键做 keyset 分页，只取解析需要的两列；每块在 sync_recipe_ingredients 里单独提交
+			chunk = list(recipes.filter(id__gt=last_id).order_by("id").only("id", "ingredients")[:chunk_size])
+			if not chunk:
+				break
+			last_id = chunk[-1].id
+			links += sync_recipe_ingredients(chunk)
+			processed += len(chunk)
+			if options["verbosity"] > 1:
+				self.stdout.write(f"已处理 {processed} 条食谱（最后 id={last_id}）")
+
+		elapsed = time.perf_counter() - started
+		rate = processed / elapsed if elapsed > 0 else 0.0
+		self.stdout.write(
+			self.style.SUCCESS(
+				f"完成：解析 {processed} 条食谱，写入 {links} 条食材关联，"
+				f"耗时 {elapsed:.2f}s（{rate:.0f} 食谱/秒）"
+			)
+		)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from nutrition_project.bootstrap import ensure_database_ready
+
+
+class Command(BaseCommand):
+	help = "迁移建表并在食谱表为空时写入初始食谱（与 app.py / agent_core 启动时的初始化一致）"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--no-seed", action="store_true", help="只迁移，不写入初始食谱")
+
+	def handle(self, *args, **options):
+		ensure_database_ready(seed=not options["no_seed"], verbosity=options["verbosity"])
+		self.stdout.write(self.style.SUCCESS("数据库已就绪"))
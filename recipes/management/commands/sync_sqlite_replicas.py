@@ -0,0 +1,38 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+	help = "把 SQLite 主库整库复制到充当只读副本的 SQLite 文件（本地验证主从路由用，PostgreSQL 副本走流复制）"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--pages", type=int, default=1024, help="在线备份每一步复制的页数，其间主库照常可写")
+
+	def handle(self, *args, **options):
+		primary = connections[DEFAULT_DB_ALIAS]
+		if primary.vendor != "sqlite":
+			raise CommandError("主库不是 SQLite，副本应由数据库自身的复制机制维护")
+		replicas = [alias for alias in settings.DATABASE_REPLICAS if connections[alias].vendor == "sqlite"]
+		if not replicas:
+			self.stdout.write("没有配置 SQLite 副本（SMARTDIET_DB_REPLICA_URLS），无需同步")
+			return
+
+		primary.ensure_connection()
+		for alias in replicas:
+			replica = connections[alias]
+			# 先断开本进程里副本的连接，备份会整体替换目标库的页
+			replica.close()
+			started = time.perf_counter()
+			target = sqlite3.connect(replica.settings_dict["NAME"])
+			try:
+				primary.connection.backup(target, pages=options["pages"])
+			finally:
+				target.close()
+			elapsed = time.perf_counter() - started
+			self.stdout.write(
+				self.style.SUCCESS(f"{alias}：已同步到 {replica.settings_dict['NAME']}，耗时 {elapsed:.2f}s")
+			)
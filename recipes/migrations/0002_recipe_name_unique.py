@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-17 00:45
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_recipe_names(apps, schema_editor):
+    # 加唯一约束前先清掉历史上 get_or_create 竞争留下的重名食谱，每个名称保留 id 最小的一条
+    Recipe = apps.get_model('recipes', 'Recipe')
+    # 指向食谱的外键（如饮食计划条目）是 CASCADE，删除前先改指到保留的那条，否则会连带删掉用户的计划
+    foreign_keys = [
+        (relation.related_model, relation.field.attname)
+        for relation in Recipe._meta.related_objects
+        if relation.one_to_many or relation.one_to_one
+    ]
+    duplicates = (
+        Recipe.objects.values('name')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for row in duplicates:
+        stale_ids = list(Recipe.objects.filter(name=row['name']).exclude(id=row['keep_id']).values_list('id', flat=True))
+        for model, attname in foreign_keys:
+            model._base_manager.filter(**{f'{attname}__in': stale_ids}).update(**{attname: row['keep_id']})
+        Recipe.objects.filter(id__in=stale_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+        # 需要饮食计划条目表的历史模型，去重时把条目改指到保留的食谱
+        ('diet_planner', '0002_dietplanitem_alter_dietplan_recipes'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_recipe_names, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='name',
+            field=models.CharField(max_length=255, unique=True, verbose_name='食谱名称'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-17 00:46
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_name_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='protein_ratio',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('protein'), '*', models.Value(4.0)), '/', django.db.models.functions.comparison.NullIf(models.F('calories'), 0)), output_field=models.FloatField(), verbose_name='蛋白质供能比'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['calories', 'protein', 'protein_ratio', 'carbs', 'fats'], name='recipe_kcal_macros_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['protein', 'calories'], name='recipe_protein_kcal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['protein_ratio', 'calories'], name='recipe_protein_ratio_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-17 01:10
+
+from django.db import migrations
+
+
+def create_fts(apps, schema_editor):
+    # 只在 SQLite 上建 FTS5 表与同步触发器；其他数据库由 recipes.search 自动退回 LIKE 检索
+    from recipes.search import ensure_fts_schema
+
+    ensure_fts_schema(schema_editor.connection)
+
+
+def drop_fts(apps, schema_editor):
+    from recipes.search import drop_fts_schema
+
+    drop_fts_schema(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_nutrition_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
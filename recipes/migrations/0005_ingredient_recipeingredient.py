@@ -0,0 +1,51 @@
+# Generated by Django 6.0.2 on 2026-10-17 00:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='食材名称')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.FloatField(blank=True, null=True, verbose_name='用量')),
+                ('unit', models.CharField(blank=True, max_length=16, verbose_name='单位')),
+                ('note', models.CharField(blank=True, max_length=64, verbose_name='备注')),
+                ('optional', models.BooleanField(default=False, verbose_name='可选')),
+                ('position', models.PositiveSmallIntegerField(default=0, verbose_name='顺序')),
+                ('raw', models.CharField(blank=True, max_length=128, verbose_name='原文')),
+                ('ingredient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='recipe_links', to='recipes.ingredient', verbose_name='食材')),
+                ('recipe', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipes.recipe', verbose_name='食谱')),
+            ],
+            options={
+                'ordering': ['recipe_id', 'position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_set',
+            field=models.ManyToManyField(blank=True, related_name='recipes', through='recipes.RecipeIngredient', to='recipes.ingredient', verbose_name='结构化食材'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeingredient',
+            index=models.Index(fields=['ingredient', 'recipe'], name='ingredient_recipe_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='recipe_ingredient_unique'),
+        ),
+    ]
@@ -1,13 +1,164 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import NullIf
+
+# 每克宏量营养素提供的热量（kcal），用于把克数换算成供能比
+KCAL_PER_GRAM = {"protein": 4.0, "carbs": 4.0, "fats": 9.0}
+MACRO_FIELDS = tuple(KCAL_PER_GRAM)
+
+
+def macro_energy_ratio(macro: str):
+	"""某项宏量营养素的供能比表达式：克数 × 每克热量 / 总热量（热量为 0 时为 NULL）。"""
+	if macro not in KCAL_PER_GRAM:
+		raise ValueError(f"未知的宏量营养素: {macro}")
+	return F(macro) * KCAL_PER_GRAM[macro] / NullIf(F("calories"), 0)
+
+
+class RecipeQuerySet(models.QuerySet):
+	"""可链式组合的营养筛选，所有条件都落到 SQL 里，由 Meta.indexes 中的索引承接。"""
+
+	def _range(self, field: str, low: float | None, high: float | None) -> "RecipeQuerySet":
+		lookups = {}
+		if low is not None:
+			lookups[f"{field}__gte"] = low
+		if high is not None:
+			lookups[f"{field}__lte"] = high
+		return self.filter(**lookups) if lookups else self
+
+	def calories_between(self, low: float | None = None, high: float | None = None) -> "RecipeQuerySet":
+		return self._range("calories", low, high)
+
+	def macro_between(self, macro: str, low: float | None = None, high: float | None = None) -> "RecipeQuerySet":
+		"""按克数筛选 protein/carbs/fats，例如 macro_between("protein", low=30)。"""
+		if macro not in KCAL_PER_GRAM:
+			raise ValueError(f"未知的宏量营养素: {macro}")
+		return self._range(macro, low, high)
+
+	def protein_between(self, low: float | None = None, high: float | None = None) -> "RecipeQuerySet":
+		return self.macro_between("protein", low, high)
+
+	def carbs_between(self, low: float | None = None, high: float | None = None) -> "RecipeQuerySet":
+		return self.macro_between("carbs", low, high)
+
+	def fats_between(self, low: float | None = None, high: float | None = None) -> "RecipeQuerySet":
+		return self.macro_between("fats", low, high)
+
+	def with_energy_ratios(self) -> "RecipeQuerySet":
+		"""附加 carbs_ratio / fats_ratio 供能比字段（0~1），与已存储的 protein_ratio 配套使用。"""
+		return self.annotate(
+			**{f"{macro}_ratio": macro_energy_ratio(macro) for macro in MACRO_FIELDS if macro != "protein"}
+		)
+
+	def macro_ratio_between(self, macro: str, low: float | None = None, high: float | None = None) -> "RecipeQuerySet":
+		"""按供能比筛选，例如 macro_ratio_between("protein", low=0.3) 即蛋白质供能 ≥30%。
+
+		蛋白质直接用已存储并建了索引的 protein_ratio 列，碳水/脂肪按表达式现算。
+		"""
+		if macro == "protein":
+			return self._range("protein_ratio", low, high)
+		alias = f"_{macro}_energy_ratio"
+		return self.alias(**{alias: macro_energy_ratio(macro)})._range(alias, low, high)
+
+	def protein_ratio_between(self, low: float | None = None, high: float | None = None) -> "RecipeQuerySet":
+		return self.macro_ratio_between("protein", low, high)
+
+	def containing_ingredients(self, *names: str) -> "RecipeQuerySet":
+		"""同时含有 names 中全部食材的食谱（按 Ingredient.name 精确匹配，单条 SQL）。"""
+		names = tuple(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+		if not names:
+			return self
+		links = RecipeIngredient.objects.filter(ingredient__name__in=names).values("recipe_id")
+		if len(names) > 1:
+			links = links.annotate(matched=models.Count("ingredient_id", distinct=True)).filter(matched=len(names))
+		return self.filter(id__in=links.values("recipe_id"))
+
+	def excluding_ingredients(self, *names: str) -> "RecipeQuerySet":
+		"""不含 names 中任何一种食材的食谱（单条 SQL，NOT IN 子查询走 (ingredient, recipe) 索引）。"""
+		names = tuple(n.strip() for n in names if n and n.strip())
+		if not names:
+			return self
+		return self.exclude(id__in=RecipeIngredient.objects.filter(ingredient__name__in=names).values("recipe_id"))
+
+	def protein_per_kcal_at_least(self, grams_per_100kcal: float) -> "RecipeQuerySet":
+		"""每 100 kcal 至少含多少克蛋白质（换算成蛋白质供能比后筛选）。"""
+		return self.protein_ratio_between(low=grams_per_100kcal * KCAL_PER_GRAM["protein"] / 100)
+
 
 class Recipe(models.Model):
-	name = models.CharField("食谱名称", max_length=255)
+	name = models.CharField("食谱名称", max_length=255, unique=True)
 	calories = models.PositiveIntegerField("卡路里")
 	protein = models.FloatField("蛋白质")
 	carbs = models.FloatField("碳水")
 	fats = models.FloatField("脂肪")
 	ingredients = models.TextField("食材清单")
 	instructions = models.TextField("制作步骤")
+	# 蛋白质供能比由数据库按 protein/calories 自动计算并存储，可以直接建索引做区间查询
+	protein_ratio = models.GeneratedField(
+		expression=macro_energy_ratio("protein"),
+		output_field=models.FloatField(),
+		db_persist=True,
+		verbose_name="蛋白质供能比",
+	)
+	# 最后写入时间（bulk_create 同样会填），与行数、最大 id 一起构成 JSON API 的 ETag / Last-Modified
+	updated_at = models.DateTimeField("更新时间", auto_now=True, db_index=True)
+	# 由 ingredients 文本解析出的结构化食材（recipes.ingredients 负责解析与同步）
+	ingredient_set = models.ManyToManyField(
+		"Ingredient",
+		through="RecipeIngredient",
+		related_name="recipes",
+		blank=True,
+		verbose_name="结构化食材",
+	)
+
+	objects = RecipeQuerySet.as_manager()
+
+	class Meta:
+		indexes = [
+			# 以热量区间为主的查询（最常见）：范围扫描 calories，宏量条件在索引内先过滤，只有命中的行才回表
+			models.Index(fields=["calories", "protein", "protein_ratio", "carbs", "fats"], name="recipe_kcal_macros_idx"),
+			# 以蛋白质下限为主的查询（增肌场景）
+			models.Index(fields=["protein", "calories"], name="recipe_protein_kcal_idx"),
+			# 蛋白质供能比，对应 RecipeQuerySet.protein_ratio_between / protein_per_kcal_at_least
+			models.Index(fields=["protein_ratio", "calories"], name="recipe_protein_ratio_idx"),
+		]
 
 	def __str__(self) -> str:
 		return self.name
+
+
+class Ingredient(models.Model):
+	name = models.CharField("食材名称", max_length=64, unique=True)
+
+	def __str__(self) -> str:
+		return self.name
+
+
+class RecipeIngredient(models.Model):
+	# 两个外键的单列索引都被下面的组合索引/唯一约束覆盖，不再单独建
+	recipe = models.ForeignKey(
+		Recipe, on_delete=models.CASCADE, related_name="recipe_ingredients", db_index=False, verbose_name="食谱"
+	)
+	ingredient = models.ForeignKey(
+		Ingredient, on_delete=models.PROTECT, related_name="recipe_links", db_index=False, verbose_name="食材"
+	)
+	# 统一换算后的用量：重量一律为 g，体积一律为 ml；“适量/少许”等没有数值时 quantity 为空
+	quantity = models.FloatField("用量", null=True, blank=True)
+	unit = models.CharField("单位", max_length=16, blank=True)
+	note = models.CharField("备注", max_length=64, blank=True)
+	optional = models.BooleanField("可选", default=False)
+	position = models.PositiveSmallIntegerField("顺序", default=0)
+	raw = models.CharField("原文", max_length=128, blank=True)
+
+	class Meta:
+		constraints = [
+			# 同时承担“按食谱取食材”的索引
+			models.UniqueConstraint(fields=["recipe", "ingredient"], name="recipe_ingredient_unique"),
+		]
+		indexes = [
+			# “含 X 的食谱 / 不含 {X, Y} 的食谱”：按食材定位后直接在索引里拿到 recipe_id
+			models.Index(fields=["ingredient", "recipe"], name="ingredient_recipe_idx"),
+		]
+		ordering = ["recipe_id", "position"]
+
+	def __str__(self) -> str:
+		return self.raw or f"{self.ingredient} {self.quantity or ''}{self.unit}"
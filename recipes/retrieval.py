@@ -0,0 +1,278 @@
+import bisect
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Collection
+from dataclasses import dataclass
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Recipe
+from .signals import bump_recipe_version, get_recipe_version
+
+# 只取汉字串与英文单词；数字与单位（200g、1个）对相关性没有帮助
+_TERM_RE = re.compile(r"[一-鿿]+|[a-z]+")
+_STOP_WORDS = {"g", "kg", "ml", "l"}
+# 食谱名称里的 n-gram 权重高于食材清单
+_NAME_WEIGHT = 2.0
+
+
+@dataclass(frozen=True)
+class RecipeDoc:
+	id: int
+	name: str
+	calories: int
+	protein: float
+	carbs: float
+	fats: float
+	ingredients: str
+
+
+def _char_ngrams(text: str, sizes: tuple[int, ...] = (1, 2)) -> Counter:
+	grams: Counter = Counter()
+	for term in _TERM_RE.findall((text or "").lower()):
+		if term.isascii():
+			if term not in _STOP_WORDS:
+				grams[term] += 1
+			continue
+		for n in sizes:
+			for i in range(len(term) - n + 1):
+				grams[term[i : i + n]] += 1
+	return grams
+
+
+def _doc_weights(doc: RecipeDoc) -> dict[str, float]:
+	counts: Counter = Counter()
+	for gram, c in _char_ngrams(doc.name).items():
+		counts[gram] += c * _NAME_WEIGHT
+	counts.update(_char_ngrams(doc.ingredients))
+	return {gram: 1.0 + math.log(c) for gram, c in counts.items()}
+
+
+class RecipeIndex:
+	"""name + ingredients 的字符 n-gram TF-IDF 倒排索引（纯 Python，离线可用，支持增量更新）。
+
+	文档侧只存对数词频并按其范数归一化，IDF 在查询时按当前文档频次计算，
+	因此单条食谱的增删不需要重算其他文档。
+	"""
+
+	def __init__(self) -> None:
+		self._lock = threading.RLock()
+		self._docs: dict[int, RecipeDoc] = {}
+		self._weights: dict[int, dict[str, float]] = {}
+		self._norms: dict[int, float] = {}
+		self._postings: dict[str, dict[int, float]] = defaultdict(dict)
+		# (calories, id) 有序列表，用于热量窗口过滤
+		self._by_calories: list[tuple[int, int]] = []
+		self._fingerprint: str | None = None
+		self.version: int | None = None
+		self.built_at = 0.0
+
+	def __len__(self) -> int:
+		return len(self._docs)
+
+	def fingerprint(self) -> str:
+		"""索引内容摘要：内容相同则跨进程得到相同值，可作为持久缓存的命名空间。"""
+		with self._lock:
+			if self._fingerprint is None:
+				digest = hashlib.sha1()
+				for doc_id in sorted(self._docs):
+					digest.update(repr(self._docs[doc_id]).encode("utf-8"))
+				self._fingerprint = digest.hexdigest()
+			return self._fingerprint
+
+	def upsert(self, doc: RecipeDoc) -> None:
+		with self._lock:
+			self.remove(doc.id)
+			self._fingerprint = None
+			weights = _doc_weights(doc)
+			for gram, w in weights.items():
+				self._postings[gram][doc.id] = w
+			self._docs[doc.id] = doc
+			self._weights[doc.id] = weights
+			self._norms[doc.id] = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+			bisect.insort(self._by_calories, (doc.calories, doc.id))
+
+	def remove(self, recipe_id: int) -> None:
+		with self._lock:
+			doc = self._docs.pop(recipe_id, None)
+			if doc is None:
+				return
+			self._fingerprint = None
+			for gram in self._weights.pop(recipe_id):
+				postings = self._postings[gram]
+				postings.pop(recipe_id, None)
+				if not postings:
+					del self._postings[gram]
+			self._norms.pop(recipe_id, None)
+			pos = bisect.bisect_left(self._by_calories, (doc.calories, recipe_id))
+			if pos < len(self._by_calories) and self._by_calories[pos] == (doc.calories, recipe_id):
+				del self._by_calories[pos]
+
+	def rebuild(self, docs: list[RecipeDoc]) -> bool:
+		"""用全量文档替换索引内容，返回内容是否有变化。"""
+		with self._lock:
+			if {doc.id: doc for doc in docs} == self._docs:
+				return False
+			for doc_id in list(self._docs):
+				self.remove(doc_id)
+			for doc in docs:
+				self.upsert(doc)
+			return True
+
+	def _lexical_scores(self, query: str) -> dict[int, float]:
+		total = len(self._docs)
+		scores: dict[int, float] = defaultdict(float)
+		query_norm = 0.0
+		for gram, c in _char_ngrams(query).items():
+			postings = self._postings.get(gram)
+			if not postings:
+				continue
+			idf = math.log((total + 1) / (len(postings) + 1)) + 1.0
+			qw = (1.0 + math.log(c)) * idf
+			query_norm += qw * qw
+			for doc_id, w in postings.items():
+				scores[doc_id] += qw * w * idf
+		if not scores:
+			return {}
+		query_norm = math.sqrt(query_norm)
+		return {doc_id: s / (query_norm * self._norms[doc_id]) for doc_id, s in scores.items()}
+
+	def search(
+		self,
+		query: str,
+		*,
+		top_k: int = 8,
+		target_calories: float | None = None,
+		target_protein_ratio: float | None = None,
+		calorie_tolerance: float = 0.35,
+		allowed_ids: Collection[int] | None = None,
+		excluded_ids: Collection[int] = (),
+	) -> list[RecipeDoc]:
+		"""按 (文本相关度 + 热量/蛋白供能比接近度) 排序返回前 top_k 条食谱。
+
+		target_calories 是单餐目标热量；给出时只在 ±calorie_tolerance 的热量窗口内
+		加上文本最相关的 top_k 条里选（用户点名的菜不会被热量过滤掉），窗口内不足 top_k 条时退回全库。
+		allowed_ids / excluded_ids 是硬性过滤（如全文检索得出的“含/不含某食材”），任何情况下都不放宽。
+		"""
+		with self._lock:
+			if not self._docs or top_k <= 0:
+				return []
+
+			if allowed_ids is not None:
+				eligible = {doc_id for doc_id in allowed_ids if doc_id in self._docs}
+			else:
+				eligible = set(self._docs)
+			if excluded_ids:
+				eligible.difference_update(excluded_ids)
+			if not eligible:
+				return []
+
+			lexical = self._lexical_scores(query)
+
+			candidates: set[int]
+			if target_calories and target_calories > 0:
+				low = target_calories * (1 - calorie_tolerance)
+				high = target_calories * (1 + calorie_tolerance)
+				lo = bisect.bisect_left(self._by_calories, (math.ceil(low), -1))
+				hi = bisect.bisect_right(self._by_calories, (math.floor(high), math.inf))
+				candidates = {doc_id for _, doc_id in self._by_calories[lo:hi] if doc_id in eligible}
+				if len(candidates) < top_k:
+					candidates = eligible
+				else:
+					matched = [doc_id for doc_id in lexical if doc_id in eligible]
+					candidates.update(sorted(matched, key=lambda doc_id: (-lexical[doc_id], doc_id))[:top_k])
+			else:
+				candidates = eligible
+
+			def score(doc_id: int) -> float:
+				doc = self._docs[doc_id]
+				value = lexical.get(doc_id, 0.0)
+				if target_calories and target_calories > 0:
+					value += 0.3 * max(0.0, 1.0 - abs(doc.calories - target_calories) / target_calories)
+				if target_protein_ratio and doc.calories > 0:
+					ratio = doc.protein * 4 / doc.calories
+					value += 0.2 * max(0.0, 1.0 - abs(ratio - target_protein_ratio) / max(target_protein_ratio, 0.01))
+				return value
+
+			ranked = sorted(candidates, key=lambda doc_id: (-score(doc_id), doc_id))
+			return [self._docs[doc_id] for doc_id in ranked[:top_k]]
+
+
+_index = RecipeIndex()
+_index_build_lock = threading.Lock()
+
+
+def _index_ttl() -> float:
+	# 其他进程（如 auto_populate_db.py）写库不会触发本进程的信号，按 TTL 兜底全量重建
+	try:
+		return float(os.getenv("SMARTDIET_RECIPE_CONTEXT_TTL") or 300)
+	except ValueError:
+		return 300.0
+
+
+def _load_docs() -> list[RecipeDoc]:
+	rows = Recipe.objects.order_by("id").values_list(
+		"id", "name", "calories", "protein", "carbs", "fats", "ingredients"
+	)
+	return [RecipeDoc(*row) for row in rows]
+
+
+def get_recipe_index() -> RecipeIndex:
+	"""返回进程内共享的食谱索引：首次调用全量构建，之后由模型信号增量维护。
+
+	版本号与索引不一致（bulk_create 等手动 bump 的写入）或超过 TTL 时才会重新查库。
+	"""
+	ttl = _index_ttl()
+	expired = ttl > 0 and time.monotonic() - _index.built_at > ttl
+	if _index.version == get_recipe_version() and not expired:
+		return _index
+
+	with _index_build_lock:
+		expired = ttl > 0 and time.monotonic() - _index.built_at > ttl
+		if _index.version == get_recipe_version() and not expired:
+			return _index
+
+		docs = _load_docs()
+		with _index._lock:
+			changed = _index.rebuild(docs)
+			if changed and expired and _index.version is not None:
+				# 外部进程改了食谱表：同步推进版本号，让下游缓存一起失效
+				bump_recipe_version()
+			_index.version = get_recipe_version()
+			_index.built_at = time.monotonic()
+	return _index
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.retrieval.upsert_on_save")
+def _on_recipe_saved(sender, instance: Recipe, **kwargs) -> None:
+	with _index._lock:
+		# 索引尚未构建或已落后于版本号时，交给下一次 get_recipe_index() 全量构建
+		if _index.version is None or _index.version != get_recipe_version() - 1:
+			return
+		_index.upsert(
+			RecipeDoc(
+				instance.pk,
+				instance.name,
+				int(instance.calories),
+				float(instance.protein),
+				float(instance.carbs),
+				float(instance.fats),
+				instance.ingredients,
+			)
+		)
+		_index.version = get_recipe_version()
+
+
+@receiver(post_delete, sender=Recipe, dispatch_uid="recipes.retrieval.remove_on_delete")
+def _on_recipe_deleted(sender, instance: Recipe, **kwargs) -> None:
+	with _index._lock:
+		if _index.version is None or _index.version != get_recipe_version() - 1:
+			return
+		_index.remove(instance.pk)
+		_index.version = get_recipe_version()
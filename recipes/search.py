@@ -0,0 +1,346 @@
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, router
+from django.db.models import CharField, F, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from .models import Ingredient, Recipe
+
+# ==========================================
+# 食谱全文检索（SQLite FTS5 trigram）
+# ==========================================
+# recipes_recipe_fts 是 recipes_recipe 的外部内容（external content）FTS5 表，只存倒排索引不存正文，
+# 由数据库触发器同步，bulk_create / 其他进程的写入也不会漏。trigram 分词按 3 字符切分，
+# 对中文无需词典；但少于 3 个字符的词（牛奶、鸡蛋）无法走 MATCH，这类词退回 LIKE 过滤。
+FTS_TABLE = "recipes_recipe_fts"
+FTS_COLUMNS = ("name", "ingredients", "instructions")
+# bm25 列权重：名称 > 食材 > 做法
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+TRIGRAM = 3
+
+_available: dict[str, bool] = {}
+
+
+def _fts_statements(table: str) -> list[str]:
+	columns = ", ".join(FTS_COLUMNS)
+	new_values = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+	old_values = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+	delete_old = (
+		f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+	)
+	insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+	return [
+		f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+		f"{columns}, content='{table}', content_rowid='id', tokenize='trigram')",
+		f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+		f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+		f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {table} BEGIN {delete_old} {insert_new} END",
+	]
+
+
+def ensure_fts_schema(connection, *, create: bool = True) -> bool:
+	"""建好 FTS5 表与同步触发器（幂等），返回全文检索是否可用。
+
+	Django 在 SQLite 上改表结构时会重建 recipes_recipe，旧表上的触发器随之消失，
+	所以每次 migrate 之后都会以 create=False 再调用一次（FTS 表不存在时什么都不做，
+	尊重回滚到 0004 之前的迁移状态）；发现触发器缺失时顺带全量重建索引。
+	"""
+	if connection.vendor != "sqlite":
+		return False
+	table = Recipe._meta.db_table
+	with connection.cursor() as cursor:
+		cursor.execute(
+			"SELECT name FROM sqlite_master WHERE name = %s OR (type = 'trigger' AND name LIKE %s)",
+			[FTS_TABLE, f"{FTS_TABLE}_%"],
+		)
+		existing = {row[0] for row in cursor.fetchall()}
+		if table not in connection.introspection.table_names(cursor):
+			return False
+		if not create and FTS_TABLE not in existing:
+			_available[connection.alias] = False
+			return False
+		try:
+			for statement in _fts_statements(table):
+				cursor.execute(statement)
+		except OperationalError:
+			# 编译时未带 FTS5 或 SQLite < 3.34（没有 trigram 分词器）：退回 LIKE 检索
+			return False
+		expected = {FTS_TABLE, f"{FTS_TABLE}_ai", f"{FTS_TABLE}_ad", f"{FTS_TABLE}_au"}
+		if not expected <= existing:
+			cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+	_available[connection.alias] = True
+	return True
+
+
+def drop_fts_schema(connection) -> None:
+	if connection.vendor != "sqlite":
+		return
+	with connection.cursor() as cursor:
+		for suffix in ("ai", "ad", "au"):
+			cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+		cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+	_available.pop(connection.alias, None)
+
+
+@receiver(post_migrate, dispatch_uid="recipes.search.ensure_fts_schema")
+def _on_post_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs) -> None:
+	if getattr(sender, "name", None) == "recipes":
+		ensure_fts_schema(connections[using], create=False)
+
+
+def fts_available(using: str = DEFAULT_DB_ALIAS) -> bool:
+	if using not in _available:
+		connection = connections[using]
+		if connection.vendor != "sqlite":
+			_available[using] = False
+		else:
+			with connection.cursor() as cursor:
+				cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+				_available[using] = cursor.fetchone() is not None
+	return _available[using]
+
+
+# ==========================================
+# 从用户问题里识别“含/不含某食材”
+# ==========================================
+_CJK = "一-鿿"
+_TERM_SEPARATORS = re.compile(r"[、，,/和及与或]+")
+_TERM_END = rf"(?=[的了吧呢吗？?，,。！!\s]|做|炒|煮|蒸|烤|炖|拌|煎|$)"
+_TERM_LIST = rf"([{_CJK}、，,/和及与或]{{1,20}}?)"
+_EXCLUDE_RE = re.compile(rf"(?:不含|不要|不吃|不放|不加|(?<!有)没有|去掉|避开|忌口){_TERM_LIST}{_TERM_END}")
+_ALLERGY_RE = re.compile(rf"对{_TERM_LIST}过敏")
+_INCLUDE_RE = re.compile(rf"(?<![不没])(?:用|含有|含|带有|加了|放了){_TERM_LIST}{_TERM_END}")
+# 泛指词不是具体食材
+_GENERIC_TERMS = {"什么", "哪些", "一些", "食材", "东西", "菜", "早餐", "午餐", "晚餐", "食谱"}
+
+
+def _split_terms(fragments: Iterable[str]) -> list[str]:
+	terms: list[str] = []
+	for fragment in fragments:
+		for term in _TERM_SEPARATORS.split(fragment):
+			term = term.strip()
+			if term and term not in _GENERIC_TERMS and term not in terms:
+				terms.append(term)
+	return terms
+
+
+def parse_ingredient_intent(text: str) -> tuple[list[str], list[str]]:
+	"""从“有没有不含牛奶的早餐”“用鸡胸肉做的菜”这类问题里提取 (包含的食材, 排除的食材)。"""
+	text = text or ""
+	exclude = _split_terms(_EXCLUDE_RE.findall(text) + _ALLERGY_RE.findall(text))
+	include = [term for term in _split_terms(_INCLUDE_RE.findall(text)) if term not in exclude]
+	return include, exclude
+
+
+def resolve_ingredient_terms(terms: Iterable[str], *, using: str | None = None) -> list[str]:
+	"""用食材词表校正 parse_ingredient_intent 抽出的词，丢掉不是食材的。
+
+	正则只看句式，会抽出“到牛油果”（有没有用到牛油果）、“时短一点”（用时短一点的）、“电饭煲”、
+	“胃口”（没有胃口）这类词。词表里有这个词（或它是某个食材名的一部分：鸡胸 → 鸡胸肉），
+	或者它出现在某道食谱的名称/食材清单里时原样保留；否则取它包含的最长食材名（到牛油果 → 牛油果）；
+	都不沾边的丢弃。
+	"""
+	terms = [t.strip() for t in terms if t and t.strip()]
+	if not terms:
+		return []
+	using = router.db_for_read(Ingredient) if using is None else using
+	names = Ingredient.objects.using(using)
+	resolved: list[str] = []
+	for term in terms:
+		if names.filter(name__contains=term).exists() or recipe_ids_matching([term], using=using):
+			candidate = term
+		else:
+			candidate = (
+				names.alias(_term=Value(term, output_field=CharField()))
+				.filter(_term__contains=F("name"))
+				.order_by(Length("name").desc(), "name")
+				.values_list("name", flat=True)
+				.first()
+			)
+		if candidate and candidate not in resolved:
+			resolved.append(candidate)
+	return resolved
+
+
+# ==========================================
+# 检索 API
+# ==========================================
+@dataclass(frozen=True)
+class RecipeHit:
+	id: int
+	name: str
+	score: float
+
+
+def _phrase(term: str) -> str:
+	return '"' + term.replace('"', '""') + '"'
+
+
+def _split_by_length(terms: Iterable[str]) -> tuple[list[str], list[str]]:
+	"""按能否走 trigram MATCH（≥3 个字符）拆成 (长词, 短词)。"""
+	long_terms: list[str] = []
+	short_terms: list[str] = []
+	for term in terms:
+		term = term.strip()
+		if term:
+			(long_terms if len(term) >= TRIGRAM else short_terms).append(term)
+	return long_terms, short_terms
+
+
+def _ingredient_q(term: str) -> Q:
+	return Q(name__contains=term) | Q(ingredients__contains=term)
+
+
+def _read_alias(using: str | None) -> str:
+	# 未指定时和 ORM 查询一样交给数据库路由决定（配置了副本时读副本）
+	return using or router.db_for_read(Recipe)
+
+
+def _search_orm(
+	query: str, include: list[str], exclude: list[str], limit: int | None, using: str | None = None
+) -> list[RecipeHit]:
+	"""没有 FTS5 时的兜底：全部用 LIKE 过滤，按 id 排序。"""
+	queryset = Recipe.objects.using(_read_alias(using))
+	for term in include:
+		queryset = queryset.filter(_ingredient_q(term))
+	for term in exclude:
+		queryset = queryset.exclude(_ingredient_q(term))
+	words = [w for w in re.split(r"\s+", query.strip()) if w]
+	if words:
+		text_q = Q()
+		for word in words:
+			text_q |= Q(name__contains=word) | Q(ingredients__contains=word) | Q(instructions__contains=word)
+		queryset = queryset.filter(text_q)
+	rows = queryset.order_by("id").values_list("id", "name")
+	if limit is not None:
+		rows = rows[:limit]
+	return [RecipeHit(recipe_id, name, 0.0) for recipe_id, name in rows]
+
+
+def search_recipes(
+	query: str = "",
+	*,
+	include: Iterable[str] = (),
+	exclude: Iterable[str] = (),
+	limit: int | None = 20,
+	using: str | None = None,
+) -> list[RecipeHit]:
+	"""全文检索食谱。
+
+	- query：按空白分词的自由文本，任一词命中名称/食材/做法即可，用 bm25 排序
+	  （全是不足 3 个字符的短词时改用 LIKE，不参与排序）；
+	- include：名称或食材里必须全部出现的食材；
+	- exclude：名称或食材里出现任一即排除。
+	score 越大越相关；没有可排序的 MATCH 条件时按 id 升序，score 为 0。limit=None 表示不限条数。
+	"""
+	include = [t.strip() for t in include if t and t.strip()]
+	exclude = [t.strip() for t in exclude if t and t.strip()]
+	using = _read_alias(using)
+	if not fts_available(using):
+		return _search_orm(query, include, exclude, limit, using)
+
+	table = Recipe._meta.db_table
+	query_long, query_short = _split_by_length(re.split(r"\s+", query or ""))
+	include_long, include_short = _split_by_length(include)
+	exclude_long, exclude_short = _split_by_length(exclude)
+
+	match_parts: list[str] = []
+	if query_long:
+		match_parts.append("(" + " OR ".join(_phrase(t) for t in query_long) + ")")
+	match_parts.extend("{name ingredients}: " + _phrase(t) for t in include_long)
+
+	params: list = []
+	where: list[str] = []
+	if match_parts:
+		weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+		sql = (
+			f"SELECT r.id, r.name, -bm25({FTS_TABLE}, {weights}) AS score "
+			f"FROM {FTS_TABLE} JOIN {table} r ON r.id = {FTS_TABLE}.rowid "
+		)
+		where.append(f"{FTS_TABLE} MATCH %s")
+		params.append(" AND ".join(match_parts))
+		order = "score DESC, r.id"
+	else:
+		sql = f"SELECT r.id, r.name, 0.0 AS score FROM {table} r "
+		order = "r.id"
+	if query_short and not query_long:
+		like_any = " OR ".join(["r.name LIKE %s OR r.ingredients LIKE %s OR r.instructions LIKE %s"] * len(query_short))
+		where.append(f"({like_any})")
+		params.extend(f"%{term}%" for term in query_short for _ in range(3))
+	for term in include_short:
+		where.append("(r.name LIKE %s OR r.ingredients LIKE %s)")
+		params.extend([f"%{term}%"] * 2)
+	if exclude_long:
+		where.append(f"r.id NOT IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)")
+		params.append("{name ingredients}: (" + " OR ".join(_phrase(t) for t in exclude_long) + ")")
+	for term in exclude_short:
+		where.append("NOT (r.name LIKE %s OR r.ingredients LIKE %s)")
+		params.extend([f"%{term}%"] * 2)
+
+	if where:
+		sql += "WHERE " + " AND ".join(where) + " "
+	sql += f"ORDER BY {order}"
+	if limit is not None:
+		sql += " LIMIT %s"
+		params.append(int(limit))
+	with connections[using].cursor() as cursor:
+		cursor.execute(sql, params)
+		return [RecipeHit(recipe_id, name, float(score)) for recipe_id, name, score in cursor.fetchall()]
+
+
+def recipe_ids_matching(terms: Iterable[str], *, match_all: bool = True, using: str | None = None) -> set[int]:
+	"""名称或食材里包含 terms（match_all=True 时全部，否则任一）的食谱 id 集合。
+
+	只取 id、不算 bm25，比 search_recipes(limit=None) 便宜得多，适合给 RecipeIndex.search 做硬性过滤。
+	"""
+	terms = [t.strip() for t in terms if t and t.strip()]
+	if not terms:
+		return set()
+	using = _read_alias(using)
+	if not fts_available(using):
+		combined = Q()
+		for term in terms:
+			combined = (combined & _ingredient_q(term)) if match_all else (combined | _ingredient_q(term))
+		return set(Recipe.objects.using(using).filter(combined).values_list("id", flat=True))
+
+	long_terms, short_terms = _split_by_length(terms)
+	joiner = " AND " if match_all else " OR "
+	clauses: list[str] = []
+	params: list = []
+	if long_terms:
+		clauses.append(f"id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)")
+		params.append(joiner.join("{name ingredients}: " + _phrase(t) for t in long_terms))
+	for term in short_terms:
+		clauses.append("(name LIKE %s OR ingredients LIKE %s)")
+		params.extend([f"%{term}%"] * 2)
+	with connections[using].cursor() as cursor:
+		cursor.execute(f"SELECT id FROM {Recipe._meta.db_table} WHERE {joiner.join(clauses)}", params)
+		return {row[0] for row in cursor.fetchall()}
+
+
+def terms_q(terms: Iterable[str], *, using: str | None = None) -> Q:
+	"""名称或食材里包含全部 terms 的 ORM 条件。
+
+	与 recipe_ids_matching 的匹配规则相同，但返回 Q 而不是 id 集合，能和其他过滤、
+	按 id 的 keyset 分页拼成一条 SQL（JSON API 的食谱列表用）。
+	"""
+	terms = [t.strip() for t in terms if t and t.strip()]
+	condition = Q()
+	if not terms:
+		return condition
+	if not fts_available(_read_alias(using)):
+		for term in terms:
+			condition &= _ingredient_q(term)
+		return condition
+	long_terms, short_terms = _split_by_length(terms)
+	if long_terms:
+		match = " AND ".join("{name ingredients}: " + _phrase(t) for t in long_terms)
+		condition &= Q(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+	for term in short_terms:
+		condition &= _ingredient_q(term)
+	return condition
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Recipe, RecipeIngredient
+
+# 进程内的食谱表版本号：任何食谱增删改都会让它自增，
+# 依赖食谱库内容的缓存（如 Agent 的食谱上下文）以此判断是否需要重建。
+_version_lock = threading.Lock()
+_recipe_version = 0
+
+
+def get_recipe_version() -> int:
+	"""返回当前进程内食谱表的版本号。"""
+	return _recipe_version
+
+
+def bump_recipe_version() -> int:
+	"""手动让食谱表版本号自增（bulk_create/update 等不会触发模型信号的写入需要调用）。"""
+	global _recipe_version
+	with _version_lock:
+		_recipe_version += 1
+		return _recipe_version
+
+
+@receiver(post_save, sender=Recipe, dispatch_uid="recipes.bump_version_on_save")
+def _on_recipe_saved(sender, **kwargs) -> None:
+	bump_recipe_version()
+
+
+@receiver(post_delete, sender=Recipe, dispatch_uid="recipes.bump_version_on_delete")
+def _on_recipe_deleted(sender, **kwargs) -> None:
+	bump_recipe_version()
+
+
+# ==========================================
+# 食谱表状态：跨进程可比较的“版本”，供 HTTP 条件请求使用
+# ==========================================
+# 上面的版本号只在本进程内有效、重启归零，不能直接做 ETag；这里改从库里取
+# (行数, 最大 id, 最大 updated_at)：增、改会推进 updated_at/最大 id，删除会改变行数。
+# API 还会返回、按其筛选结构化食材，所以 RecipeIngredient 的 (行数, 最大 id) 也算在内：
+# 关联行只会整批删掉重插（sync_recipe_ingredients），自增 id 不复用，重建一次最大 id 就会变。
+@dataclass(frozen=True)
+class RecipeTableState:
+	count: int
+	max_id: int
+	updated_at: datetime | None
+	link_count: int = 0
+	link_max_id: int = 0
+
+	@property
+	def etag(self) -> str:
+		stamp = int(self.updated_at.timestamp() * 1_000_000) if self.updated_at else 0
+		return f"recipes-{self.count}-{self.max_id}-{stamp}-{self.link_count}-{self.link_max_id}"
+
+
+_state_lock = threading.Lock()
+# (本进程版本号, 查询时刻, 状态)
+_state_cache: tuple[int, float, RecipeTableState] | None = None
+
+
+def _state_ttl() -> float:
+	# 本进程的写入会推进版本号、立即生效；其他进程的写入最多晚这么久被看到
+	try:
+		return float(os.getenv("SMARTDIET_RECIPE_STATE_TTL") or 1)
+	except ValueError:
+		return 1.0
+
+
+def invalidate_recipe_table_state() -> None:
+	"""丢掉缓存的表状态（不经过模型信号、也不推进版本号的写入在提交后调用）。"""
+	global _state_cache
+	_state_cache = None
+
+
+def get_recipe_table_state() -> RecipeTableState:
+	"""返回食谱表的当前状态；TTL 内且本进程版本号未变时直接用缓存，不查库。"""
+	global _state_cache
+	version = get_recipe_version()
+	cached = _state_cache
+	if cached is not None and cached[0] == version and time.monotonic() - cached[1] < _state_ttl():
+		return cached[2]
+	with _state_lock:
+		row = Recipe.objects.aggregate(count=Count("id"), max_id=Max("id"), updated_at=Max("updated_at"))
+		links = RecipeIngredient.objects.aggregate(count=Count("id"), max_id=Max("id"))
+		state = RecipeTableState(
+			row["count"], row["max_id"] or 0, row["updated_at"], links["count"], links["max_id"] or 0
+		)
+		_state_cache = (version, time.monotonic(), state)
+		return state
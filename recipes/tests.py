@@ -1,3 +1,318 @@
-from django.test import TestCase
+import io
+import json
+import os
+from contextlib import redirect_stdout
+from unittest import mock
 
-# Create your tests here.
+from django.db import router, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+import llm_client
+from auto_populate_db import generate_recipes_concurrently
+from diet_planner.models import DietPlan
+from fake_llm_server import FakeLLMServer, FakeReply
+from json_stream import JsonObjectStream, iter_json_objects
+from nutrition_project.routers import use_primary
+from users.models import CustomUser
+
+from .ingest import ingest_recipes
+from .ingredients import parse_ingredient, parse_ingredients
+from .models import Ingredient, Recipe, RecipeIngredient
+
+
+def _rows(fragment: str) -> list[tuple]:
+	return [(item.name, item.quantity, item.unit, item.note) for item in parse_ingredient(fragment)]
+
+
+# ==========================================
+# 食材清单解析
+# ==========================================
+class ParseIngredientTests(SimpleTestCase):
+	def test_trailing_quantity(self):
+		self.assertEqual(_rows("鸡胸肉 200g"), [("鸡胸肉", 200.0, "g", "")])
+		self.assertEqual(_rows("藜麦(熟) 180g"), [("藜麦", 180.0, "g", "熟")])
+		self.assertEqual(_rows("鸡蛋 1/2 个"), [("鸡蛋", 0.5, "个", "")])
+		self.assertEqual(_rows("牛肉 3两"), [("牛肉", 150.0, "g", "")])
+		self.assertEqual(_rows("黑胡椒 适量"), [("黑胡椒", None, "适量", "")])
+
+	def test_leading_quantity(self):
+		self.assertEqual(_rows("1/2 个牛油果"), [("牛油果", 0.5, "个", "")])
+		self.assertEqual(_rows("半个洋葱"), [("洋葱", 0.5, "个", "")])
+		self.assertEqual(_rows("两个鸡蛋"), [("鸡蛋", 2.0, "个", "")])
+		self.assertEqual(_rows("一勺蜂蜜"), [("蜂蜜", 1.0, "勺", "")])
+		self.assertEqual(_rows("两克盐"), [("盐", 2.0, "g", "")])
+		self.assertEqual(_rows("200g 鸡胸肉"), [("鸡胸肉", 200.0, "g", "")])
+		self.assertEqual(_rows("适量盐"), [("盐", None, "适量", "")])
+
+	def test_names_starting_with_numerals_are_not_quantities(self):
+		self.assertEqual(_rows("三文鱼 200g"), [("三文鱼", 200.0, "g", "")])
+		self.assertEqual(_rows("五花肉"), [("五花肉", None, "", "")])
+		self.assertEqual(_rows("十三香 适量"), [("十三香", None, "适量", "")])
+
+	def test_shared_quantity_counted_once(self):
+		self.assertEqual(
+			_rows("牛奶/无糖豆奶 200ml"),
+			[("牛奶", 200.0, "ml", ""), ("无糖豆奶", None, "", "用量计入牛奶")],
+		)
+		self.assertEqual(
+			_rows("生菜/黄瓜/小番茄 150g"),
+			[("生菜", 150.0, "g", ""), ("黄瓜", None, "", "用量计入生菜"), ("小番茄", None, "", "用量计入生菜")],
+		)
+		# 没有数值用量时不存在重复计算
+		self.assertEqual(_rows("黑胡椒/盐 适量"), [("黑胡椒", None, "适量", ""), ("盐", None, "适量", "")])
+
+	def test_alternatives_keep_quantity_and_are_marked(self):
+		self.assertEqual(
+			_rows("牛奶或无糖豆奶 200ml"),
+			[("牛奶", 200.0, "ml", "可互换"), ("无糖豆奶", 200.0, "ml", "可互换")],
+		)
+		self.assertEqual(_rows("苹果/香蕉 1个（任选）"), [("苹果", 1.0, "个", "可互换"), ("香蕉", 1.0, "个", "可互换")])
+
+	def test_optional_note(self):
+		(item,) = parse_ingredient("坚果碎 10g（可选）")
+		self.assertEqual((item.name, item.quantity, item.optional, item.note), ("坚果碎", 10.0, True, ""))
+
+	def test_parse_ingredients_splits_and_dedupes(self):
+		items = parse_ingredients("燕麦 60g, 牛奶 250ml、1/2 个牛油果；时蔬（西兰花、胡萝卜） 100g, 牛奶 100ml")
+		self.assertEqual([item.name for item in items], ["燕麦", "牛奶", "牛油果", "时蔬"])
+		self.assertEqual(items[1].quantity, 250.0)
+		self.assertEqual(items[3].note, "西兰花、胡萝卜")
+
+
+# ==========================================
+# 主从路由：食谱类模型的读走副本，其余读、所有写与迁移走主库
+# ==========================================
+@override_settings(DATABASE_REPLICAS=["replica_1", "replica_2"])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+	# 不用 TestCase：它把每个测试包在主库事务里，而事务内的读本来就会回到主库
+	databases = {"default"}
+
+	def test_recipe_reads_go_to_replicas(self):
+		for model in (Recipe, Ingredient, RecipeIngredient):
+			with self.subTest(model=model.__name__):
+				self.assertIn(router.db_for_read(model), {"replica_1", "replica_2"})
+		self.assertIn(Recipe.objects.filter(calories__lt=500).db, {"replica_1", "replica_2"})
+
+	def test_other_reads_go_to_primary(self):
+		self.assertEqual(router.db_for_read(DietPlan), "default")
+		self.assertEqual(CustomUser.objects.all().db, "default")
+
+	def test_writes_go_to_primary(self):
+		for model in (Recipe, Ingredient, RecipeIngredient, DietPlan, CustomUser):
+			with self.subTest(model=model.__name__):
+				self.assertEqual(router.db_for_write(model), "default")
+		# 从副本读出的实例保存时也写回主库
+		recipe = Recipe(name="副本读出的食谱")
+		recipe._state.db = "replica_1"
+		self.assertEqual(router.db_for_write(Recipe, instance=recipe), "default")
+
+	def test_migrations_only_on_primary(self):
+		self.assertTrue(router.allow_migrate("default", "recipes", model_name="recipe"))
+		self.assertFalse(router.allow_migrate("replica_1", "recipes", model_name="recipe"))
+		self.assertFalse(router.allow_migrate("replica_2", "diet_planner", model_name="dietplan"))
+
+	def test_pinned_reads_go_to_primary(self):
+		with use_primary():
+			self.assertEqual(router.db_for_read(Recipe), "default")
+			with use_primary():
+				self.assertEqual(router.db_for_read(Recipe), "default")
+			self.assertEqual(router.db_for_read(Recipe), "default")
+		self.assertNotEqual(router.db_for_read(Recipe), "default")
+
+		with transaction.atomic():
+			self.assertEqual(router.db_for_read(Recipe), "default")
+		self.assertNotEqual(router.db_for_read(Recipe), "default")
+
+	def test_relations_allowed_across_the_cluster(self):
+		recipe, plan = Recipe(name="甲"), DietPlan()
+		recipe._state.db, plan._state.db = "replica_1", "default"
+		self.assertTrue(router.allow_relation(recipe, plan))
+
+	@override_settings(DATABASE_REPLICAS=[])
+	def test_without_replicas_everything_uses_primary(self):
+		self.assertEqual(router.db_for_read(Recipe), "default")
+		self.assertTrue(router.allow_migrate("default", "recipes"))
+
+
+# ==========================================
+# 共享 LLM 客户端：按 (base_url, api_key) 复用，连续多轮走同一条 keep-alive 连接
+# ==========================================
+class SharedClientTests(SimpleTestCase):
+	def setUp(self):
+		self.server = FakeLLMServer().start()
+		self.addCleanup(self.server.close)
+		self.addCleanup(llm_client.close_clients)
+
+	def test_same_instance_per_base_url_and_key(self):
+		client = llm_client.get_client("key-a", self.server.url)
+		self.assertIs(llm_client.get_client("key-a", self.server.url), client)
+		self.assertIsNot(llm_client.get_client("key-b", self.server.url), client)
+		self.assertIsNot(llm_client.get_client("key-a", f"{self.server.url}/v1"), client)
+
+	def test_connection_kept_open_across_turns(self):
+		for turn in range(3):
+			client = llm_client.get_client("key-a", self.server.url)
+			response = client.chat.completions.create(
+				model="fake", messages=[{"role": "user", "content": f"第 {turn + 1} 轮"}]
+			)
+			self.assertEqual(response.choices[0].message.content, "推荐：泰式青柠煎鸡胸。")
+		self.assertEqual(self.server.requests, 3)
+		self.assertEqual(self.server.connections, 1)
+
+
+# ==========================================
+# 增量 JSON 对象解析：任意切分、字符串里的花括号与转义、代码块标记、坏对象与尾部杂质
+# ==========================================
+class JsonObjectStreamTests(SimpleTestCase):
+	TEXT = '[{"name": "番茄{炒}蛋", "note": "引号\\"与反斜杠\\\\"}, {"name": "燕麦杯", "tags": {"meal": "早餐"}}]'
+	EXPECTED = [{"name": "番茄{炒}蛋", "note": '引号"与反斜杠\\'}, {"name": "燕麦杯", "tags": {"meal": "早餐"}}]
+
+	def _feed(self, chunks) -> tuple[list[dict], JsonObjectStream]:
+		stream = JsonObjectStream()
+		objects = [obj for chunk in chunks for obj in stream.feed(chunk)]
+		return objects, stream
+
+	def test_whole_text(self):
+		objects, stream = self._feed([self.TEXT])
+		self.assertEqual(objects, self.EXPECTED)
+		self.assertEqual((stream.objects, stream.errors, stream.pending), (2, 0, False))
+
+	def test_every_split_point(self):
+		# 覆盖切在字符串中间、转义反斜杠之后、嵌套对象内部等所有位置
+		for i in range(1, len(self.TEXT)):
+			with self.subTest(split=i):
+				objects, stream = self._feed([self.TEXT[:i], self.TEXT[i:]])
+				self.assertEqual(objects, self.EXPECTED)
+				self.assertEqual(stream.errors, 0)
+
+	def test_one_character_chunks(self):
+		objects, _ = self._feed(list(self.TEXT))
+		self.assertEqual(objects, self.EXPECTED)
+
+	def test_escaped_quote_split_after_backslash(self):
+		objects, _ = self._feed(['{"a": "x\\', '"}", "b": 1}'])
+		self.assertEqual(objects, [{"a": 'x"}', "b": 1}])
+
+	def test_markdown_fence_and_surrounding_text(self):
+		text = "好的，以下是食谱：\n```json\n" + self.TEXT + "\n```\n如需调整请告诉我。"
+		self.assertEqual(list(iter_json_objects([text[:15], text[15:40], text[40:]])), self.EXPECTED)
+
+	def test_malformed_object_between_valid_ones(self):
+		text = '[{"name": "甲"}, {"name": "乙", "calories": 3OO}, {"name": "丙"}]'
+		objects, stream = self._feed([text[:25], text[25:]])
+		self.assertEqual(objects, [{"name": "甲"}, {"name": "丙"}])
+		self.assertEqual((stream.objects, stream.errors), (2, 1))
+
+	def test_trailing_junk_and_truncation(self):
+		objects, stream = self._feed(['[{"name": "甲"}]', "\n] , ``` 以上 ]]"])
+		self.assertEqual(objects, [{"name": "甲"}])
+		self.assertFalse(stream.pending)
+
+		objects, stream = self._feed(['[{"name": "甲"}, {"name": "乙", "ingre'])
+		self.assertEqual(objects, [{"name": "甲"}])
+		self.assertTrue(stream.pending)
+
+
+# ==========================================
+# 并发批量生成：对着假接口验证并发上限、限速、退避、402 与中途断流
+# ==========================================
+def _recipe_json(index: int, i: int) -> str:
+	return json.dumps(
+		{
+			"name": f"假食谱 {index}-{i}",
+			"calories": 400,
+			"protein": 30,
+			"carbs": 40,
+			"fats": 12,
+			"ingredients": "鸡胸肉 150g, 西兰花 100g",
+			"instructions": "略",
+		},
+		ensure_ascii=False,
+	)
+
+
+def _recipes_reply(index: int, payload: dict, per_request: int = 3) -> str:
+	return "[" + ", ".join(_recipe_json(index, i) for i in range(per_request)) + "]"
+
+
+class ConcurrentGenerationTests(TestCase):
+	def setUp(self):
+		self.server = FakeLLMServer(content=_recipes_reply).start()
+		self.addCleanup(self.server.close)
+		self.addCleanup(llm_client.close_clients)
+		patcher = mock.patch.dict(os.environ, {"DEEPSEEK_BASE_URL": self.server.url, "DEEPSEEK_API_KEY": "test"})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def _generate(self, requests: int, **options) -> tuple[list[dict], dict[str, int]]:
+		options = {"per_request": 3, "concurrency": 4, "rate": 0, "base_delay": 0.01, **options}
+		stats: dict[str, int] = {}
+		with redirect_stdout(io.StringIO()):
+			recipes = list(generate_recipes_concurrently(requests, stats=stats, **options))
+		return recipes, stats
+
+	def test_concurrency_cap(self):
+		self.server.latency = 0.15
+		recipes, stats = self._generate(6, concurrency=2)
+		self.assertEqual(self.server.requests, 6)
+		self.assertEqual(self.server.max_inflight, 2)
+		self.assertEqual((stats["ok"], stats["failed"], len(recipes)), (6, 0, 18))
+
+	def test_rate_limit(self):
+		self._generate(5, concurrency=5, rate=10, burst=1)
+		times = self.server.request_times
+		self.assertEqual(len(times), 5)
+		# 桶容量 1：第一个请求立即发出，之后每 0.1 秒一个
+		self.assertGreaterEqual(times[-1] - times[0], 0.35)
+
+	def test_backoff_prefers_retry_after(self):
+		self.server.script(
+			FakeReply(status=429, headers={"Retry-After": "0.3"}),
+			FakeReply(status=503, headers={"Retry-After": "0.3"}),
+		)
+		# base_delay 很大：若没有按 Retry-After 等待，这个测试会超时
+		recipes, stats = self._generate(1, concurrency=1, base_delay=60)
+		times = self.server.request_times
+		self.assertEqual(len(times), 3)
+		self.assertGreaterEqual(times[1] - times[0], 0.3)
+		self.assertGreaterEqual(times[2] - times[1], 0.3)
+		self.assertEqual((stats["ok"], stats["retries"], len(recipes)), (1, 2, 3))
+
+	def test_server_error_without_retry_after_backs_off_exponentially(self):
+		self.server.script(FakeReply(status=500), FakeReply(status=502))
+		recipes, stats = self._generate(1, concurrency=1, base_delay=0.05)
+		times = self.server.request_times
+		self.assertEqual((stats["ok"], stats["retries"], len(recipes)), (1, 2, 3))
+		# 第二次退避是 base_delay·2 再乘 0.5~1.5 的抖动
+		self.assertGreaterEqual(times[2] - times[1], 0.05)
+
+	def test_retries_exhausted_counts_as_failed(self):
+		self.server.script(*[FakeReply(status=429, headers={"Retry-After": "0"})] * 3)
+		recipes, stats = self._generate(1, concurrency=1, max_retries=2)
+		self.assertEqual(self.server.requests, 3)
+		self.assertEqual((stats["ok"], stats["failed"], stats["retries"], len(recipes)), (0, 1, 2, 0))
+
+	def test_insufficient_balance_stops_new_requests(self):
+		self.server.script(FakeReply(), FakeReply(status=402))
+		recipes, stats = self._generate(5, concurrency=1)
+		self.assertEqual(self.server.requests, 2)
+		self.assertEqual((stats["ok"], stats["failed"], stats["retries"], len(recipes)), (1, 1, 0, 3))
+
+	def test_stream_cut_midway_keeps_other_batches(self):
+		first, second, third = (_recipe_json(0, i) for i in range(3))
+		chunks = ["```json\n[", first[:20], first[20:] + ", ", second + ", ", third[:30], third[30:] + "]```"]
+		self.server.script(FakeReply(chunks=chunks, cut_after=5))
+		stats: dict[str, int] = {}
+		with redirect_stdout(io.StringIO()):
+			result = ingest_recipes(
+				generate_recipes_concurrently(3, per_request=3, concurrency=1, rate=0, stats=stats),
+				batch_size=2,
+				commit_every_batch=True,
+			)
+		# 断流的请求保留已闭合的两个食谱，其余两个请求各 3 个照常入库
+		self.assertEqual((stats["ok"], stats["failed"]), (2, 1))
+		self.assertEqual(result.created, 8)
+		names = set(Recipe.objects.values_list("name", flat=True))
+		self.assertIn("假食谱 0-1", names)
+		self.assertNotIn("假食谱 0-2", names)
+		self.assertIn("假食谱 2-2", names)
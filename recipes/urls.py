@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = "recipes"
+
+urlpatterns = [
+	path("recipes/", views.recipe_list, name="recipe-list"),
+	path("recipes/<int:pk>/", views.recipe_detail, name="recipe-detail"),
+]
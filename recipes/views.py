@@ -1,3 +1,93 @@
-from django.shortcuts import render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-# Create your views here.
+from nutrition_project.api import ApiError, api_view, json_response, query_float, query_int, query_list
+
+from .models import MACRO_FIELDS, Recipe, RecipeIngredient
+from .search import terms_q
+from .signals import get_recipe_table_state
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+LIST_FIELDS = ("id", "name", "calories", "protein", "carbs", "fats", "protein_ratio", "ingredients")
+
+
+# ==========================================
+# 条件请求：ETag / Last-Modified 取自食谱表状态，未变化时直接 304，不查询也不序列化
+# ==========================================
+def _recipes_etag(request, *args, **kwargs) -> str:
+	return get_recipe_table_state().etag
+
+
+def _recipes_last_modified(request, *args, **kwargs):
+	return get_recipe_table_state().updated_at
+
+
+recipe_conditional = condition(etag_func=_recipes_etag, last_modified_func=_recipes_last_modified)
+# public + no-cache：客户端与代理都可以存，但每次使用前带上校验头回源确认
+recipe_cache = cache_control(public=True, no_cache=True)
+
+
+def _recipe_row(row: dict) -> dict:
+	row["protein_ratio"] = round(row["protein_ratio"], 4) if row.get("protein_ratio") is not None else None
+	return row
+
+
+@api_view
+@recipe_cache
+@recipe_conditional
+def recipe_list(request):
+	"""食谱列表：按 id 的 keyset 分页（cursor 为上一页最后一条的 id），可叠加营养区间与食材条件。
+
+	- calories_min/_max、protein_min/_max、carbs_min/_max、fats_min/_max：营养值区间；
+	- q：名称或食材里必须全部出现的词（逗号分隔，走 FTS5 索引）；
+	- ingredients / exclude：结构化食材名，必须全部包含 / 任一都不能包含；
+	- limit：每页条数（1~100）。
+	"""
+	limit = query_int(request, "limit", DEFAULT_PAGE_SIZE, low=1, high=MAX_PAGE_SIZE)
+	cursor = query_int(request, "cursor", 0, low=0)
+	queryset = Recipe.objects.all()
+	low = query_float(request, "calories_min", low=0)
+	high = query_float(request, "calories_max", low=0)
+	if low is not None or high is not None:
+		queryset = queryset.calories_between(low, high)
+	for macro in MACRO_FIELDS:
+		low = query_float(request, f"{macro}_min", low=0)
+		high = query_float(request, f"{macro}_max", low=0)
+		if low is not None or high is not None:
+			queryset = queryset.macro_between(macro, low, high)
+	terms = query_list(request, "q")
+	if terms:
+		queryset = queryset.filter(terms_q(terms))
+	queryset = queryset.containing_ingredients(*query_list(request, "ingredients"))
+	queryset = queryset.excluding_ingredients(*query_list(request, "exclude"))
+
+	# 多取一条判断是否还有下一页
+	rows = list(queryset.filter(id__gt=cursor).order_by("id").values(*LIST_FIELDS)[: limit + 1])
+	next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+	next_url = None
+	if next_cursor is not None:
+		params = request.GET.copy()
+		params["cursor"] = str(next_cursor)
+		next_url = f"{request.path}?{params.urlencode()}"
+	return json_response(
+		{"results": [_recipe_row(row) for row in rows[:limit]], "next_cursor": next_cursor, "next": next_url}
+	)
+
+
+@api_view
+@recipe_cache
+@recipe_conditional
+def recipe_detail(request, pk: int):
+	"""单个食谱，附带做法与解析后的结构化食材。"""
+	row = Recipe.objects.filter(pk=pk).values(*LIST_FIELDS, "instructions").first()
+	if row is None:
+		raise ApiError("食谱不存在", status=404)
+	row["ingredient_items"] = list(
+		RecipeIngredient.objects.filter(recipe_id=pk)
+		.order_by("position")
+		.values("ingredient__name", "quantity", "unit", "note", "optional")
+	)
+	for item in row["ingredient_items"]:
+		item["name"] = item.pop("ingredient__name")
+	return json_response(_recipe_row(row))
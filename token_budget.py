@@ -0,0 +1,16 @@
+import re
+
+# 与具体模型分词器无关的确定性 token 估算：
+# 汉字/全角符号按 1 token 计；连续的字母数字按约 4 字符 1 token 计；其余可见字符各 1 token。
+# 数值会比 DeepSeek 实际计数略偏大，用于预算控制时偏保守。
+_TOKEN_PIECE_RE = re.compile(r"[　-〿㐀-鿿＀-￯]|[A-Za-z0-9_.]+|\S")
+
+
+def estimate_tokens(text: str) -> int:
+    count = 0
+    for piece in _TOKEN_PIECE_RE.findall(text or ""):
+        if len(piece) > 1:
+            count += (len(piece) + 3) // 4
+        else:
+            count += 1
+    return count
@@ -6,10 +6,15 @@ import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 
+from diet_planner import nutrition
+from diet_planner.compiled_forest import compile_forest, save_compiled_forest
 
-def _build_synthetic_dataset(n: int = 1000, seed: int = 42) -> pd.DataFrame:
-    rng = np.random.default_rng(seed)
 
+FEATURE_COLUMNS = ["age", "weight", "height", "activity_level"]
+
+
+def _synthetic_arrays(n: int, rng: np.random.Generator) -> tuple[np.ndarray, ...]:
+    """按固定顺序消耗 rng 生成 (ages, weights, heights, activity, target)，分块生成时复用。"""
     ages = rng.integers(18, 61, size=n)
     weights = rng.uniform(45, 120, size=n).round(1)
     heights = rng.uniform(150, 200, size=n).round(1)
@@ -17,12 +22,18 @@ def _build_synthetic_dataset(n: int = 1000, seed: int = 42) -> pd.DataFrame:
     activity_levels = np.array([1.2, 1.375, 1.55, 1.725, 1.9])
     activity = rng.choice(activity_levels, size=n, replace=True)
 
-    # 简化版 BMR（不区分性别；用于演示/模拟训练）
-    bmr = 10 * weights + 6.25 * heights - 5 * ages + 5
-    tdee = bmr * activity
+    # 简化版 BMR（不区分性别，统一按男性公式；用于演示/模拟训练）
+    bmr_kcal = nutrition.bmr(np.full(n, "male"), ages, heights, weights)
+    tdee = nutrition.tdee(bmr_kcal, activity)
 
     # 目标标签生成：tdee 越高越倾向维持/增肌，否则减脂
     target = np.where(tdee > 2800, "gain", np.where(tdee > 2500, "maintain", "lose"))
+    return ages, weights, heights, activity, target
+
+
+def _build_synthetic_dataset(n: int = 1000, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ages, weights, heights, activity, target = _synthetic_arrays(n, rng)
 
     df = pd.DataFrame(
         {
@@ -39,7 +50,7 @@ def _build_synthetic_dataset(n: int = 1000, seed: int = 42) -> pd.DataFrame:
 def main() -> int:
     df = _build_synthetic_dataset(n=1000, seed=42)
 
-    X = df[["age", "weight", "height", "activity_level"]]
+    X = df[FEATURE_COLUMNS]
     y = df["target"]
 
     X_train, X_test, y_train, y_test = train_test_split(
@@ -69,6 +80,19 @@ def main() -> int:
     joblib.dump(model, out_path)
     print(f"Saved model to: {out_path}")
 
+    # 导出为纯 NumPy 推理文件（app.py 优先使用，不需要导入 sklearn）；必须与 sklearn 逐条一致
+    compiled = compile_forest(model)
+    sk_pred = model.predict(X_test)
+    np_pred = compiled.predict(X_test.to_numpy())
+    if not np.array_equal(sk_pred, np_pred):
+        raise RuntimeError("导出的 NumPy 森林与 sklearn 预测不一致，未写入 .npz")
+    compiled_acc = float(np.mean(np_pred == y_test.to_numpy()))
+    print(f"Compiled forest accuracy: {compiled_acc:.4f} (matches sklearn)")
+
+    npz_path = os.path.join(out_dir, "diet_model_v1.npz")
+    save_compiled_forest(compiled, npz_path)
+    print(f"Saved compiled forest to: {npz_path}")
+
     return 0
 
 
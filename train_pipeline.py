@@ -0,0 +1,241 @@
+"""
+策略模型训练流水线：分块生成大规模合成数据 → 进程池并行超参搜索 → 进程池结束后串行测延迟，对比 RF / 直方图梯度提升 / 浅层决策树
+的准确率、模型文件大小与单行推理 p99 延迟 → 每次运行写入带版本的模型文件与 JSON 指标清单。
+
+app.py（经 diet_planner.model_registry.select_model_name）会读取 ml_models/manifest.json，
+在满足准确率下限的候选里挑单行推理最快的那个。
+
+用法：python train_pipeline.py --rows 2000000 --train-rows 200000 --workers 4
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from diet_planner.compiled_forest import compile_forest, load_compiled_forest, save_compiled_forest
+from diet_planner.model_registry import MANIFEST_NAME, MODEL_DIR
+from train_ml_model import FEATURE_COLUMNS, _synthetic_arrays
+
+LABELS = np.array(["gain", "lose", "maintain"])
+
+# 候选模型与超参网格；RF/决策树会额外导出为 NumPy 森林用于推理
+SEARCH_SPACE: dict[str, dict[str, list]] = {
+    "rf": {"n_estimators": [50, 100, 300], "max_depth": [None, 12]},
+    "hgb": {"max_iter": [100, 200], "max_leaf_nodes": [15, 31]},
+    "tree": {"max_depth": [4, 6, 8]},
+}
+
+
+def generate_dataset(out_dir: Path, rows: int, chunk_rows: int, seed: int) -> dict[str, str]:
+    """分块生成合成数据并写入内存映射的 .npy（特征 float32、标签 int8），峰值内存只与 chunk_rows 有关。"""
+    X = np.lib.format.open_memmap(out_dir / "X.npy", mode="w+", dtype=np.float32, shape=(rows, len(FEATURE_COLUMNS)))
+    y = np.lib.format.open_memmap(out_dir / "y.npy", mode="w+", dtype=np.int8, shape=(rows,))
+    digest = hashlib.sha256()
+    # 每块一个独立子种子：结果只取决于 (seed, rows, chunk_rows)，可复现
+    child_seeds = np.random.SeedSequence(seed).spawn((rows + chunk_rows - 1) // chunk_rows)
+    for i, child in enumerate(child_seeds):
+        start = i * chunk_rows
+        n = min(chunk_rows, rows - start)
+        ages, weights, heights, activity, target = _synthetic_arrays(n, np.random.default_rng(child))
+        X[start : start + n] = np.column_stack([ages, weights, heights, activity])
+        y[start : start + n] = np.searchsorted(LABELS, target)
+        digest.update(X[start : start + n].tobytes())
+    X.flush()
+    y.flush()
+    return {"X": str(out_dir / "X.npy"), "y": str(out_dir / "y.npy"), "sha256": digest.hexdigest()}
+
+
+def _make_model(kind: str, params: dict, seed: int):
+    if kind == "rf":
+        from sklearn.ensemble import RandomForestClassifier
+
+        return RandomForestClassifier(random_state=seed, n_jobs=1, class_weight="balanced", **params)
+    if kind == "hgb":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        return HistGradientBoostingClassifier(random_state=seed, **params)
+    if kind == "tree":
+        from sklearn.tree import DecisionTreeClassifier
+
+        return DecisionTreeClassifier(random_state=seed, class_weight="balanced", **params)
+    raise ValueError(f"未知模型类型：{kind}")
+
+
+def _p99_single_row_ms(model, X: np.ndarray, repeat: int) -> float:
+    samples = []
+    for i in range(repeat):
+        row = X[i % len(X) : i % len(X) + 1]
+        started = time.perf_counter()
+        model.predict(row)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def train_candidate(job: dict) -> dict:
+    """进程池工作函数：在内存映射的数据上训练一个候选，评估准确率并写出模型文件。
+
+    单行推理延迟不在这里测：其他候选还在并行训练（HGB 的 OpenMP 线程会占满所有核），
+    此时测到的主要是争用，由主进程在进程池结束后用 benchmark_artifact 逐个串行测量。
+    """
+    X = np.load(job["X"], mmap_mode="r")
+    y = np.load(job["y"], mmap_mode="r")
+    train_rows, test_rows = job["train_rows"], job["test_rows"]
+    X_train, y_train = np.asarray(X[:train_rows]), LABELS[y[:train_rows]]
+    X_test, y_test = np.asarray(X[-test_rows:]), LABELS[y[-test_rows:]]
+
+    model = _make_model(job["kind"], job["params"], job["seed"])
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    # RF/决策树按 NumPy 森林部署，延迟与大小也按部署形态衡量
+    artifact_model = model
+    suffix = ".pkl"
+    if job["kind"] in {"rf", "tree"}:
+        artifact_model = compile_forest(model)
+        artifact_model.feature_names_in_ = np.array(FEATURE_COLUMNS)
+        suffix = ".npz"
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        accuracy = float(np.mean(artifact_model.predict(X_test) == y_test))
+
+    artifact = Path(job["run_dir"]) / f"{job['name']}{suffix}"
+    if suffix == ".npz":
+        save_compiled_forest(artifact_model, artifact)
+    else:
+        joblib.dump(artifact_model, artifact)
+
+    return {
+        "name": job["name"],
+        "kind": job["kind"],
+        "params": job["params"],
+        "artifact": artifact.relative_to(job["model_dir"]).as_posix(),
+        "accuracy": accuracy,
+        "size_bytes": artifact.stat().st_size,
+        "pickle_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        "fit_seconds": fit_seconds,
+    }
+
+
+def benchmark_artifact(path: Path, X_test: np.ndarray, repeat: int) -> float:
+    """按部署时的加载方式读回模型文件，测单行推理 p99 延迟（毫秒）；须在没有其他训练任务时串行调用。"""
+    model = load_compiled_forest(path) if path.suffix == ".npz" else joblib.load(path)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        _p99_single_row_ms(model, X_test, 50)  # 预热
+        return _p99_single_row_ms(model, X_test, repeat)
+
+
+def _jobs(args, data: dict[str, str], run_dir: Path) -> list[dict]:
+    jobs = []
+    for kind in args.models.split(","):
+        grid = SEARCH_SPACE[kind]
+        for values in itertools.product(*grid.values()):
+            params = dict(zip(grid.keys(), values))
+            name = kind + "".join(f"_{k}-{v}" for k, v in params.items())
+            jobs.append(
+                {
+                    "name": name,
+                    "kind": kind,
+                    "params": params,
+                    "seed": args.seed,
+                    "X": data["X"],
+                    "y": data["y"],
+                    "train_rows": args.train_rows,
+                    "test_rows": args.test_rows,
+                    "run_dir": str(run_dir),
+                    "model_dir": str(args.model_dir),
+                }
+            )
+    return jobs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SmartDiet 策略模型训练流水线")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="合成数据总行数")
+    parser.add_argument("--chunk-rows", type=int, default=200_000, help="每块生成的行数（决定峰值内存）")
+    parser.add_argument("--train-rows", type=int, default=200_000, help="用于训练的前 N 行")
+    parser.add_argument("--test-rows", type=int, default=50_000, help="用于评估的最后 N 行")
+    parser.add_argument("--models", default="rf,hgb,tree", help="参与对比的模型类型，逗号分隔")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-repeat", type=int, default=500)
+    parser.add_argument("--model-dir", type=Path, default=MODEL_DIR)
+    args = parser.parse_args()
+
+    if args.train_rows + args.test_rows > args.rows:
+        parser.error("--train-rows 与 --test-rows 之和不能超过 --rows")
+
+    run_id = time.strftime("%Y%m%d-%H%M%S") + f"-s{args.seed}"
+    run_dir = args.model_dir / "runs" / run_id
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    data = generate_dataset(run_dir, args.rows, args.chunk_rows, args.seed)
+    print(f"[{run_id}] 生成 {args.rows} 行合成数据，用时 {time.perf_counter() - started:.1f}s")
+
+    results = []
+    jobs = _jobs(args, data, run_dir)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(train_candidate, job) for job in jobs]
+        for future in as_completed(futures):
+            row = future.result()
+            results.append(row)
+            print(f"  训练完成 {row['name']:<36} acc={row['accuracy']:.4f} fit={row['fit_seconds']:.1f}s")
+
+    # 进程池已全部结束，机器空闲时逐个串行测延迟，清单里记录的是这组数字
+    X = np.load(data["X"], mmap_mode="r")
+    X_test = np.array(X[-args.test_rows :])
+    del X
+    for row in sorted(results, key=lambda r: r["name"]):
+        row["p99_single_row_ms"] = benchmark_artifact(args.model_dir / row["artifact"], X_test, args.latency_repeat)
+        print(
+            f"  {row['name']:<36} acc={row['accuracy']:.4f} size={row['size_bytes'] / 1024:8.1f}KB "
+            f"p99={row['p99_single_row_ms']:.3f}ms fit={row['fit_seconds']:.1f}s"
+        )
+
+    # 训练数据只用于本次运行，不随模型保留
+    for key in ("X", "y"):
+        os.remove(data[key])
+
+    results.sort(key=lambda r: (-r["accuracy"], r["p99_single_row_ms"]))
+    manifest = {
+        "run_id": run_id,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "features": FEATURE_COLUMNS,
+        "data": {
+            "rows": args.rows,
+            "chunk_rows": args.chunk_rows,
+            "train_rows": args.train_rows,
+            "test_rows": args.test_rows,
+            "seed": args.seed,
+            "sha256": data["sha256"],
+        },
+        # 延迟在训练全部结束后于主进程串行测得
+        "latency": {"mode": "serial", "repeat": args.latency_repeat},
+        "candidates": results,
+        "total_seconds": time.perf_counter() - started,
+    }
+    (run_dir / "metrics.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    # 顶层清单指向最新一次运行，供 app.py 选模型
+    (args.model_dir / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    fastest = min(results, key=lambda r: r["p99_single_row_ms"])
+    print(f"完成：{len(results)} 个候选，总耗时 {manifest['total_seconds']:.1f}s；最快 {fastest['name']}")
+    print(f"指标清单：{run_dir / 'metrics.json'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
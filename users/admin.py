@@ -11,13 +11,28 @@ class CustomUserAdmin(UserAdmin):
 			"营养信息",
 			{
 				"fields": (
+					"gender",
 					"age",
 					"weight",
 					"height",
+					"activity_level",
 					"goal",
 				)
 			},
 		),
+		(
+			"每日营养目标",
+			{
+				"fields": (
+					"bmr",
+					"tdee",
+					"target_calories",
+					"carbs_g",
+					"protein_g",
+					"fat_g",
+				)
+			},
+		),
 	)
 
 	add_fieldsets = UserAdmin.add_fieldsets + (
@@ -25,13 +40,16 @@ class CustomUserAdmin(UserAdmin):
 			"营养信息",
 			{
 				"fields": (
+					"gender",
 					"age",
 					"weight",
 					"height",
+					"activity_level",
 					"goal",
 				)
 			},
 		),
 	)
 
-	list_display = UserAdmin.list_display + ("age", "weight", "height", "goal")
+	list_display = UserAdmin.list_display + ("age", "weight", "height", "goal", "target_calories")
+	readonly_fields = ("bmr", "tdee", "target_calories", "carbs_g", "protein_g", "fat_g")
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from diet_planner.nutrition import compute_targets
+from users.models import CustomUser
+
+TARGET_FIELDS = ("bmr", "tdee", "target_calories", "carbs_g", "protein_g", "fat_g")
+INPUT_FIELDS = ("gender", "age", "height", "weight", "activity_level", "goal")
+
+
+class Command(BaseCommand):
+	help = "按 id 分块读取用户，向量化计算 BMR/TDEE/目标热量/宏量克数，并用 bulk_update 写回"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--chunk-size", type=int, default=5000, help="每块读取并写回的用户数")
+
+	def handle(self, *args, **options):
+		chunk_size = options["chunk_size"]
+		# 缺少身体数据的用户无法计算，直接跳过
+		users = CustomUser.objects.filter(age__isnull=False, height__isnull=False, weight__isnull=False)
+		started = time.perf_counter()
+		updated = 0
+		last_id = 0
+
+		while True:
+			# 按主键做 keyset 分页，避免 OFFSET 越翻越慢；只取计算需要的列
+			chunk = list(users.filter(id__gt=last_id).order_by("id").only("id", *INPUT_FIELDS)[:chunk_size])
+			if not chunk:
+				break
+			last_id = chunk[-1].id
+
+			targets = compute_targets(
+				[u.gender for u in chunk],
+				[u.age for u in chunk],
+				[u.height for u in chunk],
+				[u.weight for u in chunk],
+				[u.activity_level for u in chunk],
+				[u.goal for u in chunk],
+			)
+			for i, user in enumerate(chunk):
+				for field in TARGET_FIELDS:
+					setattr(user, field, max(0, int(targets[field][i])))
+
+			with transaction.atomic():
+				CustomUser.objects.bulk_update(chunk, TARGET_FIELDS, batch_size=500)
+			updated += len(chunk)
+			if options["verbosity"] > 1:
+				self.stdout.write(f"已处理 {updated} 个用户（最后 id={last_id}）")
+
+		elapsed = time.perf_counter() - started
+		rate = updated / elapsed if elapsed > 0 else 0.0
+		self.stdout.write(self.style.SUCCESS(f"完成：更新 {updated} 个用户，耗时 {elapsed:.2f}s（{rate:.0f} 用户/秒）"))
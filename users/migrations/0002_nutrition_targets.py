@@ -0,0 +1,53 @@
+# Generated by Django 6.0.2 on 2026-10-17 00:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='activity_level',
+            field=models.FloatField(default=1.375, help_text='活动系数（1.2~1.9）'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='bmr',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='BMR(kcal)'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='carbs_g',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='碳水(g)'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='fat_g',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='脂肪(g)'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='gender',
+            field=models.CharField(choices=[('male', '男'), ('female', '女')], default='male', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='protein_g',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='蛋白(g)'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='target_calories',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='每日目标热量(kcal)'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='tdee',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='TDEE(kcal)'),
+        ),
+    ]
@@ -15,5 +15,23 @@ class CustomUser(AbstractUser):
 		default="lose",
 	)
 
+	gender = models.CharField(
+		max_length=10,
+		choices=[
+			("male", "男"),
+			("female", "女"),
+		],
+		default="male",
+	)
+	activity_level = models.FloatField(help_text="活动系数（1.2~1.9）", default=1.375)
+
+	# 以下由 `manage.py compute_targets` 批量计算写回
+	bmr = models.PositiveIntegerField("BMR(kcal)", null=True, blank=True)
+	tdee = models.PositiveIntegerField("TDEE(kcal)", null=True, blank=True)
+	target_calories = models.PositiveIntegerField("每日目标热量(kcal)", null=True, blank=True)
+	carbs_g = models.PositiveIntegerField("碳水(g)", null=True, blank=True)
+	protein_g = models.PositiveIntegerField("蛋白(g)", null=True, blank=True)
+	fat_g = models.PositiveIntegerField("脂肪(g)", null=True, blank=True)
+
 	class Meta:
 		db_table = "custom_user"